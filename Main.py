@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from Routes.AllocationDashboardRoutes import router as allocation_router
 from Routes.GPSCoordinateRoutes import router as gps_router
@@ -8,8 +10,27 @@ from Routes.GPSDistanceRoutes import router as gps_distance_router
 from Routes.LoanProcessingRoutes import router as loan_processing_router
 from Routes.ExcelUploadRoutes import router as excel_upload_router
 from Routes.CredentialsRoutes import router as credential_router
+from Main.AllocationDashboard import allocation_jobs
+from Main.MongoConnection import mongo
+from Main.MongoIndexes import ensure_indexes
+from Main.credentialsService import shutdown_hash_pool
+from config.MongoConfig import MONGO_BOOTSTRAP_INDEXES
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One MongoDB connection pool for the whole app; indexes are set up in
+    # the background once it is reachable
+    await mongo.connect(on_connect=ensure_indexes if MONGO_BOOTSTRAP_INDEXES else None)
+    # Allocation worker processes are spawned off the event loop
+    await run_in_threadpool(allocation_jobs.start)
+    yield
+    shutdown_hash_pool()
+    await run_in_threadpool(allocation_jobs.shutdown)
+    await mongo.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS for local Wi-Fi and frontend access
 app.add_middleware(
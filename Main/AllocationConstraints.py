@@ -0,0 +1,161 @@
+import json
+import numpy as np
+import pandas as pd
+
+COMPARISON_OPERATORS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+RULE_SCOPES = ("fos", "case")
+
+
+def parse_eligibility_rules(raw_rules) -> list:
+    """
+    Parse and validate eligibility rules sent with /process.
+
+    Each rule pairs a FOS condition with a case condition:
+
+        {"fos": {"column": "role", "values": ["Senior"]},
+         "case": {"column": "BKT/DPD", "op": ">=", "value": 3},
+         "applies_to": "fos"}
+
+    applies_to "fos" (default) means FOS matching the fos condition only get
+    cases matching the case condition. applies_to "case" means cases matching
+    the case condition only go to FOS matching the fos condition. A condition
+    is either {"column", "values"} (membership, like the filters) or
+    {"column", "op", "value"} with op one of ==, !=, >, >=, <, <=.
+
+    Raises:
+        ValueError: If the rules are not valid JSON or not in the format above.
+    """
+    if not raw_rules:
+        return []
+    if isinstance(raw_rules, str):
+        try:
+            raw_rules = json.loads(raw_rules)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON format for eligibility_rules")
+    if isinstance(raw_rules, dict):
+        raw_rules = [raw_rules]
+    if not isinstance(raw_rules, list):
+        raise ValueError("eligibility_rules must be a list of rules")
+
+    rules = []
+    for position, rule in enumerate(raw_rules, start=1):
+        if not isinstance(rule, dict) or "fos" not in rule or "case" not in rule:
+            raise ValueError(f"Eligibility rule {position} needs 'fos' and 'case' conditions")
+        applies_to = rule.get("applies_to", "fos")
+        if applies_to not in RULE_SCOPES:
+            raise ValueError(
+                f"Eligibility rule {position}: applies_to must be one of {', '.join(RULE_SCOPES)}"
+            )
+        for side in ("fos", "case"):
+            condition = rule[side]
+            if not isinstance(condition, dict) or not condition.get("column"):
+                raise ValueError(f"Eligibility rule {position}: '{side}' condition needs a column")
+            if "values" not in condition and condition.get("op") not in COMPARISON_OPERATORS:
+                raise ValueError(
+                    f"Eligibility rule {position}: '{side}' condition needs 'values' or an "
+                    f"'op' of {', '.join(COMPARISON_OPERATORS)}"
+                )
+            if "values" not in condition and "value" not in condition:
+                raise ValueError(
+                    f"Eligibility rule {position}: '{side}' condition with an 'op' needs a 'value'"
+                )
+        rules.append({"fos": rule["fos"], "case": rule["case"], "applies_to": applies_to})
+    return rules
+
+
+def rule_columns(rules, side: str) -> list:
+    """Columns referenced on one side ("fos" or "case") of the rules."""
+    return list(dict.fromkeys(rule[side]["column"] for rule in rules))
+
+
+def evaluate_condition(dataframe: pd.DataFrame, condition: dict) -> np.ndarray:
+    """Evaluate one condition over every row, returning a boolean array."""
+    column = condition["column"]
+    if column not in dataframe.columns:
+        raise ValueError(f"Column '{column}' used in eligibility_rules not found in the file")
+    series = dataframe[column]
+
+    if "values" in condition:
+        values = condition["values"]
+        if not isinstance(values, list):
+            values = [values]
+        return series.isin(values).to_numpy()
+
+    value = condition["value"]
+    numeric_value = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Numeric columns compare as numbers, so "3" works like 3
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"Column '{column}' used in eligibility_rules is numeric; "
+                f"cannot compare it with {value!r}"
+            )
+        numeric_value = True
+    if numeric_value:
+        series = pd.to_numeric(series, errors="coerce")
+    try:
+        result = COMPARISON_OPERATORS[condition["op"]](series.to_numpy(), value)
+    except TypeError:
+        raise ValueError(
+            f"Column '{column}' used in eligibility_rules cannot be compared with {value!r}"
+        )
+    return np.asarray(pd.Series(result).fillna(False), dtype=bool)
+
+
+class EligibilityMask:
+    """
+    Per-row matches of every rule, evaluated once per file. Candidate pairs are
+    then checked against all rules with array operations, whatever the shape
+    of the candidate set (full matrix rows or k-nearest blocks).
+    """
+
+    def __init__(self, rules, case_data: pd.DataFrame, fos_data: pd.DataFrame):
+        self.rules = [
+            (
+                evaluate_condition(case_data, rule["case"]),
+                evaluate_condition(fos_data, rule["fos"]),
+                rule["applies_to"],
+            )
+            for rule in rules
+        ]
+
+    def allowed(self, case_indices, fos_indices) -> np.ndarray:
+        """
+        Whether each (case, FOS) pair is eligible. case_indices and
+        fos_indices broadcast against each other.
+        """
+        case_indices = np.asarray(case_indices)
+        fos_indices = np.asarray(fos_indices)
+        allowed = np.ones(np.broadcast(case_indices, fos_indices).shape, dtype=bool)
+        for case_match, fos_match, applies_to in self.rules:
+            if applies_to == "fos":
+                allowed &= ~fos_match[fos_indices] | case_match[case_indices]
+            else:
+                allowed &= ~case_match[case_indices] | fos_match[fos_indices]
+        return allowed
+
+
+def resolve_capacities(fos_data: pd.DataFrame, capacity_column, default_capacity: int):
+    """
+    Per-FOS case limits: the capacity column where it holds a non-negative
+    number, the global MAX_CASES elsewhere.
+
+    Raises:
+        ValueError: If the capacity column is not in the employee file.
+    """
+    if not capacity_column:
+        return np.full(len(fos_data), int(default_capacity), dtype=np.int64)
+    if capacity_column not in fos_data.columns:
+        raise ValueError(f"Capacity column '{capacity_column}' not found in the employee file")
+    capacities = pd.to_numeric(fos_data[capacity_column], errors="coerce")
+    capacities = capacities.where(capacities >= 0, default_capacity)
+    return capacities.fillna(default_capacity).astype(np.int64).to_numpy()
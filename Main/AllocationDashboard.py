@@ -1,33 +1,61 @@
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
 import numpy as np
-import math
 import os
-from pymongo import MongoClient
 from dotenv import load_dotenv
-import openpyxl
 from datetime import datetime
 import pytz
 import json
 import shutil
+import time
+from Main.HaversineKernel import DEFAULT_BLOCK_SIZE, DEFAULT_DTYPE
+from Main.FOSSpatialIndex import DEFAULT_K_NEAREST
+from Main.AllocationEngine import (
+    build_candidates,
+    greedy_assign,
+    optimal_assign,
+    allocation_summary,
+    ALLOCATION_MODES,
+    ALLOCATION_STRATEGIES,
+)
+from Main.AllocationConstraints import (
+    parse_eligibility_rules,
+    rule_columns,
+    EligibilityMask,
+    resolve_capacities,
+)
+from Main.JobManager import JobManager
+from config.AllocationConfig import (
+    ALLOCATION_MODE,
+    OPTIMAL_TIME_BUDGET,
+    ALLOCATION_MAX_WORKERS,
+    ALLOCATION_MAX_QUEUED,
+    ALLOCATION_JOB_RETENTION,
+    RESULT_PAGE_SIZE,
+)
+from Main.AllocationResultStore import save_result, get_result_page, load_result
+from Main.WorkbookCache import workbook_cache
+from Main.FileCatalog import UPLOAD_FOLDER, read_workbook, list_files
+from Main.MongoConnection import assignments_collection
+from Main.BulkWriter import bulk_insert
+from Main.LoanKey import add_loan_keys
+from Main.FacetIndex import facet_index, FACET_SORTS
 
 # Load environment variables from .env file
 load_dotenv()
 
-# MongoDB configuration from .env
-uri = os.getenv("ATLAS_MONGO_URI")
 validPassword = os.getenv("VALID_PASSWORD")
-db_name = os.getenv("MONGO_DATABASE")  # Database name from .env
-fos_collection_name = os.getenv("FOS_COLLECTION_NAME")  # Field Officers collection
-cases_collection_name = os.getenv("CASES_COLLECTION_NAME")  # Borrower Cases collection
-assignments_collection_name = os.getenv("MONGO_COLLECTION")  # Assigned cases collection
 
-# Initialize MongoDB client
-client = MongoClient(uri)
-db = client[db_name]
-collection_fos = db[fos_collection_name]
-collection_cases = db[cases_collection_name]
-collection_assignments = db[assignments_collection_name]
+
+# Allocations run in a bounded process pool so they never block the event loop
+ALLOCATION_STAGES = ("reading", "filtering", "distances", "assigning", "serializing")
+allocation_jobs = JobManager(
+    max_workers=ALLOCATION_MAX_WORKERS,
+    max_queued=ALLOCATION_MAX_QUEUED,
+    retention=ALLOCATION_JOB_RETENTION,
+    stages=ALLOCATION_STAGES,
+)
 
 
 # Configuration for file upload
@@ -35,7 +63,6 @@ def secure_filename(filename: str) -> str:
     return "".join(c for c in filename if c.isalnum() or c in (".", "_", "-")).rstrip()
 
 
-UPLOAD_FOLDER = "./files"
 EMPLOYEES_FOLDER = os.path.join(UPLOAD_FOLDER, "employees")
 CASES_FOLDER = os.path.join(UPLOAD_FOLDER, "cases")
 ALLOWED_EXTENSIONS = {"xlsx"}
@@ -50,30 +77,23 @@ def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# Haversine function to calculate distance
-def haversine_distance(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    R = 6371  # Radius of the Earth in kilometers
-    return R * c
-
-
-async def get_case_files():
-    case_files = os.listdir(CASES_FOLDER)
+async def get_case_files(details: bool = False):
+    case_files = list_files(CASES_FOLDER, details)
     return case_files
 
 
-async def get_employee_files():
-    employee_files = os.listdir(EMPLOYEES_FOLDER)
+async def get_employee_files(details: bool = False):
+    employee_files = list_files(EMPLOYEES_FOLDER, details)
     return employee_files
 
 
+# Parsed uploads come from the workbook cache, backed by the columnar sidecar.
+# The cache lives in the API process; allocations run in worker processes,
+# which read the columns they need straight from the sidecar instead.
+def read_uploaded_file(file_path: str) -> pd.DataFrame:
+    return workbook_cache.get(file_path, loader=read_workbook)
+
+
 async def get_file_columns(file_name: str, file_type: str):
     if not file_name:
         raise HTTPException(status_code=400, detail="File name is required.")
@@ -93,7 +113,7 @@ async def get_file_columns(file_name: str, file_type: str):
         raise HTTPException(status_code=404, detail="File not found.")
 
     try:
-        df = pd.read_excel(file_path)
+        df = read_uploaded_file(file_path)
         columns = df.columns.tolist()
         columns = [col for col in columns if col not in ["latitude", "longitude"]]
         return {"columns": columns}
@@ -126,22 +146,14 @@ async def get_column_values(data):
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found")
 
-        workbook = openpyxl.load_workbook(file_path)
-        sheet = workbook.active
-        column_index = None
-        for idx, cell in enumerate(sheet[1]):
-            if cell.value == column_name:
-                column_index = idx + 1
-                break
-
-        if column_index is None:
+        try:
+            facet = facet_index.column(file_path, column_name, read_uploaded_file)
+        except KeyError:
             raise HTTPException(status_code=404, detail="Column not found in file")
 
-        unique_values = set()
-        for row in sheet.iter_rows(
-            min_row=2, min_col=column_index, max_col=column_index
-        ):
-            unique_values.add(row[0].value)
+        unique_values = set(facet.values)
+        if facet.null_count:
+            unique_values.add(None)
 
         sorted_unique_values = sorted(filter(None, unique_values))
         if None in unique_values:
@@ -152,7 +164,57 @@ async def get_column_values(data):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def process_files(request):
+async def get_column_facets(data):
+    file_name = data.file_name
+    column_name = data.column_name
+    file_type = data.file_type
+
+    if not file_name or not column_name or not file_type:
+        raise HTTPException(
+            status_code=400, detail="File name, column name, or file type is missing"
+        )
+    if data.page < 1 or data.page_size < 1:
+        raise HTTPException(
+            status_code=400, detail="page and page_size must be greater than 0"
+        )
+    if data.sort not in FACET_SORTS:
+        raise HTTPException(
+            status_code=400, detail=f"sort must be one of: {', '.join(FACET_SORTS)}"
+        )
+
+    folder_path = (
+        EMPLOYEES_FOLDER
+        if file_type == "emp"
+        else CASES_FOLDER if file_type == "case" else None
+    )
+    if not folder_path:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+
+    file_path = os.path.join(folder_path, file_name)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        facet = facet_index.column(file_path, column_name, read_uploaded_file)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Column not found in file")
+
+    return {
+        "column": column_name,
+        **facet.search(data.prefix or "", data.page, data.page_size, data.sort),
+    }
+
+
+# Build the facet index of a freshly uploaded file so filter dropdowns open instantly
+def index_uploaded_file(file_path: str):
+    facet_index.build(file_path, read_uploaded_file)
+
+
+async def read_allocation_form(request) -> dict:
+    """
+    Validate the /process form and return the allocation parameters as a
+    plain dict, so the allocation itself can run in a worker process.
+    """
     form = await request.form()
     if "employee_file" not in form or "case_file" not in form:
         raise HTTPException(status_code=400, detail="Both files are required!")
@@ -166,8 +228,66 @@ async def process_files(request):
             detail="Invalid value for MAX_CASES. It must be a number greater than 0.",
         )
 
-    fos_file = form["employee_file"]
-    master_file = form["case_file"]
+    # Optional distance kernel tuning
+    distance_dtype = form.get("distance_dtype") or DEFAULT_DTYPE
+    distance_block_size = form.get("distance_block_size") or DEFAULT_BLOCK_SIZE
+    try:
+        distance_block_size = int(distance_block_size)
+        if distance_block_size < 1:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid value for distance_block_size. It must be a number greater than 0.",
+        )
+    if distance_dtype not in ("float32", "float64"):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid value for distance_dtype. It must be float32 or float64.",
+        )
+
+    # Optional candidate source: full matrix or k-nearest spatial index
+    allocation_mode = form.get("allocation_mode") or ALLOCATION_MODE
+    if allocation_mode not in ALLOCATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid value for allocation_mode. Use one of: {', '.join(ALLOCATION_MODES)}.",
+        )
+    k_nearest = form.get("k_nearest") or DEFAULT_K_NEAREST
+    try:
+        k_nearest = int(k_nearest)
+        if k_nearest < 1:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid value for k_nearest. It must be a number greater than 0.",
+        )
+
+    # Optional assignment strategy: file-order greedy or min-cost optimal
+    strategy = form.get("strategy") or "greedy"
+    if strategy not in ALLOCATION_STRATEGIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid value for strategy. Use one of: {', '.join(ALLOCATION_STRATEGIES)}.",
+        )
+    time_budget = form.get("time_budget") or OPTIMAL_TIME_BUDGET
+    try:
+        time_budget = float(time_budget)
+        if time_budget <= 0:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid value for time_budget. It must be a number of seconds greater than 0.",
+        )
+
+    # Optional per-FOS capacity column and role/product eligibility rules
+    capacity_column = form.get("capacity_column") or None
+    try:
+        eligibility_rules = parse_eligibility_rules(form.get("eligibility_rules"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Optional filters
     employee_filters = form.get("employee_filters", [])
@@ -178,11 +298,61 @@ async def process_files(request):
     if isinstance(case_filters, str):
         case_filters = json.loads(case_filters)
 
+    return {
+        "employee_file": form["employee_file"],
+        "case_file": form["case_file"],
+        "max_cases": MAX_CASES,
+        "distance_dtype": distance_dtype,
+        "distance_block_size": distance_block_size,
+        "allocation_mode": allocation_mode,
+        "k_nearest": k_nearest,
+        "strategy": strategy,
+        "time_budget": time_budget,
+        "capacity_column": capacity_column,
+        "eligibility_rules": eligibility_rules,
+        "employee_filters": employee_filters,
+        "case_filters": case_filters,
+    }
+
+
+def _ignore_progress(stage):
+    pass
+
+
+def run_allocation(params: dict, progress=None) -> dict:
+    """
+    Run one allocation from read_allocation_form parameters and return the
+    /process response body. progress, if given, is called with each stage
+    name (see ALLOCATION_STAGES) as the allocation moves through it.
+    """
+    if progress is None:
+        progress = _ignore_progress
+
+    fos_file = params["employee_file"]
+    master_file = params["case_file"]
+    MAX_CASES = params["max_cases"]
+    distance_dtype = params["distance_dtype"]
+    distance_block_size = params["distance_block_size"]
+    allocation_mode = params["allocation_mode"]
+    k_nearest = params["k_nearest"]
+    strategy = params["strategy"]
+    time_budget = params["time_budget"]
+    capacity_column = params["capacity_column"]
+    eligibility_rules = params["eligibility_rules"]
+    employee_filters = params["employee_filters"]
+    case_filters = params["case_filters"]
+
+    # This runs in a JobManager worker process, outside the API process's
+    # workbook cache: read only the columns used, memory-mapped from the
+    # columnar sidecar
+    progress("reading")
     fos_file_path = os.path.join(EMPLOYEES_FOLDER, fos_file)
     master_file_path = os.path.join(CASES_FOLDER, master_file)
 
     def keep_only_existing_columns(dataframe, columns_to_keep):
-        existing_columns = [col for col in columns_to_keep if col in dataframe.columns]
+        existing_columns = [
+            col for col in dict.fromkeys(columns_to_keep) if col in dataframe.columns
+        ]
         return dataframe[existing_columns]
 
     fos_columns_to_keep = [
@@ -194,7 +364,10 @@ async def process_files(request):
         "latitude",
         "longitude",
     ]
-    fos_data = pd.read_excel(fos_file_path)
+    fos_columns_to_keep += rule_columns(eligibility_rules, "fos")
+    if capacity_column:
+        fos_columns_to_keep.append(capacity_column)
+    fos_data = read_workbook(fos_file_path, fos_columns_to_keep)
     fos_data = keep_only_existing_columns(fos_data, fos_columns_to_keep)
 
     master_columns_to_keep = [
@@ -222,9 +395,11 @@ async def process_files(request):
         "assignedStatus",
         "Masked_LoanNo/CC",
     ]
-    master_data = pd.read_excel(master_file_path)
+    master_columns_to_keep += rule_columns(eligibility_rules, "case")
+    master_data = read_workbook(master_file_path, master_columns_to_keep)
     master_data = keep_only_existing_columns(master_data, master_columns_to_keep)
 
+    progress("filtering")
     for filter_item in employee_filters:
         column = filter_item.get("column")
         values = filter_item.get("values", [])
@@ -268,72 +443,75 @@ async def process_files(request):
     master_data.reset_index(drop=True, inplace=True)
 
     fos_locations = fos_data[["latitude", "longitude"]].values
-    case_locations = master_data[["latitude", "longitude", "assignedStatus"]].values
+    case_locations = master_data[["latitude", "longitude"]].values
+    fos_names = fos_data["E_Name"].tolist()
+    fos_ids = fos_data["E_ID"].tolist()
+
+    try:
+        fos_capacities = resolve_capacities(fos_data, capacity_column, MAX_CASES)
+        eligibility = (
+            EligibilityMask(eligibility_rules, master_data, fos_data)
+            if eligibility_rules
+            else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    started = time.monotonic()
+    progress("distances")
+    if strategy == "optimal":
+        progress("assigning")
+        assigned_fos, assigned_distance, solver_status, solver_message = optimal_assign(
+            case_locations,
+            fos_locations,
+            fos_names,
+            fos_capacities,
+            k=k_nearest,
+            time_budget=time_budget,
+            eligibility=eligibility,
+        )
+    else:
+        candidates = build_candidates(
+            allocation_mode,
+            case_locations,
+            fos_locations,
+            k=k_nearest,
+            block_size=distance_block_size,
+            dtype=distance_dtype,
+            eligibility=eligibility,
+        )
+        progress("assigning")
+        assigned_fos, assigned_distance = greedy_assign(
+            candidates, len(case_locations), fos_names, fos_capacities
+        )
+        solver_status, solver_message = "complete", None
+    summary = allocation_summary(
+        strategy,
+        solver_status,
+        assigned_fos,
+        assigned_distance,
+        time.monotonic() - started,
+        solver_message,
+    )
 
-    fos_assignment_count = {row["E_Name"]: 0 for _, row in fos_data.iterrows()}
     case_assignments = []
     distance_assignments = []
-    unassigned_cases = []
-    fos_case_distances = {fos: [] for fos in fos_data["E_Name"]}
-
-    distance_matrix = np.zeros((len(case_locations), len(fos_locations)))
-    for i, case in enumerate(case_locations):
-        for j, fos in enumerate(fos_locations):
-            distance_matrix[i, j] = haversine_distance(case[0], case[1], fos[0], fos[1])
-
-    for i in range(len(case_locations)):
-        case = case_locations[i]
-        assigned_status = case[2]
-
-        if "unAssigned" in assigned_status:
-            sorted_fos_indices = np.argsort(distance_matrix[i])
-            assigned = False
-
-            for fos_index in sorted_fos_indices:
-                fos_name = fos_data.iloc[fos_index]["E_Name"]
-                fos_id = fos_data.iloc[fos_index]["E_ID"]
-                if fos_assignment_count[fos_name] < MAX_CASES:
-                    case_assignments.append({"FOS_Name": fos_name, "FOS_ID": fos_id})
-                    distance_assignments.append(round(distance_matrix[i, fos_index], 3))
-                    fos_assignment_count[fos_name] += 1
-                    fos_case_distances[fos_name].append(
-                        (distance_matrix[i, fos_index], i)
-                    )
-                    suffix = assigned_status.replace("unAssigned", "")
-                    new_assigned_status = (
-                        f"Assigned{int(suffix) + 1}"
-                        if suffix.isdigit()
-                        else "Assigned1"
-                    )
-                    master_data.at[i, "assignedStatus"] = new_assigned_status
-                    assigned = True
-                    break
-                else:
-                    case_assignments.append({"FOS_Name": None, "FOS_ID": None})
-                    distance_assignments.append(None)
-                    unassigned_cases.append(i)
-                    break
-
-    for case_index in unassigned_cases:
-        sorted_fos_indices = np.argsort(distance_matrix[case_index])
-        case = case_locations[case_index]
-        assigned_status = case[2]
-
-        for fos_index in sorted_fos_indices:
-            fos_name = fos_data.iloc[fos_index]["E_Name"]
-            fos_id = fos_data.iloc[fos_index]["E_ID"]
-            if fos_assignment_count[fos_name] < MAX_CASES:
-                case_assignments[case_index] = {"FOS_Name": fos_name, "FOS_ID": fos_id}
-                suffix = assigned_status.replace("unAssigned", "")
-                new_assigned_status = (
-                    f"Assigned{int(suffix) + 1}" if suffix.isdigit() else "Assigned1"
-                )
-                master_data.at[case_index, "assignedStatus"] = new_assigned_status
-                distance_assignments[case_index] = round(
-                    distance_matrix[case_index, fos_index], 3
-                )
-                fos_assignment_count[fos_name] += 1
-                break
+    for i, fos_index in enumerate(assigned_fos):
+        if fos_index < 0:
+            case_assignments.append({"FOS_Name": None, "FOS_ID": None})
+            distance_assignments.append(None)
+            continue
+
+        case_assignments.append(
+            {"FOS_Name": fos_names[fos_index], "FOS_ID": fos_ids[fos_index]}
+        )
+        distance_assignments.append(round(float(assigned_distance[i]), 3))
+        assigned_status = master_data.at[i, "assignedStatus"]
+        suffix = assigned_status.replace("unAssigned", "")
+        new_assigned_status = (
+            f"Assigned{int(suffix) + 1}" if suffix.isdigit() else "Assigned1"
+        )
+        master_data.at[i, "assignedStatus"] = new_assigned_status
 
     master_data["Assigned_FOS"] = [
         assignment["FOS_Name"] for assignment in case_assignments
@@ -343,6 +521,7 @@ async def process_files(request):
     ]
     master_data["Distance(KM)"] = distance_assignments
 
+    progress("serializing")
     excluded_cases = master_data[
         master_data["assignedStatus"].str.contains("unAssigned", case=False)
     ]
@@ -355,86 +534,161 @@ async def process_files(request):
     master_data = master_data.replace({np.nan: None})
     master_data["acceptanceStatus"] = "pending"
 
+    fos_locations = fos_data[["latitude", "longitude", "E_Name", "E_ID"]]
+    result_id = save_result(master_data, fos_locations, summary)
+
+    map_data = {
+        "center_lat": fos_data["latitude"].mean(),
+        "center_long": fos_data["longitude"].mean(),
+        "fos_locations": fos_data[["latitude", "longitude", "E_Name"]]
+        .rename(columns={"latitude": "lat", "longitude": "long", "E_Name": "name"})
+        .to_dict(orient="records"),
+    }
+
+    # Background jobs return the first page; the rest, and the case points
+    # (clustered by /results/{id}/map), are fetched by result id
+    if params.get("response") == "page":
+        return {
+            "result_id": result_id,
+            "allocation_summary": summary,
+            "first_page": get_result_page(result_id, 1, RESULT_PAGE_SIZE),
+            "map_data": map_data,
+        }
+
+    map_data["case_locations"] = (
+        master_data[["latitude", "longitude", "Cus_Add"]]
+        .rename(columns={"latitude": "lat", "longitude": "long"})
+        .to_dict(orient="records")
+    )
     response_data = {
+        "result_id": result_id,
         "fos_assignments": master_data.to_dict(orient="records"),
-        "map_data": {
-            "center_lat": fos_data["latitude"].mean(),
-            "center_long": fos_data["longitude"].mean(),
-            "fos_locations": [
-                {
-                    "lat": row["latitude"],
-                    "long": row["longitude"],
-                    "name": row["E_Name"],
-                }
-                for _, row in fos_data.iterrows()
-            ],
-            "case_locations": [
-                {
-                    "lat": row["latitude"],
-                    "long": row["longitude"],
-                    "Cus_Add": row["Cus_Add"],
-                }
-                for _, row in master_data.iterrows()
-            ],
-        },
+        "allocation_summary": summary,
+        "map_data": map_data,
     }
 
     return response_data
 
 
+async def process_files(request):
+    params = await read_allocation_form(request)
+    return await allocation_jobs.run(run_allocation, params)
+
+
+# Assignment columns stored in MongoDB on upload
+UPLOAD_COLUMNS = [
+    "Assigned_FOS",
+    "Assigned_FOS_ID",
+    "BKT/DPD",
+    "Cus_Add",
+    "Cus_Mobile",
+    "Cus_Name",
+    "Distance(KM)",
+    "EMI",
+    "Emp_Address",
+    "LoanNo/CC",
+    "Masked_LoanNo/CC",
+    "POS",
+    "Perma_Add",
+    "Port",
+    "TAD",
+    "TC_ID",
+    "TC_Name",
+    "TL_ID",
+    "TL_Name",
+    "Asset/Product",
+    "acceptanceStatus",
+    "assignedStatus",
+    "latitude",
+    "longitude",
+]
+
+
+def result_documents(result_id: str, overrides=None, exclude_rows=None):
+    """
+    Documents to upload for a stored allocation: its assigned rows limited to
+    UPLOAD_COLUMNS, with manual edits applied. overrides maps a stored row
+    number (the "row" field of /results pages and NDJSON downloads, which
+    filters do not renumber) to the fields changed on that row; rows in
+    exclude_rows are left out. Returns the documents and their row numbers.
+
+    Raises:
+        HTTPException: 404 for an unknown result, 400 for a row number outside the result.
+    """
+    assignments = load_result(result_id)["assignments"]
+    overrides = overrides or {}
+    exclude_rows = set(exclude_rows or [])
+    unknown_rows = [
+        row for row in list(overrides) + list(exclude_rows) if not 0 <= row < len(assignments)
+    ]
+    if unknown_rows:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rows not in result {result_id}: {', '.join(map(str, sorted(set(unknown_rows))))}",
+        )
+
+    columns = [column for column in UPLOAD_COLUMNS if column in assignments.columns]
+    documents = assignments[columns].to_dict(orient="records")
+    for row, fields in overrides.items():
+        documents[row].update(
+            {key: value for key, value in fields.items() if key in UPLOAD_COLUMNS}
+        )
+    rows = [row for row in range(len(documents)) if row not in exclude_rows]
+    return [documents[row] for row in rows], rows
+
+
 async def upload_to_db(request):
+    """
+    Insert an allocation into the assignments collection, either from a
+    stored result (request.result_id, with optional request.overrides and
+    request.exclude_rows) or from rows posted in request.data.
+    """
     try:
-        data = request.data
         password = request.password
 
         if password != validPassword:
             raise HTTPException(status_code=403, detail="Invalid password.")
 
-        if not data:
-            raise HTTPException(status_code=400, detail="No data provided.")
-
-        # Define the columns to keep (as specified)
-        columns_to_keep = [
-            "Assigned_FOS",
-            "Assigned_FOS_ID",
-            "BKT/DPD",
-            "Cus_Add",
-            "Cus_Mobile",
-            "Cus_Name",
-            "Distance(KM)",
-            "EMI",
-            "Emp_Address",
-            "LoanNo/CC",
-            "Masked_LoanNo/CC",
-            "POS",
-            "Perma_Add",
-            "Port",
-            "TAD",
-            "TC_ID",
-            "TC_Name",
-            "TL_ID",
-            "TL_Name",
-            "Asset/Product",
-            "acceptanceStatus",
-            "assignedStatus",
-            "latitude",
-            "longitude",
-        ]
-
-        # Filter data to only include columns_to_keep
-        filtered_data = [
-            {key: doc[key] for key in columns_to_keep if key in doc} for doc in data
-        ]
+        if request.result_id:
+            # Rows come from the stored result, so only the edits cross the wire
+            filtered_data, rows = await run_in_threadpool(
+                result_documents, request.result_id, request.overrides, request.exclude_rows
+            )
+            if not filtered_data:
+                raise HTTPException(status_code=400, detail="No rows left to upload.")
+        else:
+            data = request.data
+            if not data:
+                raise HTTPException(status_code=400, detail="No data provided.")
+
+            # Filter data to only include UPLOAD_COLUMNS
+            filtered_data = [
+                {key: doc[key] for key in UPLOAD_COLUMNS if key in doc} for doc in data
+            ]
+            rows = None
 
         # Add timestamp to filtered data
         indian_timezone = pytz.timezone("Asia/Kolkata")
         indian_timestamp = datetime.now(indian_timezone)
         for document in filtered_data:
             document["assignedTimestamp"] = indian_timestamp
-
-        # Insert filtered data into MongoDB
-        collection_assignments.insert_many(filtered_data)
-        return {"message": "Data uploaded successfully."}
+        add_loan_keys(filtered_data)
+
+        # Insert filtered data into MongoDB in unordered batches; failed rows
+        # are given by result row number, or numbered from 1 in the order sent
+        report = await bulk_insert(assignments_collection(), filtered_data, rows)
+        if report.failed and not report.inserted:
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while uploading data: {report.failed_rows[0]['error']}",
+            )
+        if report.failed:
+            message = f"Uploaded {report.inserted} of {len(filtered_data)} rows; {report.failed} failed."
+        else:
+            message = "Data uploaded successfully."
+        return {"message": message, **report.to_dict()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"An error occurred while uploading data: {str(e)}"
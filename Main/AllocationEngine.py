@@ -0,0 +1,320 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+from Main.HaversineKernel import haversine_matrix, DEFAULT_BLOCK_SIZE, DEFAULT_DTYPE
+from Main.FOSSpatialIndex import FOSSpatialIndex, DEFAULT_K_NEAREST
+from config.AllocationConfig import OPTIMAL_TIME_BUDGET
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ALLOCATION_MODES = ("dense", "knn")
+ALLOCATION_STRATEGIES = ("greedy", "optimal")
+
+
+class DenseCandidates:
+    """
+    Candidate FOS per case taken from a full case x FOS distance matrix.
+    Ineligible pairs are set to infinity and never offered.
+    """
+
+    def __init__(
+        self,
+        case_coords,
+        fos_coords,
+        block_size=DEFAULT_BLOCK_SIZE,
+        dtype=DEFAULT_DTYPE,
+        eligibility=None,
+    ):
+        self.distance_matrix = haversine_matrix(
+            case_coords, fos_coords, block_size=block_size, dtype=dtype
+        )
+        if eligibility is not None:
+            fos_indices = np.arange(self.distance_matrix.shape[1])[np.newaxis, :]
+            for start in range(0, len(self.distance_matrix), block_size):
+                block = self.distance_matrix[start : start + block_size]
+                case_indices = np.arange(start, start + len(block))[:, np.newaxis]
+                block[~eligibility.allowed(case_indices, fos_indices)] = np.inf
+
+    def nearest(self, case_index):
+        row = self.distance_matrix[case_index]
+        if not len(row):
+            return None, None
+        fos_index = int(np.argmin(row))
+        if not np.isfinite(row[fos_index]):
+            return None, None
+        return fos_index, float(row[fos_index])
+
+    def iter_candidates(self, case_index):
+        row = self.distance_matrix[case_index]
+        for fos_index in np.argsort(row):
+            if not np.isfinite(row[fos_index]):
+                return
+            yield int(fos_index), float(row[fos_index])
+
+
+class KNearestCandidates:
+    """
+    Candidate FOS per case taken from a spatial index. The k nearest officers
+    are queried for all cases in one batch; a case only queries again, with a
+    doubled k, once every candidate it has seen is full or ineligible.
+    """
+
+    def __init__(self, case_coords, fos_coords, k=DEFAULT_K_NEAREST, eligibility=None):
+        self.case_coords = np.asarray(case_coords, dtype=np.float64).reshape(-1, 2)
+        self.index = FOSSpatialIndex(fos_coords)
+        self.k = max(1, min(int(k), self.index.size))
+        self.eligibility = eligibility
+        self.distances, self.indices = self.index.query(self.case_coords, self.k)
+        if eligibility is not None and self.indices.size:
+            allowed = eligibility.allowed(
+                np.arange(len(self.indices))[:, np.newaxis], self.indices
+            )
+            self.distances[~allowed] = np.inf
+
+    def nearest(self, case_index):
+        if not self.indices.shape[1]:
+            return None, None
+        distance = self.distances[case_index, 0]
+        if np.isfinite(distance):
+            return int(self.indices[case_index, 0]), float(distance)
+        return next(self.iter_candidates(case_index), (None, None))
+
+    def iter_candidates(self, case_index):
+        distances = self.distances[case_index]
+        indices = self.indices[case_index]
+        seen = 0
+        k = self.k
+        while True:
+            for fos_index, distance in zip(indices[seen:], distances[seen:]):
+                if np.isfinite(distance):
+                    yield int(fos_index), float(distance)
+            seen = len(indices)
+            if seen >= self.index.size:
+                return
+            k = min(k * 2, self.index.size)
+            distances, indices = self.index.query(
+                self.case_coords[case_index : case_index + 1], k
+            )
+            distances, indices = distances[0], indices[0]
+            if self.eligibility is not None:
+                distances[~self.eligibility.allowed(case_index, indices)] = np.inf
+
+
+def build_candidates(
+    mode,
+    case_coords,
+    fos_coords,
+    k=DEFAULT_K_NEAREST,
+    block_size=DEFAULT_BLOCK_SIZE,
+    dtype=DEFAULT_DTYPE,
+    eligibility=None,
+):
+    if mode == "dense":
+        return DenseCandidates(
+            case_coords, fos_coords, block_size=block_size, dtype=dtype,
+            eligibility=eligibility,
+        )
+    if mode == "knn":
+        return KNearestCandidates(case_coords, fos_coords, k=k, eligibility=eligibility)
+    raise ValueError(
+        f"Invalid allocation mode '{mode}'. Use one of: {', '.join(ALLOCATION_MODES)}"
+    )
+
+
+def remaining_capacity(fos_names, max_cases) -> dict:
+    """
+    Cases each FOS can still take, keyed by FOS name as in the original
+    dashboard logic. max_cases is one global limit or a per-FOS sequence.
+    """
+    if np.ndim(max_cases) == 0:
+        return {name: int(max_cases) for name in fos_names}
+    return {name: int(capacity) for name, capacity in zip(fos_names, max_cases)}
+
+
+def _fill_from_candidates(
+    candidates, case_indices, fos_names, capacity, assigned_fos, assigned_distance,
+):
+    """Give each listed case the nearest candidate FOS that still has room."""
+    open_fos = sum(1 for remaining in capacity.values() if remaining > 0)
+    for i in case_indices:
+        if not open_fos:
+            break
+        for fos_index, distance in candidates.iter_candidates(i):
+            name = fos_names[fos_index]
+            if capacity[name] > 0:
+                assigned_fos[i] = fos_index
+                assigned_distance[i] = distance
+                capacity[name] -= 1
+                if not capacity[name]:
+                    open_fos -= 1
+                break
+
+
+def greedy_assign(candidates, n_cases, fos_names, max_cases):
+    """
+    Assign cases in file order. The first pass gives each case its nearest
+    eligible FOS if that FOS still has room; the second pass walks the
+    remaining cases through their candidates in distance order and takes the
+    first FOS with room.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: FOS index per case (-1 when unassigned)
+        and the distance in km to it (NaN when unassigned).
+    """
+    assigned_fos = np.full(n_cases, -1, dtype=np.intp)
+    assigned_distance = np.full(n_cases, np.nan)
+    capacity = remaining_capacity(fos_names, max_cases)
+    unassigned_cases = []
+
+    for i in range(n_cases):
+        fos_index, distance = candidates.nearest(i)
+        if fos_index is not None and capacity[fos_names[fos_index]] > 0:
+            assigned_fos[i] = fos_index
+            assigned_distance[i] = distance
+            capacity[fos_names[fos_index]] -= 1
+        else:
+            unassigned_cases.append(i)
+
+    _fill_from_candidates(
+        candidates, unassigned_cases, fos_names, capacity, assigned_fos, assigned_distance,
+    )
+    return assigned_fos, assigned_distance
+
+
+def optimal_assign(
+    case_coords, fos_coords, fos_names, max_cases, k=DEFAULT_K_NEAREST,
+    time_budget=OPTIMAL_TIME_BUDGET, eligibility=None,
+):
+    """
+    Solve the capacitated transportation problem (cases -> FOS, at most
+    max_cases per FOS name) over the eligible k-nearest candidate edges of
+    every case, minimising total km while assigning as many cases as possible.
+
+    The problem is a min-cost flow, posed as a sparse LP and solved with HiGHS
+    dual simplex; the constraint matrix is totally unimodular, so the vertex
+    solution is integral. time_budget counts from the call, candidate search
+    included. Simplex has no usable partial solution when stopped early, so
+    if the solver does not finish within the budget or fails, the greedy
+    assignment is returned instead ("greedy_fallback"). Cases left without a
+    candidate edge are then filled greedily from wider neighbourhoods.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, str, Optional[str]]: FOS index per case
+        (-1 when unassigned), distance in km (NaN when unassigned), the solver
+        status ("optimal" or "greedy_fallback") and, for a fallback, the
+        solver's message.
+    """
+    started = time.monotonic()
+    candidates = KNearestCandidates(case_coords, fos_coords, k=k, eligibility=eligibility)
+    n_cases = len(candidates.case_coords)
+    n_fos = candidates.index.size
+    if n_cases == 0 or n_fos == 0:
+        assigned_fos, assigned_distance = greedy_assign(
+            candidates, n_cases, fos_names, max_cases
+        )
+        return assigned_fos, assigned_distance, "optimal", None
+
+    k = candidates.indices.shape[1]
+    edge_case = np.repeat(np.arange(n_cases), k)
+    edge_fos = candidates.indices.ravel()
+    edge_cost = candidates.distances.ravel()
+    eligible_edges = np.isfinite(edge_cost)
+    edge_case, edge_fos, edge_cost = (
+        edge_case[eligible_edges], edge_fos[eligible_edges], edge_cost[eligible_edges]
+    )
+    n_edges = len(edge_cost)
+
+    # One "unassigned" slack per case. Its cost exceeds any distance saving an
+    # augmenting path could buy (at most one edge per FOS), so the solver only
+    # leaves a case unassigned when capacity forces it.
+    slack_cost = (float(edge_cost.max()) if n_edges else 0.0) * (n_fos + 1) + 1.0
+    cost = np.concatenate([edge_cost, np.full(n_cases, slack_cost)])
+
+    # Every case takes exactly one edge or its slack
+    a_eq = sparse.csr_matrix(
+        (
+            np.ones(n_edges + n_cases),
+            (
+                np.concatenate([edge_case, np.arange(n_cases)]),
+                np.arange(n_edges + n_cases),
+            ),
+        ),
+        shape=(n_cases, n_edges + n_cases),
+    )
+    b_eq = np.ones(n_cases)
+
+    # Capacity is shared by FOS with the same name
+    capacity = remaining_capacity(fos_names, max_cases)
+    name_codes, unique_names = pd.factorize(pd.Series(fos_names, dtype=object))
+    a_ub = sparse.csr_matrix(
+        (np.ones(n_edges), (name_codes[edge_fos], np.arange(n_edges))),
+        shape=(len(unique_names), n_edges + n_cases),
+    )
+    b_ub = np.array([capacity[name] for name in unique_names], dtype=float)
+
+    result = linprog(
+        cost,
+        A_ub=a_ub,
+        b_ub=b_ub,
+        A_eq=a_eq,
+        b_eq=b_eq,
+        bounds=(0, 1),
+        method="highs-ds",
+        options={"time_limit": max(float(time_budget) - (time.monotonic() - started), 0.001)},
+    )
+
+    if result.status != 0 or result.x is None:
+        logger.warning(
+            f"Optimal allocation stopped after {time.monotonic() - started:.1f}s "
+            f"({result.message}), returning greedy assignment."
+        )
+        assigned_fos, assigned_distance = greedy_assign(
+            candidates, n_cases, fos_names, max_cases
+        )
+        return assigned_fos, assigned_distance, "greedy_fallback", result.message
+
+    assigned_fos = np.full(n_cases, -1, dtype=np.intp)
+    assigned_distance = np.full(n_cases, np.nan)
+    chosen = np.flatnonzero(result.x[:n_edges] > 0.5)
+    for edge in chosen:
+        i, fos_index = edge_case[edge], edge_fos[edge]
+        if assigned_fos[i] >= 0 or capacity[fos_names[fos_index]] <= 0:
+            continue
+        assigned_fos[i] = fos_index
+        assigned_distance[i] = edge_cost[edge]
+        capacity[fos_names[fos_index]] -= 1
+
+    _fill_from_candidates(
+        candidates, np.flatnonzero(assigned_fos < 0), fos_names, capacity,
+        assigned_fos, assigned_distance,
+    )
+    return assigned_fos, assigned_distance, "optimal", None
+
+
+def allocation_summary(strategy, status, assigned_fos, assigned_distance, elapsed, solver_message=None):
+    """
+    Objective and counts reported with every allocation, for comparing
+    strategies; solver_message explains a status other than optimal.
+    """
+    assigned = assigned_fos >= 0
+    summary = {
+        "strategy": strategy,
+        "status": status,
+        "total_distance_km": round(float(np.nansum(assigned_distance)), 3),
+        "mean_distance_km": (
+            round(float(np.nanmean(assigned_distance[assigned])), 3)
+            if assigned.any()
+            else None
+        ),
+        "assigned_cases": int(assigned.sum()),
+        "unassigned_cases": int((~assigned).sum()),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+    if solver_message:
+        summary["solver_message"] = solver_message
+    return summary
@@ -0,0 +1,159 @@
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from Main.AllocationResultStore import load_result
+from config.AllocationConfig import MAP_RAW_POINTS_ZOOM, MAP_CACHE_SIZE
+
+MAX_ZOOM = 22
+# Grid cells per 256px map tile side, i.e. clusters roughly 64px apart on screen
+CELLS_PER_TILE = 4
+
+FOS_PALETTE = [
+    "#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#42d4f4",
+    "#f032e6", "#469990", "#9a6324", "#800000", "#808000", "#000075",
+    "#bfef45", "#dcbeff", "#aaffc3", "#ffd8b1", "#a9a9a9", "#fabed4",
+]
+
+_clusters_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def fos_colour(fos_id) -> str:
+    """Stable marker colour for a FOS, the same on every zoom level and request."""
+    if fos_id is None or (isinstance(fos_id, float) and np.isnan(fos_id)):
+        return "#808080"
+    # IDs read back as floats (e.g. 101.0) must colour like their integer form
+    if isinstance(fos_id, (float, np.floating)) and float(fos_id).is_integer():
+        fos_id = int(fos_id)
+    return FOS_PALETTE[zlib.crc32(str(fos_id).encode("utf-8")) % len(FOS_PALETTE)]
+
+
+def cell_size(zoom: int) -> float:
+    """Grid cell size in degrees for a web-map zoom level."""
+    return 360.0 / (2**zoom * CELLS_PER_TILE)
+
+
+def build_clusters(assignments: pd.DataFrame, zoom: int) -> pd.DataFrame:
+    """
+    Bucket every case of an allocation into a lat/lng grid for one zoom level.
+    Each cluster carries its case count, centroid, the FOS owning most of its
+    cases (with that FOS's colour) and how many FOS it spans.
+    """
+    size = cell_size(zoom)
+    cases = pd.DataFrame(
+        {
+            "lat": pd.to_numeric(assignments["latitude"], errors="coerce"),
+            "long": pd.to_numeric(assignments["longitude"], errors="coerce"),
+            "fos_id": assignments["Assigned_FOS_ID"],
+            "fos": assignments["Assigned_FOS"],
+        }
+    ).dropna(subset=["lat", "long"])
+    cases["cell_x"] = np.floor((cases["long"] + 180) / size).astype(np.int64)
+    cases["cell_y"] = np.floor((cases["lat"] + 90) / size).astype(np.int64)
+
+    cells = cases.groupby(["cell_x", "cell_y"], sort=False)
+    clusters = cells.agg(
+        count=("lat", "size"),
+        lat=("lat", "mean"),
+        long=("long", "mean"),
+        fos_count=("fos_id", "nunique"),
+    )
+
+    # Dominant FOS per cell: largest (cell, FOS) group
+    per_fos = (
+        cases.groupby(["cell_x", "cell_y", "fos_id", "fos"], sort=False, dropna=False)
+        .size()
+        .reset_index(name="fos_cases")
+        .sort_values("fos_cases", ascending=False, kind="stable")
+        .drop_duplicates(["cell_x", "cell_y"])
+        .set_index(["cell_x", "cell_y"])
+    )
+    clusters = clusters.join(per_fos[["fos_id", "fos", "fos_cases"]]).reset_index()
+    clusters["colour"] = clusters["fos_id"].map(fos_colour)
+    return clusters.rename(
+        columns={"fos_id": "dominant_fos_id", "fos": "dominant_fos", "fos_cases": "dominant_fos_cases"}
+    )
+
+
+def get_clusters(result_id: str, zoom: int) -> pd.DataFrame:
+    """Clusters for one result and zoom level, built on first use and cached."""
+    key = (result_id, zoom)
+    with _cache_lock:
+        if key in _clusters_cache:
+            _clusters_cache.move_to_end(key)
+            return _clusters_cache[key]
+
+    clusters = build_clusters(load_result(result_id)["assignments"], zoom)
+
+    with _cache_lock:
+        _clusters_cache[key] = clusters
+        while len(_clusters_cache) > MAP_CACHE_SIZE:
+            _clusters_cache.popitem(last=False)
+    return clusters
+
+
+def _in_bbox(lat, long, min_lat, min_lng, max_lat, max_lng):
+    lat = pd.to_numeric(lat, errors="coerce")
+    long = pd.to_numeric(long, errors="coerce")
+    return ((lat >= min_lat) & (lat <= max_lat) & (long >= min_lng) & (long <= max_lng)).to_numpy()
+
+
+def get_map_view(result_id, min_lat, min_lng, max_lat, max_lng, zoom) -> dict:
+    """
+    Map markers for a bounding box: grid clusters below MAP_RAW_POINTS_ZOOM,
+    individual case points from that zoom in. FOS inside the box are always
+    returned with their colour.
+    """
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"zoom must be between 0 and {MAX_ZOOM}.")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="Invalid bounding box.")
+
+    result = load_result(result_id)
+    fos = result["fos"]
+    fos = fos[_in_bbox(fos["latitude"], fos["longitude"], min_lat, min_lng, max_lat, max_lng)]
+    response = {
+        "result_id": result_id,
+        "zoom": zoom,
+        "fos_locations": pd.DataFrame(
+            {
+                "lat": fos["latitude"],
+                "long": fos["longitude"],
+                "name": fos["E_Name"],
+                "fos_id": fos["E_ID"],
+                "colour": fos["E_ID"].map(fos_colour),
+            }
+        ).to_dict(orient="records"),
+    }
+
+    if zoom >= MAP_RAW_POINTS_ZOOM:
+        cases = result["assignments"]
+        cases = cases[
+            _in_bbox(cases["latitude"], cases["longitude"], min_lat, min_lng, max_lat, max_lng)
+        ]
+        points = pd.DataFrame(
+            {
+                "lat": cases["latitude"],
+                "long": cases["longitude"],
+                "Cus_Add": cases["Cus_Add"] if "Cus_Add" in cases.columns else None,
+                "fos": cases["Assigned_FOS"],
+                "fos_id": cases["Assigned_FOS_ID"],
+                "colour": cases["Assigned_FOS_ID"].map(fos_colour),
+            }
+        )
+        response["mode"] = "points"
+        response["case_locations"] = points.replace({np.nan: None}).to_dict(orient="records")
+        return response
+
+    clusters = get_clusters(result_id, zoom)
+    clusters = clusters[
+        _in_bbox(clusters["lat"], clusters["long"], min_lat, min_lng, max_lat, max_lng)
+    ]
+    response["mode"] = "clusters"
+    response["clusters"] = (
+        clusters.drop(columns=["cell_x", "cell_y"]).replace({np.nan: None}).to_dict(orient="records")
+    )
+    return response
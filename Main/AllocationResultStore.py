@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from config.AllocationConfig import RESULT_TTL_HOURS, RESULT_CACHE_SIZE
+
+RESULTS_FOLDER = os.path.join("./files", "results")
+os.makedirs(RESULTS_FOLDER, exist_ok=True)
+
+RESULT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Query parameter -> assignment column used by page and download filters
+RESULT_FILTER_COLUMNS = {
+    "fos": "Assigned_FOS",
+    "fos_id": "Assigned_FOS_ID",
+    "district": "District",
+    "status": "assignedStatus",
+}
+
+# Field added to paged and NDJSON rows: the row's 0-based number in the
+# stored result, unchanged by filters; /upload-to-db overrides use it
+ROW_FIELD = "row"
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _result_path(result_id: str) -> str:
+    if not RESULT_ID_PATTERN.match(result_id or ""):
+        raise HTTPException(status_code=404, detail="Result not found.")
+    return os.path.join(RESULTS_FOLDER, f"{result_id}.pkl")
+
+
+def _prune_expired():
+    cutoff = time.time() - RESULT_TTL_HOURS * 3600
+    for file_name in os.listdir(RESULTS_FOLDER):
+        file_path = os.path.join(RESULTS_FOLDER, file_name)
+        try:
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+        except OSError:
+            pass
+
+
+def save_result(assignments: pd.DataFrame, fos: pd.DataFrame, summary: dict) -> str:
+    """
+    Persist an allocation (assigned rows, FOS locations and summary) and
+    return its result id. Results older than RESULT_TTL_HOURS are removed.
+    """
+    _prune_expired()
+    result_id = uuid.uuid4().hex
+    result = {
+        "assignments": assignments.reset_index(drop=True),
+        "fos": fos.reset_index(drop=True),
+        "summary": summary,
+        "created_at": time.time(),
+    }
+    temp_path = _result_path(result_id) + ".tmp"
+    pd.to_pickle(result, temp_path)
+    os.replace(temp_path, _result_path(result_id))
+    return result_id
+
+
+def load_result(result_id: str) -> dict:
+    """
+    Load a stored allocation, keeping the most recently used ones in memory.
+
+    Raises:
+        HTTPException: 404 if the result id is unknown or expired.
+    """
+    with _cache_lock:
+        if result_id in _cache:
+            _cache.move_to_end(result_id)
+            return _cache[result_id]
+
+    file_path = _result_path(result_id)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Result not found.")
+    result = pd.read_pickle(file_path)
+
+    with _cache_lock:
+        _cache[result_id] = result
+        while len(_cache) > RESULT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def filter_assignments(assignments: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """
+    Keep rows matching every given filter; each filter is a list of accepted
+    values for the column named in RESULT_FILTER_COLUMNS.
+    """
+    mask = np.ones(len(assignments), dtype=bool)
+    for name, values in (filters or {}).items():
+        if not values:
+            continue
+        column = RESULT_FILTER_COLUMNS[name]
+        if column not in assignments.columns:
+            raise HTTPException(
+                status_code=400, detail=f"Column '{column}' not found in the result."
+            )
+        series = assignments[column]
+        # Query values arrive as strings; compare IDs and other numbers as text
+        mask &= series.astype(str).isin([str(value) for value in values]).to_numpy()
+    return assignments[mask]
+
+
+def _with_row_numbers(rows: pd.DataFrame) -> pd.DataFrame:
+    # Stored results have a RangeIndex, and filtering keeps the labels
+    return rows.rename_axis(ROW_FIELD).reset_index()
+
+
+def get_result_page(result_id: str, page: int = 1, page_size: int = 500, filters=None) -> dict:
+    """
+    One page of a stored allocation's assigned rows, after filtering. Each
+    row carries its stored row number in ROW_FIELD.
+    """
+    if page < 1 or page_size < 1:
+        raise HTTPException(status_code=400, detail="page and page_size must be greater than 0.")
+    result = load_result(result_id)
+    rows = filter_assignments(result["assignments"], filters)
+    total_rows = len(rows)
+    start = (page - 1) * page_size
+    page_rows = _with_row_numbers(rows.iloc[start : start + page_size])
+    return {
+        "result_id": result_id,
+        "page": page,
+        "page_size": page_size,
+        "total_rows": total_rows,
+        "total_pages": (total_rows + page_size - 1) // page_size,
+        "rows": page_rows.replace({np.nan: None}).to_dict(orient="records"),
+    }
+
+
+def get_result_rows(result_id: str, filters=None) -> pd.DataFrame:
+    """All rows of a stored allocation that match filters."""
+    return filter_assignments(load_result(result_id)["assignments"], filters)
+
+
+def iter_result_ndjson(result_id: str, filters=None, chunk_size: int = 2000):
+    """
+    Newline-delimited JSON of a stored allocation's rows, generated a chunk at
+    a time, each with its stored row number in ROW_FIELD. The result is
+    loaded and filtered before streaming starts, so an unknown id still fails
+    with a proper 404.
+    """
+    rows = get_result_rows(result_id, filters)
+
+    def generate():
+        for start in range(0, len(rows), chunk_size):
+            chunk = _with_row_numbers(rows.iloc[start : start + chunk_size])
+            lines = chunk.to_json(orient="records", lines=True, date_format="iso")
+            yield lines if lines.endswith("\n") else lines + "\n"
+
+    return generate()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import bson
+from pymongo import InsertOne, UpdateMany
+from pymongo.errors import BulkWriteError
+from config.MongoConfig import (
+    MONGO_BULK_BATCH_ROWS,
+    MONGO_BULK_BATCH_MB,
+    MONGO_BULK_PARALLELISM,
+    MONGO_BULK_MAX_REPORTED_FAILURES,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BulkWriteReport:
+    """
+    Outcome of a bulk write: counts over all batches and, for each row that
+    was not written, its row label and the server's error. At most
+    max_reported failures are listed; `failed` always has the full count.
+    """
+
+    def __init__(self, total: int, max_reported: int = MONGO_BULK_MAX_REPORTED_FAILURES):
+        self.total = total
+        self.max_reported = max_reported
+        self.batches = 0
+        self.batches_done = 0
+        self.inserted = 0
+        self.matched = 0
+        self.modified = 0
+        self.failed = 0
+        self.failed_rows = []
+
+    def add_failure(self, row, error: str, code=None):
+        self.failed += 1
+        if len(self.failed_rows) < self.max_reported:
+            self.failed_rows.append({"row": row, "error": error, "code": code})
+
+    def to_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "inserted": self.inserted,
+            "matched": self.matched,
+            "modified": self.modified,
+            "failed": self.failed,
+            # Batches finish in any order; list failures in row order
+            "failed_rows": sorted(self.failed_rows, key=lambda failure: failure["row"]),
+            "failed_rows_truncated": self.failed > len(self.failed_rows),
+        }
+
+
+def plan_batches(sizes, max_rows: int = MONGO_BULK_BATCH_ROWS, max_mb: float = MONGO_BULK_BATCH_MB):
+    """
+    (start, end) ranges splitting operations of the given BSON sizes into
+    batches of at most max_rows operations and about max_mb megabytes. An
+    operation larger than max_mb gets a batch of its own.
+    """
+    max_bytes = max_mb * 1024 * 1024
+    batches = []
+    start, batch_bytes = 0, 0
+    for position, size in enumerate(sizes):
+        if position > start and (position - start >= max_rows or batch_bytes + size > max_bytes):
+            batches.append((start, position))
+            start, batch_bytes = position, 0
+        batch_bytes += size
+    if start < len(sizes):
+        batches.append((start, len(sizes)))
+    return batches
+
+
+async def bulk_write(
+    collection,
+    operations: list,
+    sizes: list,
+    rows: list,
+    report: BulkWriteReport,
+    max_rows: int = MONGO_BULK_BATCH_ROWS,
+    max_mb: float = MONGO_BULK_BATCH_MB,
+    parallelism: int = MONGO_BULK_PARALLELISM,
+    progress=None,
+) -> BulkWriteReport:
+    """
+    Send operations as unordered bulk writes, at most `parallelism` batches
+    in flight. A failing document never stops the rest of its batch; a batch
+    that fails as a whole (network error, timeout) marks each of its rows
+    failed and the other batches still run. rows[i] labels operations[i] in
+    the report; progress(report) is called after each batch.
+    """
+    batches = plan_batches(sizes, max_rows, max_mb)
+    report.batches = len(batches)
+    pending = iter(enumerate(batches, start=1))
+
+    async def write_batch(number, start, end):
+        try:
+            result = await collection.bulk_write(operations[start:end], ordered=False)
+            report.inserted += result.inserted_count
+            report.matched += result.matched_count
+            report.modified += result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            report.inserted += details.get("nInserted", 0)
+            report.matched += details.get("nMatched", 0)
+            report.modified += details.get("nModified", 0)
+            for error in details.get("writeErrors", []):
+                report.add_failure(rows[start + error["index"]], error.get("errmsg"), error.get("code"))
+            for error in details.get("writeConcernErrors", []):
+                logger.warning(f"Bulk write batch {number}: write concern error: {error.get('errmsg')}")
+        except Exception as e:
+            logger.error(f"Bulk write batch {number} failed: {str(e)}")
+            for row in rows[start:end]:
+                report.add_failure(row, str(e))
+        report.batches_done += 1
+        logger.info(
+            f"Bulk write batch {number}/{report.batches} done: "
+            f"{report.inserted + report.matched} written, {report.failed} failed so far"
+        )
+        if progress is not None:
+            progress(report)
+
+    # A fixed set of workers pulling batches keeps at most `parallelism` in flight
+    async def worker():
+        for number, (start, end) in pending:
+            await write_batch(number, start, end)
+
+    await asyncio.gather(*(worker() for _ in range(min(max(1, parallelism), len(batches)))))
+    return report
+
+
+async def bulk_insert(
+    collection,
+    documents: list,
+    rows=None,
+    max_reported: int = MONGO_BULK_MAX_REPORTED_FAILURES,
+    **options,
+) -> BulkWriteReport:
+    """
+    Insert documents in unordered, size-aware batches (see bulk_write).
+    rows labels each document in the report and defaults to its 1-based
+    position. Documents that cannot be encoded as BSON are reported failed
+    without being sent.
+    """
+    rows = list(rows) if rows is not None else list(range(1, len(documents) + 1))
+    report = BulkWriteReport(len(documents), max_reported)
+    operations, sizes, labels = [], [], []
+    for row, document in zip(rows, documents):
+        try:
+            size = len(bson.encode(document))
+        except Exception as e:
+            report.add_failure(row, f"Cannot store document: {str(e)}")
+            continue
+        operations.append(InsertOne(document))
+        sizes.append(size)
+        labels.append(row)
+    return await bulk_write(collection, operations, sizes, labels, report, **options)
+
+
+async def bulk_update_many(collection, updates: list, **options) -> BulkWriteReport:
+    """
+    Apply (row, filter, update) triples as UpdateMany operations in
+    unordered batches (see bulk_write); a failed update is reported under
+    its row label.
+    """
+    report = BulkWriteReport(len(updates))
+    operations = [UpdateMany(query, update) for _, query, update in updates]
+    sizes = [len(bson.encode(query)) + len(bson.encode(update)) for _, query, update in updates]
+    rows = [row for row, _, _ in updates]
+    return await bulk_write(collection, operations, sizes, rows, report, **options)
@@ -0,0 +1,200 @@
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+import pandas as pd
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from config.IngestConfig import MAX_UPLOAD_MB, UPLOAD_CHUNK_KB, UPLOAD_SPOOL_MB
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+SUPPORTED_FORMATS = ("xlsx", "csv", "parquet")
+
+
+def _default_xlsx_engine() -> str:
+    # python-calamine (Rust) parses xlsx several times faster than openpyxl;
+    # it is optional, so fall back to openpyxl when it is not installed.
+    try:
+        import python_calamine  # noqa: F401
+
+        return "calamine"
+    except ImportError:
+        return "openpyxl"
+
+
+XLSX_ENGINE = os.getenv("INGEST_XLSX_ENGINE") or _default_xlsx_engine()
+
+# Most recent parse timings, newest last
+_timings = deque(maxlen=int(os.getenv("INGEST_TIMINGS_KEPT", "100")))
+
+
+class MissingColumnsError(ValueError):
+    """Raised when a file lacks columns the caller declared as required."""
+
+    def __init__(self, missing):
+        self.missing = list(missing)
+        super().__init__(f"Missing required columns: {', '.join(map(str, self.missing))}")
+
+
+def _source_name(source) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return str(getattr(source, "name", None) or getattr(source, "filename", None) or "upload")
+
+
+def detect_format(source, file_format=None) -> str:
+    """File format from an explicit value or the source's extension (default xlsx)."""
+    if file_format:
+        file_format = file_format.lower().lstrip(".")
+    else:
+        name = _source_name(source).lower()
+        file_format = next(
+            (fmt for fmt in SUPPORTED_FORMATS if name.endswith(f".{fmt}")), "xlsx"
+        )
+    if file_format not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Unsupported file format '{file_format}'. Use one of: {', '.join(SUPPORTED_FORMATS)}"
+        )
+    return file_format
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def read_header(source, file_format=None, engine=None) -> list:
+    """Column names of a file, read without parsing its rows."""
+    file_format = detect_format(source, file_format)
+    _rewind(source)
+    try:
+        if file_format == "csv":
+            return pd.read_csv(source, nrows=0).columns.tolist()
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.read_schema(source).names
+        return pd.read_excel(source, nrows=0, engine=engine or XLSX_ENGINE).columns.tolist()
+    finally:
+        _rewind(source)
+
+
+def read_table(
+    source,
+    columns=None,
+    dtypes=None,
+    required=None,
+    file_format=None,
+    engine=None,
+    strip_header=False,
+) -> pd.DataFrame:
+    """
+    Read an xlsx, CSV or Parquet file, parsing only the columns the caller needs.
+
+    The header is read first so missing required columns fail before the rows
+    are parsed. Only the declared columns that exist are then parsed, with the
+    declared dtypes (e.g. str for loan numbers, float for coordinates).
+
+    Args:
+        source: Path or binary file object.
+        columns: Columns to parse; None parses every column.
+        dtypes: {column: dtype} applied while parsing, for columns present.
+        required: Columns that must exist; also parsed.
+        file_format: "xlsx", "csv" or "parquet"; detected from the name if omitted.
+        engine: xlsx engine; defaults to INGEST_XLSX_ENGINE / python-calamine.
+        strip_header: Match header names ignoring surrounding whitespace.
+
+    Raises:
+        MissingColumnsError: If a required column is not in the file.
+    """
+    started = time.perf_counter()
+    file_format = detect_format(source, file_format)
+    engine = engine or XLSX_ENGINE
+    header = read_header(source, file_format, engine)
+    header_seconds = time.perf_counter() - started
+
+    # Map wanted (stripped) names back to the raw header names
+    names = {str(name).strip() if strip_header else name: name for name in header}
+    missing = [column for column in (required or []) if column not in names]
+    if missing:
+        raise MissingColumnsError(missing)
+
+    usecols = None
+    if columns is not None:
+        wanted = list(dict.fromkeys(list(columns) + list(required or [])))
+        usecols = [names[column] for column in wanted if column in names]
+    dtype = {
+        names[column]: column_dtype
+        for column, column_dtype in (dtypes or {}).items()
+        if column in names
+    } or None
+
+    if file_format == "csv":
+        df = pd.read_csv(source, usecols=usecols, dtype=dtype)
+    elif file_format == "parquet":
+        df = pd.read_parquet(source, columns=usecols)
+        if dtype:
+            df = df.astype(dtype)
+    else:
+        df = pd.read_excel(source, usecols=usecols, dtype=dtype, engine=engine)
+    _rewind(source)
+    if strip_header:
+        df.columns = df.columns.str.strip()
+
+    timing = {
+        "file": os.path.basename(_source_name(source)),
+        "format": file_format,
+        "engine": engine if file_format == "xlsx" else None,
+        "rows": len(df),
+        "columns_parsed": len(df.columns),
+        "columns_in_file": len(header),
+        "header_seconds": round(header_seconds, 4),
+        "total_seconds": round(time.perf_counter() - started, 4),
+    }
+    _timings.append(timing)
+    logger.info(
+        f"Parsed {timing['file']} ({file_format}): {timing['rows']} rows, "
+        f"{timing['columns_parsed']}/{timing['columns_in_file']} columns in {timing['total_seconds']}s"
+    )
+    return df
+
+
+async def spool_upload(file: UploadFile, max_mb: float = MAX_UPLOAD_MB):
+    """
+    Copy an upload in chunks into a spooled buffer (in memory while small,
+    on disk once past UPLOAD_SPOOL_MB), rejecting it once it passes max_mb.
+
+    Returns:
+        SpooledTemporaryFile: Rewound buffer; the caller closes it.
+
+    Raises:
+        HTTPException: 413 if the upload is larger than max_mb.
+    """
+    max_bytes = int(max_mb * 2**20)
+    spool = tempfile.SpooledTemporaryFile(max_size=int(UPLOAD_SPOOL_MB * 2**20))
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_KB * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise HTTPException(
+                status_code=413,
+                detail=f"File is larger than the {max_mb:g} MB upload limit.",
+            )
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def recent_timings() -> list:
+    """Parse timings of the most recent files read in this process, newest first."""
+    return list(reversed(_timings))
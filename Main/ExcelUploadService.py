@@ -1,10 +1,14 @@
 import pandas as pd
-import pymongo
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import os
 import pytz
 from datetime import datetime
 import logging
+from Main.ExcelIngest import read_table, MissingColumnsError
+from Main.MongoConnection import assignments_collection
+from Main.BulkWriter import bulk_insert
+from Main.LoanKey import add_loan_keys
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,89 +39,90 @@ EXPECTED_COLUMNS = [
     "assignedStatus",
 ]
 
-def insert_data_from_excel(password: str, file) -> dict:
+async def insert_data_from_excel(password: str, file) -> dict:
     # Validate password
     valid_password = os.getenv("VALID_PASSWORD")
     if password != valid_password:
         raise HTTPException(status_code=401, detail="Invalid password")
 
-    # Load environment variables
-    mongo_uri = os.getenv("ATLAS_MONGO_URI")
-    database_name = os.getenv("MONGO_DATABASE")
-    collection_name = os.getenv("MONGO_COLLECTION")
+    # Shared connection pool (see Main.MongoConnection)
+    collection = assignments_collection()
 
-    if not all([mongo_uri, database_name, collection_name]):
-        raise HTTPException(
-            status_code=500,
-            detail="Missing required environment variables (ATLAS_MONGO_URI, MONGO_DATABASE, or MONGO_COLLECTION)",
-        )
-
-    # Connect to MongoDB
+    # Read the Excel file
     try:
-        client = pymongo.MongoClient(mongo_uri)
-        db = client[database_name]
-        collection = db[collection_name]
-
-        # Read the Excel file
+        # Header names are matched ignoring surrounding whitespace, but case-sensitive
         try:
-            df = pd.read_excel(file)
-            if df.empty:
-                client.close()
-                return {
-                    "message": "The uploaded Excel file is empty.",
-                    "inserted_documents": 0,
-                }
-
-            # Strip whitespace from column names but preserve case
-            df.columns = df.columns.str.strip()
-
-            # Validate columns (case-sensitive)
-            missing_columns = [col for col in EXPECTED_COLUMNS if col not in df.columns]
-            if missing_columns:
-                client.close()
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Excel file is missing required columns: {', '.join(missing_columns)}"
-                )
-
-            # Generate timestamp in Indian Standard Time (IST)
-            indian_timezone = pytz.timezone("Asia/Kolkata")
-            indian_timestamp = datetime.now(indian_timezone)
+            df = await run_in_threadpool(
+                read_table, file, required=EXPECTED_COLUMNS, strip_header=True
+            )
+        except MissingColumnsError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Excel file is missing required columns: {', '.join(e.missing)}"
+            )
+        if df.empty:
+            return {
+                "message": "The uploaded Excel file is empty.",
+                "inserted_documents": 0,
+            }
 
-            # Add required fields if not present, using exact names
-            df["assignedTimestamp"] = indian_timestamp
-            if "acceptanceStatus" not in df.columns:
-                df["acceptanceStatus"] = "pending"  # Set default value
-            if "assignedStatus" not in df.columns:
-                df["assignedStatus"] = "unassigned"  # Set default value
-            if "Distance(KM)" not in df.columns:
-                df["Distance(KM)"] = 0.0  # Set default value
+        # Generate timestamp in Indian Standard Time (IST)
+        indian_timezone = pytz.timezone("Asia/Kolkata")
+        indian_timestamp = datetime.now(indian_timezone)
 
-            # Convert DataFrame to dictionary records
-            records = df.to_dict(orient="records")
+        # Add required fields if not present, using exact names
+        df["assignedTimestamp"] = indian_timestamp
+        if "acceptanceStatus" not in df.columns:
+            df["acceptanceStatus"] = "pending"  # Set default value
+        if "assignedStatus" not in df.columns:
+            df["assignedStatus"] = "unassigned"  # Set default value
+        if "Distance(KM)" not in df.columns:
+            df["Distance(KM)"] = 0.0  # Set default value
 
-            # Insert data into the collection
-            result = collection.insert_many(records)
-            inserted_count = len(result.inserted_ids)
+        # Convert DataFrame to dictionary records, keyed by canonical loan number
+        records = add_loan_keys(df.to_dict(orient="records"))
 
-            logger.info(f"Successfully inserted {inserted_count} documents into {collection_name}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Failed to read Excel file: {str(e)}"
+        )
 
-            client.close()
+    try:
+        # Insert data into the collection in unordered batches; failed rows
+        # are numbered from 1 for the first data row of the file
+        report = await bulk_insert(collection, records)
+        inserted_count = report.inserted
 
-            return {
-                "message": f"Data uploaded successfully to {collection_name} in {database_name} database.",
-                "inserted_documents": inserted_count,
-            }
+        logger.info(f"Successfully inserted {inserted_count} documents into {collection.name}")
 
-        except Exception as e:
-            client.close()
+        if report.failed and not inserted_count:
             raise HTTPException(
-                status_code=400, detail=f"Failed to read Excel file: {str(e)}"
+                status_code=500,
+                detail=f"Failed to connect to MongoDB or insert data: {report.failed_rows[0]['error']}",
             )
-
+        if report.failed:
+            message = (
+                f"Inserted {inserted_count} of {len(records)} rows into {collection.name}; "
+                f"{report.failed} failed."
+            )
+        else:
+            message = f"Data uploaded successfully to {collection.name} in {collection.database.name} database."
+        summary = report.to_dict()
+        return {
+            "message": message,
+            "inserted_documents": inserted_count,
+            "failed_documents": report.failed,
+            "batches": report.batches,
+            "failed_rows": summary["failed_rows"],
+            "failed_rows_truncated": summary["failed_rows_truncated"],
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
-        client.close()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to connect to MongoDB or insert data: {str(e)}",
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,48 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from Main.HaversineKernel import EARTH_RADIUS_KM
+from config.AllocationConfig import K_NEAREST
+
+DEFAULT_K_NEAREST = K_NEAREST
+
+
+def to_unit_vectors(coords) -> np.ndarray:
+    """Convert (n, 2) latitude/longitude degrees into (n, 3) points on the unit sphere."""
+    coords = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    lat, lon = coords[:, 0], coords[:, 1]
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord) -> np.ndarray:
+    """Convert straight-line distance between unit vectors to great-circle km."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class FOSSpatialIndex:
+    """
+    KD-tree over FOS locations projected onto the unit sphere, so Euclidean
+    nearest neighbours are also great-circle nearest neighbours.
+    """
+
+    def __init__(self, fos_coords):
+        self.size = len(fos_coords)
+        self.tree = cKDTree(to_unit_vectors(fos_coords)) if self.size else None
+
+    def query(self, case_coords, k: int):
+        """
+        Find the k nearest FOS for every case.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (distances_km, fos_indices), both of
+            shape (n_cases, min(k, n_fos)) and sorted by distance.
+        """
+        n_cases = len(case_coords)
+        k = max(1, min(int(k), self.size))
+        if self.tree is None or n_cases == 0:
+            return np.empty((n_cases, 0)), np.empty((n_cases, 0), dtype=np.intp)
+
+        chord, indices = self.tree.query(to_unit_vectors(case_coords), k=k, workers=-1)
+        chord = np.asarray(chord).reshape(n_cases, k)
+        indices = np.asarray(indices, dtype=np.intp).reshape(n_cases, k)
+        return chord_to_km(chord), indices
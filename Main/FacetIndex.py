@@ -0,0 +1,108 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config.AllocationConfig import FACET_CACHE_SIZE
+
+FACET_SORTS = ("value", "count")
+
+
+def normalize_value(value):
+    """Whole-number floats come from int columns with blanks; show them as ints."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ColumnFacet:
+    """
+    Distinct values of one column with their counts, ordered by their
+    case-insensitive text form so a prefix maps to one contiguous range.
+    """
+
+    def __init__(self, series: pd.Series):
+        counts = series.value_counts(dropna=True)
+        self.null_count = int(series.isna().sum())
+        values = [normalize_value(value) for value in counts.index.tolist()]
+        labels = [str(value).casefold() for value in values]
+        order = sorted(range(len(values)), key=labels.__getitem__)
+        self.values = [values[i] for i in order]
+        self.labels = [labels[i] for i in order]
+        self.counts = counts.to_numpy()[order] if len(order) else np.array([], dtype=np.int64)
+
+    def prefix_range(self, prefix: str):
+        if not prefix:
+            return 0, len(self.labels)
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.labels, prefix)
+        end = bisect.bisect_left(self.labels, prefix + "\U0010ffff", lo=start)
+        return start, end
+
+    def search(self, prefix="", page=1, page_size=100, sort="value") -> dict:
+        start, end = self.prefix_range(prefix)
+        positions = np.arange(start, end)
+        if sort == "count":
+            positions = positions[np.argsort(-self.counts[start:end], kind="stable")]
+        offset = (page - 1) * page_size
+        positions = positions[offset : offset + page_size]
+        return {
+            "total_values": int(end - start),
+            "null_count": self.null_count,
+            "page": page,
+            "page_size": page_size,
+            "values": [
+                {"value": self.values[i], "count": int(self.counts[i])} for i in positions
+            ],
+        }
+
+
+class FacetIndex:
+    """
+    Per-file facet index, built column by column on first use and cached
+    against the file's (path, size, mtime) so a re-upload starts fresh.
+    """
+
+    def __init__(self, max_files: int):
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def column(self, file_path: str, column_name: str, loader) -> ColumnFacet:
+        """
+        Facet for one column, building it from loader(file_path) if needed.
+
+        Raises:
+            KeyError: If the column is not in the file.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            facets = self._files.get(key)
+            if facets is not None:
+                self._files.move_to_end(key)
+                if column_name in facets:
+                    return facets[column_name]
+
+        df = loader(file_path)
+        if column_name not in df.columns:
+            raise KeyError(column_name)
+        facet = ColumnFacet(df[column_name])
+
+        with self._lock:
+            for stale in [k for k in self._files if k[0] == key[0] and k != key]:
+                del self._files[stale]
+            self._files.setdefault(key, {})[column_name] = facet
+            self._files.move_to_end(key)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return facet
+
+    def build(self, file_path: str, loader):
+        """Index every column of a file up front, e.g. right after upload."""
+        for column_name in loader(file_path).columns:
+            self.column(file_path, column_name, loader)
+
+
+facet_index = FacetIndex(FACET_CACHE_SIZE)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+import pandas as pd
+import pytz
+from Main.ExcelIngest import read_table
+from Main.OutputFormats import arrow_safe
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = "./files"
+COLUMNAR_FOLDER = os.path.join(UPLOAD_FOLDER, "columnar")
+CATALOG_PATH = os.path.join(UPLOAD_FOLDER, "catalog.json")
+os.makedirs(COLUMNAR_FOLDER, exist_ok=True)
+
+indian_timezone = pytz.timezone("Asia/Kolkata")
+_catalog_lock = threading.Lock()
+
+
+def catalog_key(file_path: str) -> str:
+    """Catalog key of an uploaded file, e.g. "cases/March.xlsx"."""
+    return os.path.relpath(os.path.abspath(file_path), os.path.abspath(UPLOAD_FOLDER))
+
+
+def load_catalog() -> dict:
+    if not os.path.exists(CATALOG_PATH):
+        return {}
+    try:
+        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_catalog(catalog: dict):
+    temp_path = f"{CATALOG_PATH}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2, default=str)
+    os.replace(temp_path, CATALOG_PATH)
+
+
+def _copy_and_hash(source, destination: str) -> str:
+    """Copy an uploaded file object to disk, returning its SHA-256."""
+    digest = hashlib.sha256()
+    with open(destination, "wb") as f:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def _write_sidecar(df: pd.DataFrame, sidecar_path: str) -> list:
+    """
+    Write df as Parquet, returning the names of columns that had to be
+    written as text so the catalog can record them.
+    """
+    df, stringified = arrow_safe(df)
+    df.to_parquet(sidecar_path, index=False)
+    return stringified
+
+
+def store_upload(source, folder: str, file_name: str) -> dict:
+    """
+    Save an uploaded workbook into folder and catalog it.
+
+    The xlsx is parsed once here and written as a Parquet sidecar next to its
+    catalog entry (rows, columns, dtypes, content hash, upload time). If a
+    file with identical content is already in the folder, the new name is
+    linked to it and its sidecar is reused instead of parsing again.
+
+    Returns:
+        dict: The catalog entry of the stored file.
+    """
+    file_path = os.path.join(folder, file_name)
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    content_hash = _copy_and_hash(source, temp_path)
+    key = catalog_key(file_path)
+    uploaded_at = datetime.now(indian_timezone).isoformat()
+
+    with _catalog_lock:
+        catalog = load_catalog()
+    duplicate = next(
+        (
+            (other_key, entry)
+            for other_key, entry in catalog.items()
+            if entry.get("sha256") == content_hash
+            and os.path.dirname(other_key) == os.path.dirname(key)
+            and os.path.exists(os.path.join(UPLOAD_FOLDER, other_key))
+        ),
+        None,
+    )
+
+    if duplicate:
+        other_key, other_entry = duplicate
+        os.remove(temp_path)
+        if other_key != key:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            try:
+                os.link(os.path.join(UPLOAD_FOLDER, other_key), file_path)
+            except OSError:
+                shutil.copyfile(os.path.join(UPLOAD_FOLDER, other_key), file_path)
+        entry = {
+            **other_entry,
+            "file_name": file_name,
+            "uploaded_at": uploaded_at,
+            "duplicate_of": other_key if other_key != key else other_entry.get("duplicate_of"),
+        }
+    else:
+        os.replace(temp_path, file_path)
+        df = read_table(file_path)
+        entry = {
+            "file_name": file_name,
+            "rows": int(len(df)),
+            "columns": [str(column) for column in df.columns],
+            "dtypes": {str(column): str(dtype) for column, dtype in df.dtypes.items()},
+            "sha256": content_hash,
+            "uploaded_at": uploaded_at,
+            "sidecar": None,
+            "stringified_columns": [],
+            "duplicate_of": None,
+        }
+        sidecar_name = f"{content_hash}.parquet"
+        try:
+            entry["stringified_columns"] = _write_sidecar(
+                df, os.path.join(COLUMNAR_FOLDER, sidecar_name)
+            )
+            entry["sidecar"] = sidecar_name
+        except Exception as e:
+            logger.warning(f"Columnar sidecar not written for {file_name}: {str(e)}")
+
+    stat = os.stat(file_path)
+    entry["size"] = stat.st_size
+    entry["mtime_ns"] = stat.st_mtime_ns
+
+    with _catalog_lock:
+        catalog = load_catalog()
+        catalog[key] = entry
+        _save_catalog(catalog)
+    return entry
+
+
+def read_workbook(file_path: str, columns=None) -> pd.DataFrame:
+    """
+    Read an uploaded workbook, from its memory-mapped Parquet sidecar when
+    the catalog has one for this exact version of the file, else from xlsx.
+    columns limits the read to those of the listed columns that exist; None
+    reads every column.
+
+    Columns mixing numbers and text are stored as text in the sidecar, so a
+    read that includes one goes to the xlsx to get the original values.
+    """
+    entry = load_catalog().get(catalog_key(file_path))
+    if entry and entry.get("sidecar"):
+        sidecar_path = os.path.join(COLUMNAR_FOLDER, entry["sidecar"])
+        stat = os.stat(file_path)
+        if (
+            os.path.exists(sidecar_path)
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            import pyarrow.parquet as pq
+
+            present = pq.read_schema(sidecar_path).names
+            wanted = present if columns is None else [
+                column for column in dict.fromkeys(columns) if column in present
+            ]
+            if not set(wanted) & set(entry.get("stringified_columns") or []):
+                return pd.read_parquet(
+                    sidecar_path, columns=None if columns is None else wanted, memory_map=True
+                )
+    return read_table(file_path, columns=columns)
+
+
+def list_files(folder: str, details: bool = False):
+    """
+    File names in an upload folder, or with details=True their catalog
+    entries (files uploaded before the catalog existed have no metadata).
+    """
+    file_names = sorted(
+        name for name in os.listdir(folder) if not name.endswith((".part", ".tmp"))
+    )
+    if not details:
+        return file_names
+    catalog = load_catalog()
+    return [
+        catalog.get(catalog_key(os.path.join(folder, name)))
+        or {"file_name": name, "cataloged": False}
+        for name in file_names
+    ]
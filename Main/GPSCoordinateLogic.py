@@ -1,70 +1,87 @@
+import asyncio
 import pandas as pd
-import requests
-from typing import List, Tuple, Optional
-from config.GpsConfig import API_KEYS  # Import from config
-
-
-def get_lat_lon(address: str, api_key: str) -> Tuple[Optional[float], Optional[float]]:
+from typing import Callable, List, Optional
+from config.GpsConfig import API_KEYS, GEOCODE_CHECKPOINT_EVERY  # Import from config
+from Main.ExcelIngest import read_table, MissingColumnsError
+from Main.Geocoder import AsyncGeocoder, NO_GPS
+from Main.GeocodeCache import GeocodeCache, geocode_cache, normalize_addresses
+from Main.Gazetteer import (
+    Gazetteer,
+    gazetteer as default_gazetteer,
+    resolve_gazetteer_mode,
+    PRECISION_INPUT,
+    PRECISION_ADDRESS,
+    PRECISION_PINCODE,
+    PRECISION_NONE,
+)
+
+
+def read_addresses(source, file_format: Optional[str] = None) -> pd.DataFrame:
     """
-    Fetch GPS coordinates for a given address using the HERE Geocoding API.
-
-    Args:
-        address (str): The address to geocode.
-        api_key (str): The API key for HERE Geocoding API.
+    Read a file of addresses, checking for the 'Cus_Add' column from the header
+    before any rows are parsed.
 
-    Returns:
-        Tuple[Optional[float], Optional[float]]: Latitude and longitude as floats, "noGPS" for no results, or None for errors.
+    Raises:
+        ValueError: If 'Cus_Add' column is not found in the file.
     """
-    base_url = "https://geocode.search.hereapi.com/v1/geocode"
-    params = {"q": address, "apikey": api_key}
-
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-        if data["items"]:
-            position = data["items"][0]["position"]
-            return float(position["lat"]), float(position["lng"])
-        else:
-            print(f"No GPS coordinates found for address: {address}")
-            return "noGPS", "noGPS"
-
-    except requests.exceptions.HTTPError as e:
-        if response.status_code == 429:
-            print("Error: Rate limit exceeded. HTTP Status code: 429")
-            return None, None
-        else:
-            print(
-                f"Error: Failed to retrieve data. HTTP Status code: {response.status_code}"
-            )
-            return None, None
-    except Exception as e:
-        print(f"Error: Failed to fetch coordinates for {address}. Error: {str(e)}")
-        return None, None
+        return read_table(source, required=["Cus_Add"], file_format=file_format)
+    except MissingColumnsError:
+        raise ValueError("Column 'Cus_Add' not found in the Excel file.")
 
 
-def process_dataframe(file_path: str, api_keys: List[str] = API_KEYS) -> str:
+async def add_gps_coordinates_async(
+    df: pd.DataFrame,
+    api_keys: List[str] = API_KEYS,
+    stats: Optional[dict] = None,
+    refresh_no_gps: bool = False,
+    cache: GeocodeCache = geocode_cache,
+    no_gps_since: Optional[float] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    gazetteer_mode: Optional[str] = None,
+    gazetteer: Gazetteer = default_gazetteer,
+    geocoder: Optional[AsyncGeocoder] = None,
+) -> pd.DataFrame:
     """
-    Process an Excel file to add GPS coordinates to the 'Cus_Add' column.
+    Fill 'latitude' and 'longitude' for each 'Cus_Add' address that has none.
+
+    Addresses are matched on their normalized form, so each distinct address
+    is resolved once per call: from the persistent geocode cache when it is
+    there, otherwise by geocoding concurrently (see Main.Geocoder.AsyncGeocoder).
+    Answers are written to the cache every GEOCODE_CHECKPOINT_EVERY addresses,
+    so a run that is interrupted or runs out of API keys picks up where it
+    stopped when called again.
+
+    The offline gazetteer places addresses by PIN code or locality centroid:
+    with gazetteer_mode "first" every address with a known PIN code is placed
+    that way without asking the provider; with "fallback" only addresses the
+    provider cannot place are. What placed each row is recorded in a
+    'gps_precision' column: "input" (coordinates already in the file),
+    "address", "pincode", "locality" or "none".
 
     Args:
-        file_path (str): Path to the input Excel file.
+        df (pd.DataFrame): Rows with a 'Cus_Add' column; updated in place.
         api_keys (List[str]): List of API keys for HERE Geocoding API. Defaults to API_KEYS from config.
+        stats (dict): If given, row, address, cache hit/miss and request counts are added to it.
+        refresh_no_gps (bool): Ask the provider again for addresses cached as "noGPS".
+        cache (GeocodeCache): Cache to consult and fill.
+        no_gps_since (float): Ask again for "noGPS" answers cached before this timestamp.
+        progress (callable): Called as progress(rows_done, rows_total) as addresses resolve.
+        gazetteer_mode (str): "first", "fallback" or "off". Defaults to GAZETTEER_MODE from config.
+        gazetteer (Gazetteer): Offline PIN code and locality lookup.
+        geocoder (AsyncGeocoder): Geocoder to share across calls, e.g. the chunks
+            of one file, so they reuse its HTTP pool and rate buckets; the caller
+            closes it. By default a geocoder is opened for this call.
 
     Returns:
-        str: Path to the output Excel file with GPS coordinates.
+        pd.DataFrame: df with latitude, longitude and gps_precision columns.
 
     Raises:
-        ValueError: If 'Cus_Add' column is not found in the Excel file or no API keys are available.
+        ValueError: If no API keys are available or the gazetteer mode is unknown.
     """
     if not api_keys:
         raise ValueError("No API keys provided or loaded from .env file.")
-
-    df = pd.read_excel(file_path)
-
-    if "Cus_Add" not in df.columns:
-        raise ValueError("Column 'Cus_Add' not found in the Excel file.")
+    gazetteer_mode = resolve_gazetteer_mode(gazetteer_mode)
 
     if "latitude" not in df.columns:
         print("latitude column not found, creating...")
@@ -73,40 +90,164 @@ def process_dataframe(file_path: str, api_keys: List[str] = API_KEYS) -> str:
         print("longitude column not found, creating...")
         df["longitude"] = pd.NA
 
-    exhausted_keys = set()
+    # Results mix floats and "noGPS", so hold them in object columns
+    df["latitude"] = df["latitude"].astype(object)
+    df["longitude"] = df["longitude"].astype(object)
+
+    missing = (df["latitude"].isna() | df["longitude"].isna()).to_numpy().copy()
+    if "gps_precision" not in df.columns:
+        df["gps_precision"] = None
+    df["gps_precision"] = df["gps_precision"].astype(object)
+    df.loc[~missing & df["gps_precision"].isna().to_numpy(), "gps_precision"] = PRECISION_INPUT
+
+    located = {}
+    if gazetteer_mode == "first" and missing.any():
+        # PIN code centroids first; only the rest goes to cache and provider
+        located["first"] = await asyncio.to_thread(
+            gazetteer.locate, df.loc[missing, "Cus_Add"], (PRECISION_PINCODE,)
+        )
+        placed = located["first"].dropna(subset=["latitude"])
+        df.loc[placed.index, ["latitude", "longitude", "gps_precision"]] = placed.to_numpy()
+        missing &= ~df.index.isin(placed.index)
+
+    address_keys = normalize_addresses(df.loc[missing, "Cus_Add"])
+
+    # Resolve each distinct address once: blanks need no lookup, the cache
+    # answers what it knows, and only the rest goes to the provider
+    unique_keys = [key for key in address_keys.unique() if key]
+    resolved = {"": (NO_GPS, NO_GPS)}
+    cached = await asyncio.to_thread(
+        cache.get_many, unique_keys, refresh_no_gps, no_gps_since
+    )
+    resolved.update(cached)
+    to_fetch = [key for key in unique_keys if key not in cached]
+
+    # Rows behind each address, to report progress in rows
+    rows_per_key = address_keys.value_counts()
+    rows_total = int(missing.sum())
+    rows_done = rows_total - int(rows_per_key.reindex(to_fetch).sum())
+    if progress is not None:
+        progress(rows_done, rows_total)
+
+    # Send the first original spelling of each address to the provider
+    first_spelling = (
+        df.loc[missing, "Cus_Add"].astype(str).groupby(address_keys.to_numpy()).first()
+    )
+    addresses = [first_spelling[key] for key in to_fetch]
+    completed = 0
+    checkpoint = {}
+    # Checkpoint writes run in worker threads so SQLite never blocks the loop
+    checkpoint_writes = []
+
+    def report_progress(position, result):
+        nonlocal completed, rows_done
+        completed += 1
+        key = to_fetch[position]
+        checkpoint[key] = result
+        rows_done += int(rows_per_key[key])
+        if len(checkpoint) >= GEOCODE_CHECKPOINT_EVERY:
+            checkpoint_writes.append(
+                asyncio.ensure_future(asyncio.to_thread(cache.put_many, dict(checkpoint)))
+            )
+            checkpoint.clear()
+        if progress is not None:
+            progress(rows_done, rows_total)
+        if completed % 100 == 0:
+            print(f"Processed {completed} of {len(addresses)} addresses so far.")
+
+    requests_made = 0
+    keys_exhausted = False
+    if addresses:
+        owns_geocoder = geocoder is None
+        if owns_geocoder:
+            geocoder = AsyncGeocoder(api_keys)
+        requests_before = geocoder.stats["requests"]
+        try:
+            results = await geocoder.geocode_many(addresses, on_result=report_progress)
+        finally:
+            if owns_geocoder:
+                await geocoder.aclose()
+            # Keep whatever was fetched, even if the run was cancelled
+            checkpoint_writes.append(
+                asyncio.ensure_future(asyncio.to_thread(cache.put_many, dict(checkpoint)))
+            )
+            await asyncio.gather(*checkpoint_writes)
+        print(f"Geocoding finished: {geocoder.stats}")
+        requests_made = geocoder.stats["requests"] - requests_before
+        keys_exhausted = geocoder.exhausted
+        resolved.update(zip(to_fetch, results))
+
+    if missing.any():
+        answers = address_keys.map(lambda key: resolved.get(key, (None, None)))
+        df.loc[missing, "latitude"] = [lat for lat, _ in answers]
+        df.loc[missing, "longitude"] = [lng for _, lng in answers]
+        df.loc[missing, "gps_precision"] = [
+            PRECISION_NONE if lat in (NO_GPS, None) else PRECISION_ADDRESS for lat, _ in answers
+        ]
+
+        unplaced = df.index[missing][
+            (df.loc[missing, "gps_precision"] == PRECISION_NONE).to_numpy()
+        ]
+        if gazetteer_mode != "off" and len(unplaced):
+            located["fallback"] = await asyncio.to_thread(
+                gazetteer.locate, df.loc[unplaced, "Cus_Add"]
+            )
+            placed = located["fallback"].dropna(subset=["latitude"])
+            df.loc[placed.index, ["latitude", "longitude", "gps_precision"]] = placed.to_numpy()
+
+    if stats is not None:
+        for name, count in (
+            ("rows_needing_gps", int(missing.sum())),
+            ("unique_addresses", len(unique_keys)),
+            ("cache_hits", len(cached)),
+            ("cache_misses", len(to_fetch)),
+            ("api_requests", requests_made),
+        ):
+            stats[name] = stats.get(name, 0) + count
+        for located_rows in located.values():
+            for tier, count in located_rows["gps_precision"].value_counts().items():
+                stats[f"gazetteer_{tier}"] = stats.get(f"gazetteer_{tier}", 0) + int(count)
+        stats["keys_exhausted"] = stats.get("keys_exhausted", False) or keys_exhausted
+
+    # Ensure latitude and longitude are float type, with "noGPS" preserved
+    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce").fillna("noGPS")
+    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce").fillna("noGPS")
+    return df
 
-    for index, row in df.iterrows():
-        if index > 0 and index % 100 == 0:
-            print(f"Processed {index} rows so far.")
 
-        if pd.notna(row["latitude"]) and pd.notna(row["longitude"]):
-            continue
+def add_gps_coordinates(
+    df: pd.DataFrame,
+    api_keys: List[str] = API_KEYS,
+    stats: Optional[dict] = None,
+    refresh_no_gps: bool = False,
+    gazetteer_mode: Optional[str] = None,
+) -> pd.DataFrame:
+    """Blocking form of add_gps_coordinates_async, for callers outside an event loop."""
+    return asyncio.run(
+        add_gps_coordinates_async(
+            df, api_keys, stats, refresh_no_gps, gazetteer_mode=gazetteer_mode
+        )
+    )
 
-        api_key_exhausted = True
-        for current_api_key in [key for key in api_keys if key not in exhausted_keys]:
-            lat, lng = get_lat_lon(row["Cus_Add"], current_api_key)
 
-            if lat is None and lng is None:
-                print(
-                    f"Rate limit or error encountered with API key: {current_api_key}. Trying next API key..."
-                )
-                exhausted_keys.add(current_api_key)
-                continue
+def process_dataframe(file_path: str, api_keys: List[str] = API_KEYS) -> str:
+    """
+    Process an Excel file to add GPS coordinates to the 'Cus_Add' column.
 
-            df.at[index, "latitude"] = lat
-            df.at[index, "longitude"] = lng
-            api_key_exhausted = False
-            break
+    Args:
+        file_path (str): Path to the input Excel file.
+        api_keys (List[str]): List of API keys for HERE Geocoding API. Defaults to API_KEYS from config.
 
-        if api_key_exhausted:
-            print(
-                f"Error: All API keys exhausted at row {index}. Stopping the process."
-            )
-            break
+    Returns:
+        str: Path to the output Excel file with GPS coordinates.
 
-    # Ensure latitude and longitude are float type, with "noGPS" preserved
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce").fillna("noGPS")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce").fillna("noGPS")
+    Raises:
+        ValueError: If 'Cus_Add' column is not found in the Excel file or no API keys are available.
+    """
+    if not api_keys:
+        raise ValueError("No API keys provided or loaded from .env file.")
+
+    df = add_gps_coordinates(read_addresses(file_path), api_keys)
 
     output_path = file_path.replace(".xlsx", "_with_GPS.xlsx")
     df.to_excel(output_path, index=False)
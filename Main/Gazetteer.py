@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from config.GpsConfig import GAZETTEER_PATH, GAZETTEER_LOCALITY_COLUMNS, GAZETTEER_MODE
+from Main.ExcelIngest import read_table
+from Main.GeocodeCache import normalize_addresses
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GAZETTEER_MODES = ("first", "fallback", "off")
+
+# Precision tiers recorded per row in the 'gps_precision' column
+PRECISION_INPUT = "input"
+PRECISION_ADDRESS = "address"
+PRECISION_PINCODE = "pincode"
+PRECISION_LOCALITY = "locality"
+PRECISION_NONE = "none"
+
+# The last 6-digit PIN code in an address ("560001" or "560 001"); the
+# greedy prefix makes the match the rightmost one, where PINs are written
+_PIN_PATTERN = r".*(?<!\d)([1-9]\d{2}) ?(\d{3})(?!\d)"
+
+_INDEX_ARRAYS = ("pincodes", "pin_lat", "pin_lng", "localities", "loc_lat", "loc_lng")
+
+
+def extract_pincodes(addresses: pd.Series) -> np.ndarray:
+    """Last PIN code in each address as an int, or 0 where there is none."""
+    parts = addresses.astype(str).where(addresses.notna(), "").str.extract(_PIN_PATTERN)
+    pins = pd.to_numeric(parts[0] + parts[1], errors="coerce")
+    return pins.fillna(0).to_numpy(dtype=np.int64)
+
+
+def resolve_gazetteer_mode(mode=None) -> str:
+    """
+    Gazetteer mode from an explicit value, else GAZETTEER_MODE.
+
+    Raises:
+        ValueError: If the mode is not one of GAZETTEER_MODES.
+    """
+    mode = (mode or GAZETTEER_MODE).lower()
+    if mode not in GAZETTEER_MODES:
+        raise ValueError(
+            f"Unsupported gazetteer mode '{mode}'. Use one of: {', '.join(GAZETTEER_MODES)}"
+        )
+    return mode
+
+
+class Gazetteer:
+    """
+    Offline PIN code and locality -> centroid lookup.
+
+    The source table (xlsx, CSV or Parquet) needs pincode, latitude and
+    longitude columns, matched case-insensitively; rows of one PIN code (one
+    per post office) are averaged into its centroid. Names in any of the
+    locality columns (districts by default) give a coarser centroid for
+    addresses without a known PIN code.
+
+    The table is compiled once into sorted .npy arrays in a folder next to
+    the source, rebuilt when the source changes, and memory-mapped, so
+    lookups are binary searches over arrays shared with the page cache. When
+    the source file does not exist the gazetteer is unavailable and finds
+    nothing.
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH, locality_columns=GAZETTEER_LOCALITY_COLUMNS):
+        self.path = path
+        self.locality_columns = [name.lower() for name in locality_columns]
+        self.index_folder = f"{path}.index"
+        self._arrays = None
+        self._source_stamp = None
+        self._lock = threading.Lock()
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _build_index(self, stamp):
+        df = read_table(self.path)
+        df.columns = [str(column).strip().lower() for column in df.columns]
+        missing = [name for name in ("pincode", "latitude", "longitude") if name not in df.columns]
+        if missing:
+            raise ValueError(f"Gazetteer is missing columns: {', '.join(missing)}")
+
+        df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+        df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+        df = df[df["latitude"].between(-90, 90) & df["longitude"].between(-180, 180)]
+
+        pins = df.assign(pincode=extract_pincodes(df["pincode"].astype(str)))
+        pins = pins[pins["pincode"] > 0].groupby("pincode")[["latitude", "longitude"]].mean().round(6)
+
+        names = [
+            df[[column, "latitude", "longitude"]].rename(columns={column: "name"})
+            for column in self.locality_columns
+            if column in df.columns
+        ]
+        localities = pd.concat(names) if names else pd.DataFrame(columns=["name", "latitude", "longitude"])
+        localities["name"] = normalize_addresses(localities["name"])
+        localities = (
+            localities[localities["name"] != ""]
+            .groupby("name")[["latitude", "longitude"]]
+            .mean()
+            .round(6)
+            .sort_index()
+        )
+
+        arrays = {
+            "pincodes": pins.index.to_numpy(dtype=np.int64),
+            "pin_lat": pins["latitude"].to_numpy(dtype=np.float64),
+            "pin_lng": pins["longitude"].to_numpy(dtype=np.float64),
+            "localities": localities.index.to_numpy(dtype=str),
+            "loc_lat": localities["latitude"].to_numpy(dtype=np.float64),
+            "loc_lng": localities["longitude"].to_numpy(dtype=np.float64),
+        }
+        os.makedirs(self.index_folder, exist_ok=True)
+        for name, values in arrays.items():
+            np.save(os.path.join(self.index_folder, f"{name}.npy"), values)
+        with open(os.path.join(self.index_folder, "source.json"), "w") as f:
+            json.dump(stamp, f)
+        logger.info(
+            f"Gazetteer index built: {len(pins)} PIN codes, {len(localities)} localities"
+        )
+
+    def _load(self):
+        """Memory-mapped index arrays, or None when there is no gazetteer."""
+        if not os.path.exists(self.path):
+            return None
+        stamp = self._stamp()
+        with self._lock:
+            if self._arrays is not None and self._source_stamp == stamp:
+                return self._arrays
+            stamp_path = os.path.join(self.index_folder, "source.json")
+            built_from = None
+            if os.path.exists(stamp_path):
+                with open(stamp_path) as f:
+                    built_from = json.load(f)
+            if built_from != stamp:
+                self._build_index(stamp)
+            self._arrays = {
+                name: np.load(os.path.join(self.index_folder, f"{name}.npy"), mmap_mode="r")
+                for name in _INDEX_ARRAYS
+            }
+            self._source_stamp = stamp
+            return self._arrays
+
+    @property
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def locate_pincodes(self, addresses: pd.Series):
+        """
+        Centroid of the PIN code in each address.
+
+        Returns:
+            (latitude, longitude, found): float arrays (NaN where not found)
+            and a boolean mask of the addresses placed.
+        """
+        return self._lookup("pincodes", "pin_lat", "pin_lng", extract_pincodes(addresses))
+
+    def locate_localities(self, addresses: pd.Series):
+        """
+        Centroid of the last known locality named in each address, as
+        (latitude, longitude, found). Two-word names are matched as well as
+        single words; the match nearest the end of the address wins.
+        """
+        arrays = self._load()
+        count = len(addresses)
+        if arrays is None or not len(arrays["localities"]) or not count:
+            return self._lookup("localities", "loc_lat", "loc_lng", np.full(count, ""))
+
+        words = normalize_addresses(addresses).str.split(" ")
+        words.index = np.arange(count)
+        words = words.explode()
+        position = words.groupby(level=0).cumcount().to_numpy()
+        row = words.index.to_numpy()
+        following = words.groupby(level=0).shift(-1)
+        pairs = (words + " " + following).where(following.notna(), "")
+
+        # Candidates from every word and word pair, ranked by where they end:
+        # later wins, and a pair beats the single word it ends with
+        candidates = pd.DataFrame(
+            {
+                "row": np.concatenate([row, row]),
+                "rank": np.concatenate([position * 2, position * 2 + 3]),
+                "name": np.concatenate([words.fillna("").to_numpy(dtype=str), pairs.to_numpy(dtype=str)]),
+            }
+        )
+        latitude, longitude, found = self._lookup(
+            "localities", "loc_lat", "loc_lng", candidates["name"].to_numpy(dtype=str)
+        )
+        candidates = candidates.assign(latitude=latitude, longitude=longitude)[found]
+        best = candidates.loc[candidates.groupby("row")["rank"].idxmax()]
+
+        latitude = np.full(count, np.nan)
+        longitude = np.full(count, np.nan)
+        latitude[best["row"].to_numpy()] = best["latitude"].to_numpy()
+        longitude[best["row"].to_numpy()] = best["longitude"].to_numpy()
+        return latitude, longitude, ~np.isnan(latitude)
+
+    def _lookup(self, keys_name: str, lat_name: str, lng_name: str, wanted: np.ndarray):
+        latitude = np.full(len(wanted), np.nan)
+        longitude = np.full(len(wanted), np.nan)
+        arrays = self._load()
+        if arrays is None or not len(arrays[keys_name]) or not len(wanted):
+            return latitude, longitude, np.zeros(len(wanted), dtype=bool)
+
+        keys = arrays[keys_name]
+        if keys.dtype.kind == "U":
+            # Longer names would be cut to the array's width before comparing
+            fits = np.char.str_len(wanted) <= keys.dtype.itemsize // 4
+            wanted = wanted.astype(keys.dtype)
+        else:
+            fits = np.ones(len(wanted), dtype=bool)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = fits & (keys[positions] == wanted) & (wanted != wanted.dtype.type())
+        latitude[found] = arrays[lat_name][positions[found]]
+        longitude[found] = arrays[lng_name][positions[found]]
+        return latitude, longitude, found
+
+    def locate(self, addresses: pd.Series, tiers=(PRECISION_PINCODE, PRECISION_LOCALITY)) -> pd.DataFrame:
+        """
+        Place addresses by PIN code, then by locality for those still
+        unplaced. Returns 'latitude', 'longitude' and 'gps_precision' columns
+        on the index of addresses; unplaced rows are NaN.
+        """
+        located = pd.DataFrame(
+            {"latitude": np.nan, "longitude": np.nan, "gps_precision": None},
+            index=addresses.index,
+        )
+        remaining = np.ones(len(addresses), dtype=bool)
+        for tier in tiers:
+            if not remaining.any():
+                break
+            locate_tier = self.locate_pincodes if tier == PRECISION_PINCODE else self.locate_localities
+            latitude, longitude, found = locate_tier(addresses[remaining])
+            rows = np.flatnonzero(remaining)[found]
+            located.iloc[rows, 0] = latitude[found]
+            located.iloc[rows, 1] = longitude[found]
+            located.iloc[rows, 2] = tier
+            remaining[rows] = False
+        return located
+
+
+gazetteer = Gazetteer()
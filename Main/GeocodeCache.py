@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import pandas as pd
+from config.GpsConfig import GEOCODE_CACHE_PATH, GEOCODE_NO_GPS_TTL_DAYS, GEOCODE_TTL_DAYS
+
+STATUS_OK = "ok"
+STATUS_NO_GPS = "noGPS"
+
+# SQLite limits bound parameters per statement; look keys up in batches
+_LOOKUP_BATCH = 500
+
+# Punctuation that does not change where an address is
+_SEPARATORS = r"[\s,.;:#/\\()\[\]{}\-_'\"]+"
+
+
+def normalize_address(address) -> str:
+    """
+    Cache key of an address: Unicode-normalized, case-folded, punctuation
+    turned into single spaces. "Flat 4, M.G. Road" and "flat 4 m g road" share
+    a key. Missing addresses give "".
+    """
+    if address is None or (isinstance(address, float) and pd.isna(address)):
+        return ""
+    return normalize_addresses(pd.Series([address])).iloc[0]
+
+
+def normalize_addresses(addresses: pd.Series) -> pd.Series:
+    """normalize_address for a whole column at once."""
+    text = addresses.astype(str).where(addresses.notna(), "")
+    text = text.map(lambda value: unicodedata.normalize("NFKC", value))
+    return text.str.casefold().str.replace(_SEPARATORS, " ", regex=True).str.strip()
+
+
+class GeocodeCache:
+    """
+    Persistent normalized-address -> (latitude, longitude, status) cache in
+    SQLite. "noGPS" answers expire after no_gps_ttl_days so addresses the
+    provider later learns are asked again; found coordinates expire after
+    ttl_days (0 keeps them forever). Failed lookups are never stored.
+    """
+
+    def __init__(
+        self,
+        path: str = GEOCODE_CACHE_PATH,
+        no_gps_ttl_days: float = GEOCODE_NO_GPS_TTL_DAYS,
+        ttl_days: float = GEOCODE_TTL_DAYS,
+    ):
+        self.path = path
+        self.no_gps_ttl_seconds = no_gps_ttl_days * 86400
+        self.ttl_seconds = ttl_days * 86400
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    address_key TEXT PRIMARY KEY,
+                    latitude REAL,
+                    longitude REAL,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection = connection
+        return self._connection
+
+    def _expired(self, status: str, updated_at: float, now: float, no_gps_since) -> bool:
+        if status == STATUS_NO_GPS:
+            if no_gps_since is not None and updated_at < no_gps_since:
+                return True
+            return now - updated_at > self.no_gps_ttl_seconds
+        return bool(self.ttl_seconds) and now - updated_at > self.ttl_seconds
+
+    def get_many(self, address_keys, refresh_no_gps: bool = False, no_gps_since=None) -> dict:
+        """
+        Cached answers for address_keys as {key: (lat, lng)}, with
+        ("noGPS", "noGPS") for addresses the provider had no match for.
+        Expired entries are left out, as are noGPS entries written before the
+        no_gps_since timestamp (every noGPS entry with refresh_no_gps).
+        """
+        address_keys = list(address_keys)
+        now = time.time()
+        if refresh_no_gps:
+            no_gps_since = now
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(address_keys), _LOOKUP_BATCH):
+                batch = address_keys[start : start + _LOOKUP_BATCH]
+                rows = connection.execute(
+                    "SELECT address_key, latitude, longitude, status, updated_at FROM geocodes "
+                    f"WHERE address_key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, latitude, longitude, status, updated_at in rows:
+                    if self._expired(status, updated_at, now, no_gps_since):
+                        continue
+                    found[key] = (
+                        (STATUS_NO_GPS, STATUS_NO_GPS)
+                        if status == STATUS_NO_GPS
+                        else (latitude, longitude)
+                    )
+        return found
+
+    def put_many(self, results: dict):
+        """Store {key: (lat, lng)} answers; (None, None) failures are skipped."""
+        now = time.time()
+        rows = []
+        for key, (latitude, longitude) in results.items():
+            if latitude is None or longitude is None:
+                continue
+            if latitude == STATUS_NO_GPS:
+                rows.append((key, None, None, STATUS_NO_GPS, now))
+            else:
+                rows.append((key, float(latitude), float(longitude), STATUS_OK, now))
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO geocodes "
+                    "(address_key, latitude, longitude, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(
+                self._connect()
+                .execute("SELECT status, COUNT(*) FROM geocodes GROUP BY status")
+                .fetchall()
+            )
+        return {
+            "addresses": sum(counts.values()),
+            "with_coordinates": counts.get(STATUS_OK, 0),
+            "no_gps": counts.get(STATUS_NO_GPS, 0),
+        }
+
+
+geocode_cache = GeocodeCache()
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+import pandas as pd
+import pytz
+from fastapi import HTTPException
+from config.GpsConfig import API_KEYS, GEOCODE_JOBS_FOLDER, GEOCODE_JOB_TTL_HOURS
+from Main.GPSCoordinateLogic import add_gps_coordinates_async
+from Main.OutputFormats import write_parquet
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+indian_timezone = pytz.timezone("Asia/Kolkata")
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Seconds between writes of a running job's progress to disk
+_STATE_SAVE_INTERVAL = 2.0
+
+# Job states that can be started again with resume()
+RESUMABLE_STATUSES = ("paused", "interrupted", "failed")
+
+
+def _timestamp():
+    return datetime.now(indian_timezone).isoformat()
+
+
+class GeocodeJobs:
+    """
+    Geocoding as background jobs that survive running out of API keys and
+    server restarts.
+
+    Each job has a folder holding its input rows (input.parquet), its state
+    (state.json) and, once finished, its output (output.parquet). Geocoded
+    addresses are checkpointed in the persistent geocode cache as they come
+    in, so resuming a job only asks the provider for addresses it has not
+    answered yet. A job whose keys run out is "paused"; one that was running
+    when the server stopped shows as "interrupted". Both can be resumed.
+
+    Jobs run one at a time, so concurrent jobs never share the per-key rate
+    limits; the others wait as "queued".
+    """
+
+    def __init__(self, folder: str = GEOCODE_JOBS_FOLDER, ttl_hours: float = GEOCODE_JOB_TTL_HOURS):
+        self.folder = folder
+        self.ttl_seconds = ttl_hours * 3600
+        self._states = {}
+        self._tasks = {}
+        self._run_lock = None
+
+    def _job_folder(self, job_id: str) -> str:
+        if not JOB_ID_PATTERN.match(job_id or ""):
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return os.path.join(self.folder, job_id)
+
+    def _save_state(self, state: dict):
+        state_path = os.path.join(self._job_folder(state["job_id"]), "state.json")
+        with open(state_path + ".tmp", "w") as f:
+            json.dump({key: value for key, value in state.items() if not key.startswith("_")}, f)
+        os.replace(state_path + ".tmp", state_path)
+        state["_saved"] = time.monotonic()
+
+    def _load_state(self, job_id: str) -> dict:
+        """
+        State of a job, from memory or its folder.
+
+        Raises:
+            HTTPException: 404 if the job id is unknown or expired.
+        """
+        if job_id in self._states:
+            return self._states[job_id]
+        state_path = os.path.join(self._job_folder(job_id), "state.json")
+        if not os.path.exists(state_path):
+            raise HTTPException(status_code=404, detail="Job not found.")
+        with open(state_path) as f:
+            state = json.load(f)
+        # Left running by a server that has since stopped
+        if state["status"] in ("queued", "running"):
+            state["status"] = "interrupted"
+        self._states[job_id] = state
+        return state
+
+    def _prune_expired(self):
+        if not os.path.isdir(self.folder):
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in os.listdir(self.folder):
+            if job_id in self._tasks:
+                continue
+            job_folder = os.path.join(self.folder, job_id)
+            try:
+                if os.path.getmtime(os.path.join(job_folder, "state.json")) < cutoff:
+                    shutil.rmtree(job_folder, ignore_errors=True)
+                    self._states.pop(job_id, None)
+            except OSError:
+                pass
+
+    async def submit(
+        self,
+        df: pd.DataFrame,
+        file_name: str,
+        api_keys: List[str] = API_KEYS,
+        refresh_no_gps: bool = False,
+        gazetteer_mode: Optional[str] = None,
+    ) -> str:
+        """
+        Store the rows of a 'Cus_Add' file and start geocoding them in the
+        background on the running event loop. Returns the job id.
+        """
+        await asyncio.to_thread(self._prune_expired)
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_folder(job_id), exist_ok=True)
+        await asyncio.to_thread(
+            write_parquet, [df], os.path.join(self._job_folder(job_id), "input.parquet")
+        )
+        state = {
+            "job_id": job_id,
+            "file_name": file_name,
+            "status": "queued",
+            "submitted_at": _timestamp(),
+            # noGPS answers cached before submission are asked again when
+            # refresh_no_gps is set; answers from earlier runs of this job are not
+            "no_gps_since": time.time() if refresh_no_gps else None,
+            "gazetteer_mode": gazetteer_mode,
+            "runs": 0,
+            "rows": len(df),
+            "rows_total": None,
+            "rows_done": None,
+            "stats": {},
+        }
+        self._states[job_id] = state
+        self._save_state(state)
+        self._start(job_id, api_keys)
+        return job_id
+
+    def resume(self, job_id: str, api_keys: List[str] = API_KEYS) -> dict:
+        """
+        Start a paused, interrupted or failed job again from its checkpoint.
+
+        Raises:
+            HTTPException: 404 for unknown jobs, 409 if the job is queued,
+            running or already completed.
+        """
+        state = self._load_state(job_id)
+        if state["status"] not in RESUMABLE_STATUSES:
+            raise HTTPException(
+                status_code=409, detail=f"Job is {state['status']} and cannot be resumed."
+            )
+        state["status"] = "queued"
+        state.pop("error", None)
+        self._save_state(state)
+        self._start(job_id, api_keys)
+        return self.status(job_id)
+
+    def _start(self, job_id: str, api_keys: List[str]):
+        if self._run_lock is None:
+            self._run_lock = asyncio.Lock()
+        task = asyncio.create_task(self._run(job_id, api_keys))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda done: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, api_keys: List[str]):
+        state = self._states[job_id]
+        job_folder = self._job_folder(job_id)
+        async with self._run_lock:
+            state.update(
+                {
+                    "status": "running",
+                    "started_at": _timestamp(),
+                    "finished_at": None,
+                    "runs": state["runs"] + 1,
+                    "_run_started": time.monotonic(),
+                    "_run_rows_done": None,
+                }
+            )
+            self._save_state(state)
+
+            def progress(rows_done, rows_total):
+                if state["_run_rows_done"] is None:
+                    state["_run_rows_done"] = rows_done
+                state["rows_done"] = rows_done
+                state["rows_total"] = rows_total
+                if time.monotonic() - state["_saved"] >= _STATE_SAVE_INTERVAL:
+                    self._save_state(state)
+
+            stats = {}
+            try:
+                df = await asyncio.to_thread(
+                    pd.read_parquet, os.path.join(job_folder, "input.parquet")
+                )
+                df = await add_gps_coordinates_async(
+                    df,
+                    api_keys,
+                    stats,
+                    no_gps_since=state["no_gps_since"],
+                    gazetteer_mode=state.get("gazetteer_mode"),
+                    progress=progress,
+                )
+                if stats["keys_exhausted"]:
+                    state["status"] = "paused"
+                    state["error"] = "All API keys exhausted. Resume the job once quotas reset."
+                else:
+                    await asyncio.to_thread(
+                        write_parquet, [df], os.path.join(job_folder, "output.parquet")
+                    )
+                    state["status"] = "completed"
+            except asyncio.CancelledError:
+                state["status"] = "interrupted"
+                raise
+            except Exception as e:
+                logger.error(f"Geocoding job {job_id} failed: {str(e)}")
+                state["status"] = "failed"
+                state["error"] = f"Job failed: {str(e)}"
+            finally:
+                # Counts of the latest run, plus provider requests over all runs
+                stats.pop("keys_exhausted", None)
+                stats["api_requests_all_runs"] = state["stats"].get(
+                    "api_requests_all_runs", 0
+                ) + stats.get("api_requests", 0)
+                state["stats"] = stats
+                state["finished_at"] = _timestamp()
+                self._save_state(state)
+
+    def status(self, job_id: str) -> dict:
+        """Job state with rows done and remaining and, while running, an ETA."""
+        state = self._load_state(job_id)
+        response = {
+            key: value
+            for key, value in state.items()
+            if not key.startswith("_") and key != "no_gps_since"
+        }
+        rows_total, rows_done = state["rows_total"], state["rows_done"]
+        if rows_total is not None:
+            response["rows_remaining"] = rows_total - rows_done
+            response["percent_done"] = round(100 * rows_done / rows_total, 1) if rows_total else 100.0
+
+        if state["status"] == "running" and state.get("_run_rows_done") is not None:
+            # Rate of this run only: rows answered from the checkpoint are free
+            elapsed = time.monotonic() - state["_run_started"]
+            fetched = rows_done - state["_run_rows_done"]
+            response["elapsed_seconds"] = round(elapsed, 1)
+            if fetched > 0:
+                rate = fetched / elapsed
+                eta_seconds = response["rows_remaining"] / rate
+                response["rows_per_second"] = round(rate, 2)
+                response["eta_seconds"] = round(eta_seconds, 1)
+                response["estimated_completion_at"] = datetime.fromtimestamp(
+                    time.time() + eta_seconds, indian_timezone
+                ).isoformat()
+        return response
+
+    def result(self, job_id: str) -> pd.DataFrame:
+        """
+        Geocoded rows of a completed job.
+
+        Raises:
+            HTTPException: 404 for unknown jobs, 409 until the job has completed.
+        """
+        state = self._load_state(job_id)
+        if state["status"] != "completed":
+            raise HTTPException(status_code=409, detail="Job has not finished yet.")
+        df = pd.read_parquet(os.path.join(self._job_folder(job_id), "output.parquet"))
+        # Stored as text because they mix numbers and "noGPS"
+        for column in ("latitude", "longitude"):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(object).fillna("noGPS")
+        return df
+
+
+geocode_jobs = GeocodeJobs()
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+import httpx
+from config.GpsConfig import (
+    API_KEYS,
+    GEOCODER_URL,
+    GEOCODER_CONCURRENCY,
+    GEOCODER_RATE_PER_KEY,
+    GEOCODER_BURST_PER_KEY,
+    GEOCODER_MAX_RETRIES,
+    GEOCODER_BACKOFF_SECONDS,
+    GEOCODER_TIMEOUT_SECONDS,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NO_GPS = "noGPS"
+
+# Statuses worth retrying with the same key after a pause
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses meaning the key itself is unusable
+REJECTED_KEY_STATUSES = {401, 403}
+
+
+class AllKeysExhaustedError(Exception):
+    """Raised when every API key has been rate limited or rejected."""
+
+
+class TokenBucket:
+    """
+    Allow rate requests per second on average, with bursts of up to capacity.
+    acquire() waits until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncGeocoder:
+    """
+    Geocode many addresses concurrently over one pooled HTTP client.
+
+    Each API key has its own token bucket. A request that gets 429, a 5xx or
+    a network error is retried on the same key with exponential backoff
+    (honouring Retry-After); once retries run out on a 429, or the key is
+    rejected with 401/403, the key is retired and the request moves to the
+    next one. The provider must answer like HERE's geocode API:
+    {"items": [{"position": {"lat": ..., "lng": ...}}]}.
+
+    Use as an async context manager:
+        async with AsyncGeocoder(api_keys) as geocoder:
+            results = await geocoder.geocode_many(addresses)
+    """
+
+    def __init__(
+        self,
+        api_keys: List[str] = API_KEYS,
+        base_url: str = GEOCODER_URL,
+        concurrency: int = GEOCODER_CONCURRENCY,
+        rate_per_key: float = GEOCODER_RATE_PER_KEY,
+        burst_per_key: int = GEOCODER_BURST_PER_KEY,
+        max_retries: int = GEOCODER_MAX_RETRIES,
+        backoff_seconds: float = GEOCODER_BACKOFF_SECONDS,
+        timeout_seconds: float = GEOCODER_TIMEOUT_SECONDS,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        if not api_keys:
+            raise ValueError("No API keys provided or loaded from .env file.")
+        self.api_keys = list(api_keys)
+        self.base_url = base_url
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.buckets = {key: TokenBucket(rate_per_key, burst_per_key) for key in self.api_keys}
+        self.retired_keys = set()
+        self._next_key = 0
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=self.concurrency, max_keepalive_connections=self.concurrency
+            ),
+        )
+        self.stats = {"requests": 0, "retries": 0, "retired_keys": 0}
+        # Set once every key is used up; later geocode_many calls return at once
+        self.exhausted = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
+
+    def _pick_key(self) -> str:
+        """Next usable key, round-robin so load spreads across keys."""
+        live_keys = [key for key in self.api_keys if key not in self.retired_keys]
+        if not live_keys:
+            raise AllKeysExhaustedError("All API keys are rate limited or rejected.")
+        key = live_keys[self._next_key % len(live_keys)]
+        self._next_key += 1
+        return key
+
+    def _retire(self, key: str, reason: str):
+        if key not in self.retired_keys:
+            self.retired_keys.add(key)
+            self.stats["retired_keys"] += 1
+            logger.warning(f"Geocoder key ...{key[-4:]} retired: {reason}")
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_seconds * (2**attempt)
+
+    async def geocode(self, address: str) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Coordinates of one address: (lat, lng) as floats, ("noGPS", "noGPS")
+        when the provider has no match, or (None, None) for an address the
+        provider could not handle.
+
+        Raises:
+            AllKeysExhaustedError: If no API key is left to try.
+        """
+        while True:
+            key = self._pick_key()
+            for attempt in range(self.max_retries + 1):
+                await self.buckets[key].acquire()
+                if key in self.retired_keys:
+                    break
+                response = None
+                try:
+                    self.stats["requests"] += 1
+                    response = await self.client.get(
+                        self.base_url, params={"q": address, "apikey": key}
+                    )
+                except httpx.TransportError as e:
+                    logger.warning(f"Geocoder request failed for {address}: {str(e)}")
+                else:
+                    if response.status_code == 200:
+                        try:
+                            items = response.json().get("items") or []
+                            if not items:
+                                return NO_GPS, NO_GPS
+                            position = items[0]["position"]
+                            return float(position["lat"]), float(position["lng"])
+                        except (ValueError, KeyError, TypeError, AttributeError) as e:
+                            logger.error(f"Geocoder returned an unreadable answer for {address}: {str(e)}")
+                            return None, None
+                    if response.status_code in REJECTED_KEY_STATUSES:
+                        self._retire(key, f"HTTP {response.status_code}")
+                        break
+                    if response.status_code not in RETRY_STATUSES:
+                        logger.error(
+                            f"Geocoder returned HTTP {response.status_code} for address: {address}"
+                        )
+                        return None, None
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt, response))
+            else:
+                # Retries used up: a rate-limited key is retired, a failing
+                # provider is not the key's fault
+                if response is not None and response.status_code == 429:
+                    self._retire(key, "rate limited after retries")
+                else:
+                    return None, None
+
+    async def geocode_many(self, addresses: List[str], on_result=None) -> list:
+        """
+        Geocode addresses with at most `concurrency` requests in flight.
+        Results are in input order; addresses not reached because every key
+        was exhausted are (None, None) and `exhausted` is set. on_result(position, result) is called
+        as each address completes.
+        """
+        results = [(None, None)] * len(addresses)
+        pending = iter(enumerate(addresses))
+
+        # A fixed set of workers pulling from one iterator keeps memory flat
+        # however many addresses there are
+        async def worker():
+            for position, address in pending:
+                if self.exhausted:
+                    return
+                try:
+                    results[position] = await self.geocode(address)
+                except AllKeysExhaustedError:
+                    self.exhausted = True
+                    return
+                if on_result is not None:
+                    on_result(position, results[position])
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(addresses)))))
+        if self.exhausted:
+            logger.error("Error: All API keys exhausted. Stopping the process.")
+        return results
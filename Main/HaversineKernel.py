@@ -0,0 +1,101 @@
+import numpy as np
+from config.AllocationConfig import DISTANCE_BLOCK_SIZE, DISTANCE_DTYPE
+
+EARTH_RADIUS_KM = 6371  # Radius of the Earth in kilometers
+
+# A block holds block_size x n_fos values per temporary, so the block size
+# bounds memory independently of how many cases are in the file.
+DEFAULT_BLOCK_SIZE = DISTANCE_BLOCK_SIZE
+DEFAULT_DTYPE = DISTANCE_DTYPE
+
+ALLOWED_DTYPES = {"float32": np.float32, "float64": np.float64}
+
+
+def resolve_dtype(dtype):
+    """Map a dtype name (or numpy dtype) to float32 / float64."""
+    if isinstance(dtype, str):
+        if dtype not in ALLOWED_DTYPES:
+            raise ValueError(
+                f"Invalid distance dtype '{dtype}'. Use one of: {', '.join(ALLOWED_DTYPES)}"
+            )
+        return ALLOWED_DTYPES[dtype]
+    dtype = np.dtype(dtype).type
+    if dtype not in ALLOWED_DTYPES.values():
+        raise ValueError("Distance dtype must be float32 or float64")
+    return dtype
+
+
+def haversine_pairwise(lat1, lon1, lat2, lon2, dtype=DEFAULT_DTYPE):
+    """
+    Element-wise haversine distance in km between two equally sized coordinate arrays.
+    """
+    dtype = resolve_dtype(dtype)
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(values, dtype=dtype)) for values in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return (EARTH_RADIUS_KM * c).astype(dtype, copy=False)
+
+
+def iter_haversine_blocks(
+    case_coords, fos_coords, block_size=DEFAULT_BLOCK_SIZE, dtype=DEFAULT_DTYPE
+):
+    """
+    Yield (start_row, distances) for consecutive row blocks of the case x FOS
+    distance matrix, where distances has shape (rows_in_block, n_fos).
+
+    Args:
+        case_coords: (n_cases, 2) array-like of latitude, longitude.
+        fos_coords: (n_fos, 2) array-like of latitude, longitude.
+        block_size (int): Number of case rows per block.
+        dtype: "float32" or "float64".
+    """
+    dtype = resolve_dtype(dtype)
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+
+    case_rad = np.radians(np.asarray(case_coords, dtype=dtype).reshape(-1, 2))
+    fos_rad = np.radians(np.asarray(fos_coords, dtype=dtype).reshape(-1, 2))
+
+    # FOS-side terms are shared by every block, compute them once
+    fos_lat = fos_rad[:, 0][np.newaxis, :]
+    fos_lon = fos_rad[:, 1][np.newaxis, :]
+    cos_fos_lat = np.cos(fos_lat)
+
+    for start in range(0, len(case_rad), block_size):
+        block = case_rad[start : start + block_size]
+        case_lat = block[:, 0][:, np.newaxis]
+        case_lon = block[:, 1][:, np.newaxis]
+
+        a = np.sin((fos_lat - case_lat) / 2) ** 2
+        a += np.cos(case_lat) * cos_fos_lat * np.sin((fos_lon - case_lon) / 2) ** 2
+        np.clip(a, 0, 1, out=a)
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        yield start, (EARTH_RADIUS_KM * c).astype(dtype, copy=False)
+
+
+def haversine_matrix(
+    case_coords, fos_coords, block_size=DEFAULT_BLOCK_SIZE, dtype=DEFAULT_DTYPE
+):
+    """
+    Compute the full case x FOS haversine distance matrix in km, block by block.
+
+    Returns:
+        np.ndarray: (n_cases, n_fos) matrix of the requested dtype.
+    """
+    dtype = resolve_dtype(dtype)
+    n_cases = len(case_coords)
+    n_fos = len(fos_coords)
+    distance_matrix = np.empty((n_cases, n_fos), dtype=dtype)
+    if n_cases == 0 or n_fos == 0:
+        return distance_matrix
+
+    for start, block in iter_haversine_blocks(
+        case_coords, fos_coords, block_size=block_size, dtype=dtype
+    ):
+        distance_matrix[start : start + len(block)] = block
+    return distance_matrix
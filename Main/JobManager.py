@@ -0,0 +1,217 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pytz
+from fastapi import HTTPException
+
+indian_timezone = pytz.timezone("Asia/Kolkata")
+
+
+def _timestamp():
+    return datetime.now(indian_timezone).isoformat()
+
+
+def _run_job(target, params, progress_store, job_id):
+    """
+    Worker-process entry point. Runs target(params, progress) and returns a
+    plain dict, so HTTP errors raised by the target survive the trip back to
+    the API process.
+    """
+    progress_store[job_id] = {"stage": None, "started_at": _timestamp()}
+
+    def progress(stage):
+        progress_store[job_id] = {**progress_store[job_id], "stage": stage}
+
+    try:
+        return {"ok": True, "result": target(params, progress)}
+    except HTTPException as e:
+        return {"ok": False, "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        return {"ok": False, "status_code": 500, "detail": f"Job failed: {str(e)}"}
+
+
+class JobManager:
+    """
+    Runs CPU-heavy jobs in a process pool of max_workers processes. Up to
+    max_queued further jobs wait for a free worker; beyond that submissions
+    are rejected with 429. The last `retention` finished jobs are kept for
+    status and result polling.
+    """
+
+    def __init__(self, max_workers=2, max_queued=8, retention=20, stages=()):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.retention = max(1, retention)
+        self.stages = tuple(stages)
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+
+    def start(self):
+        """
+        Start the progress manager process and the worker pool. Blocks while
+        the manager process spawns, so the app calls it from its lifespan in
+        a worker thread; importing a service never starts processes.
+        """
+        with self._lock:
+            self._ensure_pool()
+
+    def shutdown(self):
+        """Cancel queued jobs, wait for running ones and stop the processes."""
+        with self._lock:
+            executor, manager = self._executor, self._manager
+        if executor is None:
+            return
+        executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            manager.shutdown()
+            self._executor = self._manager = self._progress = None
+
+    def _ensure_pool(self):
+        # Normally already done by start(); a JobManager used outside the app
+        # starts its pool on first submit.
+        # "spawn" keeps workers clear of the parent's open Mongo connections.
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context
+            )
+
+    def _pending_jobs(self):
+        return [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["status"] in ("queued", "running")
+        ]
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = _timestamp()
+            job["elapsed_seconds"] = round(time.monotonic() - job["_started"], 3)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {"ok": False, "status_code": 500, "detail": f"Job failed: {str(e)}"}
+            if outcome["ok"]:
+                job["status"] = "completed"
+                job["result"] = outcome["result"]
+            else:
+                job["status"] = "failed"
+                job["error"] = {
+                    "status_code": outcome["status_code"],
+                    "detail": outcome["detail"],
+                }
+            self._trim()
+
+    def _trim(self):
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["status"] in ("completed", "failed")
+        ]
+        for job_id in finished[: max(0, len(finished) - self.retention)]:
+            self.jobs.pop(job_id, None)
+            self._progress.pop(job_id, None)
+
+    def submit(self, target, params: dict) -> str:
+        """
+        Queue target(params, progress) in the pool and return its job id.
+
+        Raises:
+            HTTPException: 429 when every worker is busy and the queue is full.
+        """
+        with self._lock:
+            self._ensure_pool()
+            if len(self._pending_jobs()) >= self.max_workers + self.max_queued:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many jobs in progress. Please try again shortly.",
+                )
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                "status": "queued",
+                "submitted_at": _timestamp(),
+                "_started": time.monotonic(),
+            }
+            future = self._executor.submit(
+                _run_job, target, params, self._progress, job_id
+            )
+            self.jobs[job_id]["_future"] = future
+        future.add_done_callback(lambda done: self._on_done(job_id, done))
+        return job_id
+
+    async def run(self, target, params: dict):
+        """Submit a job and wait for its result without blocking the event loop."""
+        job_id = self.submit(target, params)
+        await asyncio.wrap_future(self.jobs[job_id]["_future"])
+        return self.result(job_id)
+
+    def _get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return job
+
+    def status(self, job_id: str) -> dict:
+        """Job state, current stage and queue position, for polling."""
+        job = self._get(job_id)
+        progress = self._progress.get(job_id) or {}
+        status = job["status"]
+        if status == "queued" and progress:
+            status = "running"
+
+        response = {
+            "job_id": job_id,
+            "status": status,
+            "submitted_at": job["submitted_at"],
+            "started_at": progress.get("started_at"),
+            "finished_at": job.get("finished_at"),
+        }
+        stage = progress.get("stage")
+        if status == "running":
+            response["stage"] = stage
+            if stage in self.stages:
+                response["stage_number"] = self.stages.index(stage) + 1
+                response["total_stages"] = len(self.stages)
+            response["elapsed_seconds"] = round(time.monotonic() - job["_started"], 3)
+        elif status == "queued":
+            queued = [
+                pending
+                for pending in self._pending_jobs()
+                if not self._progress.get(pending)
+            ]
+            response["queue_position"] = queued.index(job_id) + 1
+        else:
+            response["elapsed_seconds"] = job["elapsed_seconds"]
+        if status == "failed":
+            response["error"] = job["error"]
+        return response
+
+    def result(self, job_id: str):
+        """
+        Result of a completed job.
+
+        Raises:
+            HTTPException: 404 for unknown jobs, 409 while the job is still
+            queued or running, and the job's own error when it failed.
+        """
+        job = self._get(job_id)
+        if job["status"] == "failed":
+            raise HTTPException(
+                status_code=job["error"]["status_code"], detail=job["error"]["detail"]
+            )
+        if job["status"] != "completed":
+            raise HTTPException(status_code=409, detail="Job has not finished yet.")
+        return job["result"]
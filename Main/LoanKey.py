@@ -0,0 +1,75 @@
+import pandas as pd
+from Main.LoanNumberMask import clean_loan_numbers
+
+# Field holding the canonical loan number of an assignment document
+LOAN_KEY_FIELD = "loanKey"
+LOAN_NUMBER_FIELD = "LoanNo/CC"
+
+
+def loan_keys(loan_numbers: pd.Series) -> pd.Series:
+    """
+    Canonical text form of loan numbers, so 12345, "12345", " 12345 " and
+    12345.0 (Excel's float) share one key. Blank loan numbers give "".
+    """
+    return clean_loan_numbers(loan_numbers)
+
+
+def add_loan_keys(documents: list, loan_number_field: str = LOAN_NUMBER_FIELD) -> list:
+    """Set LOAN_KEY_FIELD on each document that has a loan number; returns documents."""
+    loan_numbers = pd.Series([document.get(loan_number_field) for document in documents], dtype=object)
+    present = loan_numbers.notna().to_numpy()
+    keys = loan_keys(loan_numbers)
+    for document, has_loan_number, key in zip(documents, present, keys):
+        if has_loan_number and key:
+            document[LOAN_KEY_FIELD] = key
+    return documents
+
+
+def loan_key_filter(keys: list, loan_number_field: str = LOAN_NUMBER_FIELD) -> dict:
+    """
+    Query for documents with any of the canonical loan keys. Documents
+    without a loanKey (backfill failed or disabled, or written by another
+    client) are matched on the raw loan number instead, stored as text or as
+    a number; {loanKey: null} keeps that branch on the loanKey index.
+    """
+    raw_numbers = list(keys) + [int(key) for key in keys if key.isdigit()]
+    return {
+        "$or": [
+            {LOAN_KEY_FIELD: {"$in": list(keys)}},
+            {LOAN_KEY_FIELD: None, loan_number_field: {"$in": raw_numbers}},
+        ]
+    }
+
+
+def _loan_key_expression(field: str = LOAN_NUMBER_FIELD) -> dict:
+    """The same canonical key computed by the server, for backfilling stored documents."""
+    value = f"${field}"
+    # Whole-valued doubles become integers first so 12345.0 prints as "12345"
+    whole = {
+        "$cond": [
+            {
+                "$and": [
+                    {"$in": [{"$type": value}, ["double", "decimal"]]},
+                    {"$eq": [value, {"$floor": value}]},
+                ]
+            },
+            {"$toLong": value},
+            value,
+        ]
+    }
+    text = {"$trim": {"input": {"$toString": whole}}}
+    return {
+        "$let": {
+            "vars": {"text": text},
+            "in": {
+                "$cond": [
+                    {"$regexMatch": {"input": "$$text", "regex": r"\.0$"}},
+                    {"$substrCP": ["$$text", 0, {"$subtract": [{"$strLenCP": "$$text"}, 2]}]},
+                    "$$text",
+                ]
+            },
+        }
+    }
+
+
+LOAN_KEY_EXPRESSION = _loan_key_expression()
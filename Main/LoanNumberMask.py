@@ -0,0 +1,39 @@
+import pandas as pd
+
+MASK_CHAR = "x"
+DEFAULT_VISIBLE_DIGITS = 6
+DEFAULT_TOTAL_LENGTH = 10
+
+
+def clean_loan_numbers(loan_numbers: pd.Series) -> pd.Series:
+    """
+    Loan numbers as text: surrounding whitespace stripped and the '.0' left by
+    Excel storing a number as float removed. Blank cells become "".
+    """
+    # Fill blanks before converting, or NaN/None would become "nan"/"None"
+    cleaned = loan_numbers.where(loan_numbers.notna(), "").astype(str).str.strip()
+    return cleaned.str.removesuffix(".0")
+
+
+def mask_loan_numbers(
+    loan_numbers: pd.Series,
+    visible_digits: int = DEFAULT_VISIBLE_DIGITS,
+    total_length: int = DEFAULT_TOTAL_LENGTH,
+) -> pd.Series:
+    """
+    Mask a column of loan numbers to exactly total_length characters, keeping
+    the last visible_digits characters and filling the rest with 'x'.
+
+    Numbers shorter than visible_digits are zero-padded on the left; blank
+    loan numbers are fully masked. Works on the whole column at once.
+
+    Raises:
+        ValueError: If visible_digits is not between 1 and total_length.
+    """
+    if not 0 < visible_digits <= total_length:
+        raise ValueError("visible_digits must be between 1 and total_length")
+
+    cleaned = clean_loan_numbers(loan_numbers)
+    visible = cleaned.str[-visible_digits:].str.pad(visible_digits, side="left", fillchar="0")
+    masked = MASK_CHAR * (total_length - visible_digits) + visible
+    return masked.where(cleaned != "", MASK_CHAR * total_length)
@@ -1,36 +1,44 @@
 import pandas as pd
+from Main.ExcelIngest import read_table, MissingColumnsError
+from Main.LoanNumberMask import mask_loan_numbers, DEFAULT_VISIBLE_DIGITS, DEFAULT_TOTAL_LENGTH
+
+
+def input_columns(selected_column, desired_columns=None):
+    # Parse only the columns the output needs; "LoanNo/CC" in desired_columns
+    # is the renamed selected column
+    if not desired_columns:
+        return None
+    return [selected_column] + [col for col in desired_columns if col != "LoanNo/CC"]
+
+
+def read_loan_file(source, selected_column, desired_columns=None, file_format=None):
+    # Read the file, validating the selected column from the header
+    try:
+        return read_table(
+            source,
+            columns=input_columns(selected_column, desired_columns),
+            required=[selected_column],
+            file_format=file_format,
+        )
+    except MissingColumnsError:
+        raise ValueError(f"Column '{selected_column}' not found in the file!")
 
 
-def mask_loan_number(loan_no, visible_digits=6, total_length=10):
-    """
-    Mask the loan number to be exactly 'total_length' digits long,
-    while keeping the last 'visible_digits' digits visible.
-    """
-    loan_no = str(loan_no)
-
-    if len(loan_no) < total_length:
-        masked_part = "x" * (total_length - visible_digits)
-        return masked_part + loan_no[-visible_digits:]
-
-    return "x" * (total_length - visible_digits) + loan_no[-visible_digits:]
-
-
-def process_dataframe(file_path, selected_column, desired_columns=None):
-    # Read the Excel file
-    df = pd.read_excel(file_path)
-
+def mask_dataframe(
+    df,
+    selected_column,
+    desired_columns=None,
+    visible_digits=DEFAULT_VISIBLE_DIGITS,
+    total_length=DEFAULT_TOTAL_LENGTH,
+):
     # Log input columns for debugging
     print(f"Input file columns: {list(df.columns)}")
 
-    # Validate the selected column
-    if selected_column not in df.columns:
-        raise ValueError(f"Column '{selected_column}' not found in the file!")
-
     # Rename the selected column to 'LoanNo/CC'
     df.rename(columns={selected_column: "LoanNo/CC"}, inplace=True)
 
     # Create a new column 'Masked_LoanNo/CC' with masked values
-    df["Masked_LoanNo/CC"] = df["LoanNo/CC"].apply(mask_loan_number)
+    df["Masked_LoanNo/CC"] = mask_loan_numbers(df["LoanNo/CC"], visible_digits, total_length)
 
     # Handle 'acceptanceStatus' column: Set all rows to "pending"
     if "acceptanceStatus" not in df.columns:
@@ -60,6 +68,13 @@ def process_dataframe(file_path, selected_column, desired_columns=None):
 
         df = output_df
 
+    return df
+
+
+def process_dataframe(file_path, selected_column, desired_columns=None):
+    df = read_loan_file(file_path, selected_column, desired_columns)
+    df = mask_dataframe(df, selected_column, desired_columns)
+
     # Save the updated DataFrame to a new file
     output_filename = file_path.replace(".xlsx", "_withMaskAndAssignedStatus.xlsx")
     df.to_excel(output_filename, index=False)
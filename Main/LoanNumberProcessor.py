@@ -1,119 +1,136 @@
 import pandas as pd
 import logging
 import json
+from Main.ExcelIngest import read_table, MissingColumnsError
+from Main.LoanNumberMask import (
+    clean_loan_numbers,
+    mask_loan_numbers,
+    DEFAULT_VISIBLE_DIGITS,
+    DEFAULT_TOTAL_LENGTH,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def mask_loan_number(loan_no, visible_digits=6, total_length=10):
+def parse_desired_columns(desired_columns):
+    """Accept desired_columns as a list or as its JSON form from a form field."""
+    if isinstance(desired_columns, str):
+        try:
+            return json.loads(desired_columns)
+        except json.JSONDecodeError:
+            logger.error("Invalid JSON format for desired_columns")
+            raise ValueError("Invalid JSON format for desired_columns")
+    return desired_columns
+
+
+def input_columns(selected_column="LoanNo/CC", desired_columns=None):
     """
-    Mask the loan number to show the last 'visible_digits' digits/characters, with 'x' for the rest,
-    ensuring a total length of 'total_length'.
+    Columns to parse for the output, or None for all of them. "LoanNo/CC" in
+    desired_columns is the renamed selected column.
     """
-    # Convert to string and strip whitespace
-    loan_no = str(loan_no).strip()
-
-    # Clean float artifacts (e.g., '.0')
-    if loan_no.endswith(".0"):
-        loan_no = loan_no[:-2]
-
-    # Log the input for debugging
-    logger.debug(f"Input loan number: {loan_no}")
-
-    # If input is empty or too short, pad with zeros or handle as needed
-    if not loan_no:
-        logger.warning("Empty loan number")
-        return "x" * total_length  # Fully masked for empty input
-
-    # Take the last 'total_length' characters, padding with zeros if needed
-    trimmed_loan = (
-        loan_no[-total_length:]
-        if len(loan_no) >= total_length
-        else "0" * (total_length - len(loan_no)) + loan_no
-    )
+    desired_columns = parse_desired_columns(desired_columns)
+    if not desired_columns:
+        return None
+    return [selected_column, "assignedStatus"] + [
+        col for col in desired_columns if col != "LoanNo/CC"
+    ]
 
-    # Create masked and visible parts
-    masked_part = "x" * (total_length - visible_digits)
-    visible_part = trimmed_loan[-visible_digits:]
 
-    result = masked_part + visible_part
-    logger.debug(f"Masked result: {result}")
+def read_loan_file(source, selected_column="LoanNo/CC", desired_columns=None, file_format=None):
+    """
+    Read the columns needed to mask loan numbers, checking the selected column
+    from the header first. The selected column is read as text.
+    """
+    try:
+        df = read_table(
+            source,
+            columns=input_columns(selected_column, desired_columns),
+            dtypes={selected_column: str},
+            required=[selected_column],
+            file_format=file_format,
+        )
+    except MissingColumnsError:
+        logger.error(f"Column '{selected_column}' not found in file")
+        raise ValueError(f"Column '{selected_column}' not found in the file!")
 
-    return result
+    logger.info(f"Input file columns: {list(df.columns)}")
+    return df
 
 
-def process_dataframe(file_path, selected_column="LoanNo/CC", desired_columns=None):
+def mask_dataframe(
+    df,
+    selected_column="LoanNo/CC",
+    desired_columns=None,
+    visible_digits=DEFAULT_VISIBLE_DIGITS,
+    total_length=DEFAULT_TOTAL_LENGTH,
+):
     """
-    Process an Excel file to mask loan numbers in the specified column, add assignedStatus,
-    and filter to desired columns. The selected column is renamed to 'LoanNo/CC'.
+    Mask loan numbers in the selected column, add assignedStatus, and filter to
+    desired columns. The selected column is renamed to 'LoanNo/CC'.
     """
-    try:
-        # Read the Excel file, forcing the selected column to be a string
-        df = pd.read_excel(file_path, dtype={selected_column: str})
+    desired_columns = parse_desired_columns(desired_columns)
 
-        # Check if the selected column exists
-        if selected_column not in df.columns:
-            logger.error(f"Column '{selected_column}' not found in file")
-            raise ValueError(f"Column '{selected_column}' not found in the file!")
+    # Rename the selected column to LoanNo/CC
+    df = df.rename(columns={selected_column: "LoanNo/CC"})
 
-        logger.info(f"Input file columns: {list(df.columns)}")
+    # Clean any float artifacts in the LoanNo/CC column
+    df["LoanNo/CC"] = clean_loan_numbers(df["LoanNo/CC"])
 
-        # Rename the selected column to LoanNo/CC
-        df = df.rename(columns={selected_column: "LoanNo/CC"})
+    # Debug: Log raw values
+    logger.debug(f"Raw LoanNo/CC values: {df['LoanNo/CC'].head().tolist()}")
 
-        # Clean any float artifacts in the LoanNo/CC column
-        df["LoanNo/CC"] = (
-            df["LoanNo/CC"].astype(str).str.replace(r"\.0$", "", regex=True)
-        )
+    # Mask the whole column at once into a new column
+    df["Masked_LoanNo/CC"] = mask_loan_numbers(
+        df["LoanNo/CC"], visible_digits, total_length
+    )
 
-        # Debug: Log raw values
-        logger.debug(f"Raw LoanNo/CC values: {df['LoanNo/CC'].head().tolist()}")
+    # Debug: Log masked values
+    logger.debug(
+        f"Masked_LoanNo/CC values: {df['Masked_LoanNo/CC'].head().tolist()}"
+    )
 
-        # Apply the masking to a new column
-        df["Masked_LoanNo/CC"] = df["LoanNo/CC"].apply(mask_loan_number)
+    # Add or update assignedStatus column
+    if "assignedStatus" not in df.columns:
+        df["assignedStatus"] = "unAssigned0"
+    else:
+        df["assignedStatus"] = df["assignedStatus"].fillna("unAssigned0")
+
+    # Filter to desired columns if provided
+    if desired_columns:
+        # Create a new DataFrame with desired columns
+        output_df = pd.DataFrame(index=df.index)
+        for col in desired_columns:
+            if col in df.columns:
+                output_df[col] = df[col]
+            else:
+                output_df[col] = pd.NA
+                logger.warning(
+                    f"Column '{col}' not found in input file, filled with NA"
+                )
+
+        # Ensure Masked_LoanNo/CC and assignedStatus are included
+        if "Masked_LoanNo/CC" not in desired_columns:
+            output_df["Masked_LoanNo/CC"] = df["Masked_LoanNo/CC"]
+        if "assignedStatus" not in desired_columns:
+            output_df["assignedStatus"] = df["assignedStatus"]
+
+        df = output_df
+        logger.info(f"Output file columns: {list(df.columns)}")
+
+    return df
 
-        # Debug: Log masked values
-        logger.debug(
-            f"Masked_LoanNo/CC values: {df['Masked_LoanNo/CC'].head().tolist()}"
-        )
 
-        # Add or update assignedStatus column
-        if "assignedStatus" not in df.columns:
-            df["assignedStatus"] = "unAssigned0"
-        else:
-            df["assignedStatus"] = df["assignedStatus"].fillna("unAssigned0")
-
-        # Filter to desired columns if provided
-        if desired_columns:
-            try:
-                # Ensure desired_columns is a list
-                if isinstance(desired_columns, str):
-                    desired_columns = json.loads(desired_columns)
-
-                # Create a new DataFrame with desired columns
-                output_df = pd.DataFrame(index=df.index)
-                for col in desired_columns:
-                    if col in df.columns:
-                        output_df[col] = df[col]
-                    else:
-                        output_df[col] = pd.NA
-                        logger.warning(
-                            f"Column '{col}' not found in input file, filled with NA"
-                        )
-
-                # Ensure Masked_LoanNo/CC and assignedStatus are included
-                if "Masked_LoanNo/CC" not in desired_columns:
-                    output_df["Masked_LoanNo/CC"] = df["Masked_LoanNo/CC"]
-                if "assignedStatus" not in desired_columns:
-                    output_df["assignedStatus"] = df["assignedStatus"]
-
-                df = output_df
-                logger.info(f"Output file columns: {list(df.columns)}")
-            except json.JSONDecodeError:
-                logger.error("Invalid JSON format for desired_columns")
-                raise ValueError("Invalid JSON format for desired_columns")
+def process_dataframe(file_path, selected_column="LoanNo/CC", desired_columns=None):
+    """
+    Process an Excel file to mask loan numbers in the specified column, add assignedStatus,
+    and filter to desired columns. The selected column is renamed to 'LoanNo/CC'.
+    """
+    try:
+        desired_columns = parse_desired_columns(desired_columns)
+        df = read_loan_file(file_path, selected_column, desired_columns)
+        df = mask_dataframe(df, selected_column, desired_columns)
 
         # Save the result to a new file
         output_filename = file_path.replace(".xlsx", "_withMaskAndAssignedStatus.xlsx")
@@ -124,4 +141,4 @@ def process_dataframe(file_path, selected_column="LoanNo/CC", desired_columns=No
 
     except Exception as e:
         logger.error(f"Error processing DataFrame: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -1,59 +1,77 @@
 import pandas as pd
-import pymongo
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import os
+from Main.ExcelIngest import read_table, MissingColumnsError
+from Main.MongoConnection import assignments_collection
+from Main.BulkWriter import bulk_update_many
+from Main.LoanKey import loan_key_filter, loan_keys
+from config.MongoConfig import MONGO_BULK_BATCH_ROWS
 
+CLOSURE_UPDATE = {"$set": {"caseStatus": "CLOSE_O", "acceptanceStatus": "Resolved"}}
 
-def process_loans(password: str, loan_numbers_column: str, file) -> dict:
+
+async def process_loans(password: str, loan_numbers_column: str, file) -> dict:
 
     # Validate password
     valid_password = os.getenv("VALID_PASSWORD")
     if password != valid_password:
         raise HTTPException(status_code=401, detail="Invalid password")
 
-    # Load environment variables
-    mongo_uri = os.getenv("ATLAS_MONGO_URI")
-    database_name = os.getenv("MONGO_DATABASE")
-    collection_name = os.getenv("MONGO_COLLECTION")
-
-    if not all([mongo_uri, database_name, collection_name]):
-        raise HTTPException(
-            status_code=500,
-            detail="Missing required environment variables (ATLAS_MONGO_URI, MONGO_DATABASE, or MONGO_COLLECTION)",
-        )
+    # Shared connection pool (see Main.MongoConnection)
+    collection = assignments_collection()
 
     # Read the Excel file
     try:
-        df = pd.read_excel(file)
-        if loan_numbers_column not in df.columns:
+        # Only the loan number column is parsed, as text so long numbers stay exact
+        try:
+            df = await run_in_threadpool(
+                read_table,
+                file,
+                columns=[loan_numbers_column],
+                dtypes={loan_numbers_column: str},
+                required=[loan_numbers_column],
+            )
+        except MissingColumnsError:
             raise HTTPException(
                 status_code=400,
                 detail=f"Column '{loan_numbers_column}' not found in the file!",
             )
 
-        # Get unique loan numbers from the column
-        unique_loan_numbers = df[loan_numbers_column].dropna().unique().tolist()
+        # Get unique loan numbers from the column, in canonical key form
+        loan_numbers = loan_keys(df[loan_numbers_column].dropna())
+        unique_loan_numbers = loan_numbers[loan_numbers != ""].unique().tolist()
         if not unique_loan_numbers:
             raise HTTPException(
                 status_code=400, detail="No loan numbers found in the selected column!"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400, detail=f"Failed to read Excel file: {str(e)}"
         )
 
-    # Connect to MongoDB
     try:
-        client = pymongo.MongoClient(mongo_uri)
-        db = client[database_name]
-        collection = db[collection_name]
-
-        # Check for matching loan numbers
-        matching_count = collection.count_documents(
-            {"LoanNo/CC": {"$in": unique_loan_numbers}}
+        # Update caseStatus and acceptanceStatus for matching loan numbers in
+        # one pass over the loanKey index (with a fallback on the raw loan
+        # number for documents without a key): one update per chunk, so a
+        # very large closure file never builds an oversized $in, sent in
+        # unordered batches. The matched count comes from the updates.
+        chunks = [
+            unique_loan_numbers[start : start + MONGO_BULK_BATCH_ROWS]
+            for start in range(0, len(unique_loan_numbers), MONGO_BULK_BATCH_ROWS)
+        ]
+        report = await bulk_update_many(
+            collection,
+            [(chunk, loan_key_filter(chunk), CLOSURE_UPDATE) for chunk in chunks],
         )
-        if matching_count == 0:
-            client.close()
+        if report.failed and not report.matched:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to update MongoDB: {report.failed_rows[0]['error']}",
+            )
+        if report.matched == 0:
             return {
                 "message": "No matching cases found for the given loan numbers.",
                 "processed_loan_numbers": len(unique_loan_numbers),
@@ -61,23 +79,27 @@ def process_loans(password: str, loan_numbers_column: str, file) -> dict:
                 "updated_documents": 0,
             }
 
-        # Update caseStatus and acceptanceStatus for matching loan numbers
-        update_result = collection.update_many(
-            {"LoanNo/CC": {"$in": unique_loan_numbers}},
-            {"$set": {"caseStatus": "CLOSE_O", "acceptanceStatus": "Resolved"}},
-        )
-
-        client.close()
-
+        # A failed chunk leaves each of its loan numbers unprocessed
+        failed_loan_numbers = [
+            loan_no for failure in report.failed_rows for loan_no in failure["row"]
+        ]
         return {
-            "message": "Loan processing completed successfully.",
+            "message": (
+                f"Loan processing completed with {len(failed_loan_numbers)} loan numbers not updated."
+                if report.failed
+                else "Loan processing completed successfully."
+            ),
             "processed_loan_numbers": len(unique_loan_numbers),
-            "matching_cases": matching_count,
-            "updated_documents": update_result.modified_count,
+            "matching_cases": report.matched,
+            "updated_documents": report.modified,
+            "batches": report.batches,
+            "failed_loan_numbers": failed_loan_numbers,
+            "failure_errors": sorted({failure["error"] for failure in report.failed_rows}),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        client.close()
         raise HTTPException(
             status_code=500, detail=f"Failed to update MongoDB: {str(e)}"
         )
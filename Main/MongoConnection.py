@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from config.MongoConfig import (
+    ATLAS_MONGO_URI,
+    MONGO_DATABASE,
+    FOS_COLLECTION_NAME,
+    CASES_COLLECTION_NAME,
+    ASSIGNMENTS_COLLECTION_NAME,
+    USERS_COLLECTION_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MongoConnection:
+    """
+    One async (Motor) client shared by every service, so requests reuse
+    pooled connections instead of each opening its own.
+
+    connect() and close() are called from the FastAPI lifespan; connect()
+    warms the pool in the background so the first requests skip the TLS
+    handshake, then runs the optional on_connect coroutine (index setup). A collection asked for outside the lifespan (scripts, worker
+    processes) connects on first use.
+    """
+
+    def __init__(self, uri: str = ATLAS_MONGO_URI, database: str = MONGO_DATABASE):
+        self.uri = uri
+        self.database = database
+        self.client = None
+        self._warm_up_task = None
+
+    async def connect(self, on_connect=None):
+        if self.client is not None or not self.uri:
+            if not self.uri:
+                logger.warning("ATLAS_MONGO_URI is not set; database routes will fail.")
+            return
+        self.client = self._create_client()
+        self._warm_up_task = asyncio.create_task(self._warm_up(on_connect))
+
+    def _create_client(self) -> AsyncIOMotorClient:
+        return AsyncIOMotorClient(
+            self.uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        )
+
+    async def _warm_up(self, on_connect=None):
+        try:
+            await self.client.admin.command("ping")
+            logger.info(f"MongoDB connection ready: database {self.database}")
+        except Exception as e:
+            logger.warning(f"MongoDB ping failed at startup: {str(e)}")
+            return
+        if on_connect is not None:
+            await on_connect()
+
+    async def close(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            self._warm_up_task = None
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def collection(self, name: str) -> AsyncIOMotorCollection:
+        """
+        Async collection `name` of the configured database.
+
+        Raises:
+            HTTPException: 500 if the connection URI or collection name is not configured.
+        """
+        if not all([self.uri, self.database, name]):
+            raise HTTPException(
+                status_code=500,
+                detail="Missing required environment variables (ATLAS_MONGO_URI, MONGO_DATABASE, or collection name)",
+            )
+        if self.client is None:
+            self.client = self._create_client()
+        return self.client[self.database][name]
+
+
+mongo = MongoConnection()
+
+
+def fos_collection() -> AsyncIOMotorCollection:
+    return mongo.collection(FOS_COLLECTION_NAME)
+
+
+def cases_collection() -> AsyncIOMotorCollection:
+    return mongo.collection(CASES_COLLECTION_NAME)
+
+
+def assignments_collection() -> AsyncIOMotorCollection:
+    return mongo.collection(ASSIGNMENTS_COLLECTION_NAME)
+
+
+def users_collection() -> AsyncIOMotorCollection:
+    return mongo.collection(USERS_COLLECTION_NAME)
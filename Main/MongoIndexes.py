@@ -0,0 +1,52 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from Main.LoanKey import LOAN_KEY_FIELD, LOAN_NUMBER_FIELD, LOAN_KEY_EXPRESSION
+from Main.MongoConnection import assignments_collection, users_collection
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Indexes behind the lookups the services make
+ASSIGNMENT_INDEXES = [
+    IndexModel([(LOAN_KEY_FIELD, ASCENDING)], name=LOAN_KEY_FIELD),
+    IndexModel([("Assigned_FOS_ID", ASCENDING)], name="Assigned_FOS_ID"),
+    IndexModel([("acceptanceStatus", ASCENDING)], name="acceptanceStatus"),
+    IndexModel([("assignedTimestamp", DESCENDING)], name="assignedTimestamp"),
+]
+USER_INDEXES = [
+    IndexModel([("username", ASCENDING)], name="username", unique=True),
+]
+
+
+async def backfill_loan_keys(collection) -> int:
+    """Give assignments stored before loan keys existed their canonical key."""
+    result = await collection.update_many(
+        {LOAN_KEY_FIELD: {"$exists": False}, LOAN_NUMBER_FIELD: {"$nin": [None, ""]}},
+        [{"$set": {LOAN_KEY_FIELD: LOAN_KEY_EXPRESSION}}],
+    )
+    return result.modified_count
+
+
+async def ensure_indexes():
+    """
+    Create the indexes of the assignments and users collections and backfill
+    missing loan keys. Existing indexes are left as they are, so this is
+    cheap to run at every startup; failures are logged, not raised.
+    """
+    for name, collection, indexes in (
+        ("assignments", assignments_collection, ASSIGNMENT_INDEXES),
+        ("users", users_collection, USER_INDEXES),
+    ):
+        try:
+            created = await collection().create_indexes(indexes)
+            logger.info(f"MongoDB indexes on {name}: {', '.join(created)}")
+        except Exception as e:
+            logger.warning(f"Could not create MongoDB indexes on {name}: {str(e)}")
+
+    try:
+        backfilled = await backfill_loan_keys(assignments_collection())
+        if backfilled:
+            logger.info(f"Backfilled {LOAN_KEY_FIELD} on {backfilled} assignments")
+    except Exception as e:
+        logger.warning(f"Could not backfill {LOAN_KEY_FIELD}: {str(e)}")
@@ -0,0 +1,203 @@
+import os
+import tempfile
+import openpyxl
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Output formats of the transform routes and their media types
+MEDIA_TYPES = {
+    "xlsx": XLSX_MEDIA_TYPE,
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "ndjson": "application/x-ndjson",
+}
+TABLE_FORMATS = ("xlsx", "csv", "parquet")
+
+# Other names clients send in Accept for the same formats
+ACCEPT_ALIASES = {
+    "application/x-parquet": "parquet",
+    "application/parquet": "parquet",
+    "application/csv": "csv",
+    "application/vnd.ms-excel": "xlsx",
+}
+
+
+def resolve_output_format(requested=None, accept=None, default="xlsx", allowed=TABLE_FORMATS) -> str:
+    """
+    Output format from an explicit format parameter, else the first Accept
+    media type that names an allowed format, else default.
+
+    Raises:
+        HTTPException: 400 if the explicit format is not allowed.
+    """
+    if requested:
+        output_format = requested.lower().lstrip(".")
+        if output_format not in allowed:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported output format '{requested}'. Use one of: {', '.join(allowed)}",
+            )
+        return output_format
+
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        output_format = ACCEPT_ALIASES.get(media_type) or next(
+            (fmt for fmt, known in MEDIA_TYPES.items() if known == media_type), None
+        )
+        if output_format in allowed:
+            return output_format
+    return default
+
+
+def arrow_safe(df: pd.DataFrame):
+    """
+    df ready for Parquet: Excel columns mixing numbers and text cannot be
+    stored as one Arrow type, so those become text. Returns the frame and the
+    names of the columns converted.
+    """
+    # Shallow copy: replaced columns never touch the caller's frame
+    df = df.copy(deep=False)
+    stringified = []
+    for column in df.columns:
+        if df[column].dtype == object:
+            kinds = {type(value) for value in df[column].dropna()}
+            if len(kinds) > 1:
+                df[column] = df[column].map(lambda value: value if pd.isna(value) else str(value))
+                stringified.append(str(column))
+    df.columns = [str(column) for column in df.columns]
+    return df, stringified
+
+
+def _cell_values(df: pd.DataFrame):
+    """Rows of df as tuples, with missing values as empty cells."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def iter_csv(chunks):
+    """Encode DataFrame chunks as CSV bytes, one block per chunk."""
+    header_written = False
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=not header_written).encode("utf-8")
+        header_written = True
+
+
+def write_xlsx(chunks, output_path: str):
+    """
+    Write DataFrame chunks through openpyxl's write-only workbook, which
+    appends rows to disk instead of building a cell object per value.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    header_written = False
+    for chunk in chunks:
+        if not header_written:
+            worksheet.append([str(column) for column in chunk.columns])
+            header_written = True
+        for row in _cell_values(chunk):
+            worksheet.append(row)
+    workbook.save(output_path)
+
+
+def _parquet_table(chunk: pd.DataFrame, text_columns=()):
+    """
+    Arrow table of one chunk, with every text-like column stored as strings:
+    object columns (mixed or empty included) and those named in text_columns.
+    Columns then keep one type across chunks whatever values a chunk holds.
+    """
+    import pyarrow as pa
+
+    df, _ = arrow_safe(chunk)
+    text_columns = {str(column) for column in text_columns}
+    for column in df.columns:
+        if column in text_columns or df[column].dtype == object:
+            df[column] = df[column].map(lambda value: value if pd.isna(value) else str(value))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    text = [
+        name
+        for name, field in zip(table.column_names, table.schema)
+        if name in text_columns or pa.types.is_null(field.type) or pa.types.is_large_string(field.type)
+    ]
+    if not text:
+        return table
+    schema = pa.schema(
+        field.with_type(pa.string()) if field.name in text else field for field in table.schema
+    )
+    return table.cast(schema)
+
+
+def write_parquet(chunks, output_path: str, text_columns=()):
+    """
+    Write DataFrame chunks as row groups of one Parquet file, with the schema
+    fixed by the first chunk. Text columns are strings from the first chunk
+    on, so a column empty at first or a result column such as latitude that
+    later holds "noGPS" (name it in text_columns) fits every chunk; integer
+    columns also take later chunks where blanks turned them into floats.
+    Row groups are never rewritten, so memory stays at one chunk.
+
+    Raises:
+        ValueError: If a later chunk cannot be stored with the first chunk's schema.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = _parquet_table(chunk, text_columns)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            else:
+                try:
+                    table = table.select(writer.schema.names).cast(writer.schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, KeyError) as e:
+                    raise ValueError(f"A later chunk does not fit the Parquet schema of the first: {str(e)}")
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_csv(chunks, output_path: str):
+    with open(output_path, "wb") as f:
+        for block in iter_csv(chunks):
+            f.write(block)
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv, "parquet": write_parquet}
+
+
+def remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def chunks_response(chunks, output_format: str, output_name: str, text_columns=()) -> FileResponse:
+    """
+    Write DataFrame chunks in output_format to a temporary file and send it,
+    removing the file once the response is done. text_columns are stored as
+    text in Parquet output (see write_parquet).
+    """
+    handle, output_path = tempfile.mkstemp(suffix=f".{output_format}")
+    os.close(handle)
+    options = {"text_columns": text_columns} if output_format == "parquet" else {}
+    try:
+        await run_in_threadpool(WRITERS[output_format], chunks, output_path, **options)
+    except Exception:
+        remove_file(output_path)
+        raise
+    return FileResponse(
+        path=output_path,
+        filename=f"{output_name}.{output_format}",
+        media_type=MEDIA_TYPES[output_format],
+        background=BackgroundTask(remove_file, output_path),
+    )
+
+
+async def dataframe_response(df: pd.DataFrame, output_format: str, output_name: str) -> FileResponse:
+    """Send df as an xlsx, CSV or Parquet attachment named output_name."""
+    return await chunks_response([df], output_format, output_name)
@@ -0,0 +1,185 @@
+import logging
+import openpyxl
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from Main.ExcelIngest import MissingColumnsError, detect_format
+from Main.OutputFormats import MEDIA_TYPES, iter_csv, chunks_response
+from config.IngestConfig import STREAM_CHUNK_ROWS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ChunkReader:
+    """
+    Read an xlsx, CSV or Parquet file as DataFrames of at most chunk_rows rows,
+    so a transform never holds more than one chunk of the input in memory.
+
+    The header is read and required columns are checked on construction,
+    before any rows are parsed, so a bad file fails before a response starts.
+    Iterating always yields at least one (possibly empty) chunk, which keeps
+    the output header intact for files without rows.
+    """
+
+    def __init__(
+        self,
+        source,
+        file_format=None,
+        chunk_rows: int = STREAM_CHUNK_ROWS,
+        columns=None,
+        dtypes=None,
+        required=None,
+    ):
+        self.source = source
+        self.file_format = detect_format(source, file_format)
+        self.chunk_rows = chunk_rows
+        self._workbook = None
+
+        if self.file_format == "xlsx":
+            self._workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+            self._rows = self._workbook.active.iter_rows(values_only=True)
+            header = [name for name in next(self._rows, ())]
+        elif self.file_format == "csv":
+            header = pd.read_csv(source, nrows=0).columns.tolist()
+            source.seek(0)
+        else:
+            import pyarrow.parquet as pq
+
+            self._parquet = pq.ParquetFile(source)
+            header = self._parquet.schema_arrow.names
+
+        missing = [column for column in (required or []) if column not in header]
+        if missing:
+            self.close()
+            raise MissingColumnsError(missing)
+
+        if columns is None:
+            self.columns = list(header)
+        else:
+            wanted = set(columns) | set(required or [])
+            self.columns = [name for name in header if name in wanted]
+        self._positions = [header.index(name) for name in self.columns]
+        self.dtypes = {
+            column: column_dtype
+            for column, column_dtype in (dtypes or {}).items()
+            if column in self.columns
+        }
+
+    def _typed(self, df: pd.DataFrame) -> pd.DataFrame:
+        for column, column_dtype in self.dtypes.items():
+            if column_dtype is str:
+                # Text without turning blank cells into "None"/"nan"
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+            else:
+                df[column] = df[column].astype(column_dtype)
+        return df
+
+    def _iter_frames(self):
+        if self.file_format == "csv":
+            yield from pd.read_csv(
+                self.source,
+                usecols=self.columns,
+                dtype=self.dtypes or None,
+                chunksize=self.chunk_rows,
+            )
+        elif self.file_format == "parquet":
+            for batch in self._parquet.iter_batches(
+                batch_size=self.chunk_rows, columns=self.columns
+            ):
+                yield batch.to_pandas()
+        else:
+            rows = []
+            # Blank rows are kept between data rows but, as with read_excel,
+            # dropped after the last one
+            blank_rows = 0
+            for row in self._rows:
+                if all(value is None for value in row):
+                    blank_rows += 1
+                    continue
+                rows.extend([[None] * len(self.columns)] * blank_rows)
+                blank_rows = 0
+                rows.append(
+                    [row[position] if position < len(row) else None for position in self._positions]
+                )
+                if len(rows) >= self.chunk_rows:
+                    yield pd.DataFrame(rows, columns=self.columns)
+                    rows = []
+            if rows:
+                yield pd.DataFrame(rows, columns=self.columns)
+
+    def __iter__(self):
+        offset = 0
+        for df in self._iter_frames():
+            # Continuous row numbers across chunks, as if read in one go
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df if self.file_format == "csv" else self._typed(df)
+        if offset == 0:
+            yield pd.DataFrame(columns=self.columns)
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+
+async def stream_transform(
+    source,
+    file_name: str,
+    transform,
+    output_name: str,
+    output_format=None,
+    stream_csv: bool = True,
+    text_columns=(),
+    **reader_options,
+):
+    """
+    Apply transform chunk by chunk to an uploaded file and return the result
+    in output_format (default: CSV for CSV input, else xlsx).
+
+    CSV output is streamed straight into the response unless stream_csv is
+    False. xlsx and Parquet output (and unstreamed CSV) go through chunked
+    writers into a temporary file that is sent and then removed, since
+    neither can be finished before every row is known; the whole input has
+    then been processed when this returns. Output columns whose values may
+    change type between chunks go in text_columns, so Parquet output stores
+    them as text from the first chunk. Takes ownership of source and closes
+    it when done.
+
+    Raises:
+        MissingColumnsError: If a required column is not in the file header.
+    """
+    try:
+        reader = await run_in_threadpool(
+            ChunkReader, source, detect_format(file_name), **reader_options
+        )
+    except Exception:
+        source.close()
+        raise
+
+    def transformed():
+        try:
+            for chunk in reader:
+                yield transform(chunk)
+        finally:
+            reader.close()
+            source.close()
+
+    chunks = transformed()
+    output_format = output_format or ("csv" if reader.file_format == "csv" else "xlsx")
+
+    if output_format == "csv" and stream_csv:
+        return StreamingResponse(
+            iter_csv(chunks),
+            media_type=MEDIA_TYPES["csv"],
+            headers={"Content-Disposition": f"attachment; filename={output_name}.csv"},
+        )
+
+    try:
+        response = await chunks_response(chunks, output_format, output_name, text_columns)
+    finally:
+        chunks.close()
+    logger.info(f"Streamed transform of {file_name} written as {output_format}")
+    return response
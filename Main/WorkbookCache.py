@@ -0,0 +1,87 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config.AllocationConfig import WORKBOOK_CACHE_MB
+
+
+class WorkbookCache:
+    """
+    In-process LRU cache of parsed workbooks, keyed by (path, size, mtime) so
+    a re-uploaded file is parsed again while repeated reads of the same upload
+    are served from memory. Entries are evicted, least recently used first,
+    once their combined in-memory size passes max_bytes.
+
+    Cached frames are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+
+    @staticmethod
+    def _key(file_path: str):
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get(self, file_path: str, loader=pd.read_excel) -> pd.DataFrame:
+        """
+        Return the parsed DataFrame for file_path, calling loader(file_path)
+        only when this version of the file is not cached.
+        """
+        key = self._key(file_path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        df = loader(file_path)
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            # Older versions of the same file can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._drop(stale)
+            if size > self.max_bytes:
+                return df
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return df
+
+    def invalidate(self, file_path: str):
+        """Forget every cached version of file_path."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_mb": round(self.current_bytes / 2**20, 2),
+                "max_mb": round(self.max_bytes / 2**20, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "files": [os.path.basename(key[0]) for key in self._entries],
+            }
+
+
+workbook_cache = WorkbookCache(int(WORKBOOK_CACHE_MB * 2**20))
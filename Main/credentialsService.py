@@ -1,14 +1,18 @@
+import asyncio
+import math
+import multiprocessing
 import random
 import bcrypt
+from concurrent.futures import ProcessPoolExecutor
 from bson.binary import Binary
 from datetime import datetime
 from fastapi import  HTTPException
 from schemas import EmployeeIn
 from schemas import EmployeeIn
 import logging
-from dotenv import load_dotenv
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from Main.MongoConnection import users_collection
+from Main.BulkWriter import bulk_insert
+from config.CredentialsConfig import CREDENTIALS_HASH_WORKERS
 # Logging Setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +32,53 @@ def hash_password_bcrypt(password: str) -> bytes:
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 
+def hash_passwords_bcrypt(passwords: list) -> list:
+    """Hash each password with bcrypt; runs in the hashing worker processes."""
+    return [hash_password_bcrypt(password) for password in passwords]
+
+
+_hash_pool = None
+
+
+def _hash_executor() -> ProcessPoolExecutor:
+    # Created on first bulk upload; "spawn" keeps workers clear of the
+    # parent's open Mongo connections
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=max(1, CREDENTIALS_HASH_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+
+async def hash_passwords_parallel(passwords: list) -> list:
+    """
+    bcrypt hashes of passwords, in order, computed in the hashing process
+    pool so the event loop keeps serving requests meanwhile.
+    """
+    if not passwords:
+        return []
+    workers = max(1, CREDENTIALS_HASH_WORKERS)
+    # A few chunks per worker keeps every process busy without one task per row
+    size = math.ceil(len(passwords) / (workers * 4))
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(
+        *(
+            loop.run_in_executor(_hash_executor(), hash_passwords_bcrypt, passwords[start:start + size])
+            for start in range(0, len(passwords), size)
+        )
+    )
+    return [hashed for chunk in chunks for hashed in chunk]
+
+
 def convert_to_mongodb_binary(hashed_password: bytes) -> Binary:
     """Convert hashed password to MongoDB Binary format for secure storage."""
     return Binary(hashed_password)
@@ -40,19 +91,30 @@ def generate_username(E_Name: str, E_ID: int) -> str:
     first_name = name_parts[0] if name_parts else "user"
     return f"{first_name}{E_ID}".lower()
 
+def _employee_summary(emp: EmployeeIn, username: str, plain_password: str) -> dict:
+    return {
+        "E_ID": emp.E_ID,
+        "E_Name": emp.E_Name,
+        "email": emp.email,
+        "userStatus": emp.userStatus,
+        "Username": username,
+        "Password": plain_password  # Returns the plain password for user reference
+    }
+
+
 # Create single employee record
 async def create_employee(emp: EmployeeIn) -> dict:
     try:
         username = generate_username(emp.E_Name, emp.E_ID)
         
         # Check username uniqueness
-        existing_user = await collection.find_one({"username": username})
+        existing_user = await users_collection().find_one({"username": username})
         if existing_user:
             raise HTTPException(status_code=400, detail=f"Username {username} already exists")
         
         # Generate password using name_XXX format
         plain_password = generate_password_from_name(emp.E_Name)
-        hashed_pw = hash_password_bcrypt(plain_password)
+        hashed_pw = await asyncio.to_thread(hash_password_bcrypt, plain_password)
         encoded_password = convert_to_mongodb_binary(hashed_pw)
 
         doc = emp.dict()
@@ -64,16 +126,9 @@ async def create_employee(emp: EmployeeIn) -> dict:
             "currentSession": ""
         })
 
-        await collection.insert_one(doc)
+        await users_collection().insert_one(doc)
 
-        return {
-            "E_ID": emp.E_ID,
-            "E_Name": emp.E_Name,
-            "email": emp.email,
-            "userStatus": emp.userStatus,
-            "Username": username,
-            "Password": plain_password  # Returns the plain password for user reference
-        }
+        return _employee_summary(emp, username, plain_password)
 
     except HTTPException:
         # Re-raise HTTPException to preserve the status code and message
@@ -82,41 +137,68 @@ async def create_employee(emp: EmployeeIn) -> dict:
         logger.error(f"Error creating employee {emp.E_ID}: {ex}")
         raise HTTPException(status_code=500, detail="Internal server error while creating employee")
 
-# Load environment variables from .env file
-load_dotenv()
 
-# Get configuration from .env
-mongo_uri = os.getenv("ATLAS_MONGO_URI")
-db_name = os.getenv("MONGO_DATABASE", "recoverEase")  # Default fallback if not set
-collection_name = os.getenv("COLLECTION_NAME", "testUsers")  # Default fallback if not set
+# Create many employee records at once
+async def create_employees(employees: list) -> tuple:
+    """
+    Bulk version of create_employee for (row, EmployeeIn) pairs.
 
-# Validate required environment variables
-if not mongo_uri:
-    raise ValueError("ATLAS_MONGO_URI not found in .env file")
+    Existing usernames are fetched with one query, passwords are hashed in
+    the process pool and the records are inserted in unordered batches. A
+    username already taken, by an earlier row of the same upload or by a
+    concurrent insert caught by the unique username index, fails only its
+    own row.
 
-# Try connecting to MongoDB
-try:
-    # Connect to MongoDB
-    client = AsyncIOMotorClient(mongo_uri)
-    
-    # Use database and collection names from environment variables
-    db = client[db_name]
-    collection = db[collection_name]
-    
-    # Test connection (Note: server_info() is synchronous, use ping for async)
-    async def test_connection():
-        try:
-            await client.admin.command('ping')
-            print(f"MongoDB connection successful!")
-            print(f"Connected to database: {db_name}")
-            print(f"Using collection: {collection_name}")
-            return True
-        except Exception as e:
-            print(f"MongoDB connection test failed: {e}")
-            return False
-    
-    print("MongoDB client initialized successfully!")
-    
-except Exception as e:
-    print(f"Failed to initialize MongoDB client: {e}")
-    raise
\ No newline at end of file
+    Returns:
+        (summaries, failures): {row: employee summary} for created employees
+        and {row: error message} for the others.
+    """
+    usernames = [generate_username(emp.E_Name, emp.E_ID) for _, emp in employees]
+    existing = set(
+        await users_collection().distinct("username", {"username": {"$in": list(set(usernames))}})
+    )
+
+    failures = {}
+    candidates = []
+    for (row, emp), username in zip(employees, usernames):
+        if username in existing:
+            failures[row] = f"400: Username {username} already exists"
+            continue
+        existing.add(username)
+        candidates.append((row, emp, username, generate_password_from_name(emp.E_Name)))
+
+    hashed = await hash_passwords_parallel([plain_password for _, _, _, plain_password in candidates])
+    active_timestamp = datetime.now().strftime("%d/%m/%Y, %I:%M:%S %p")
+    documents = []
+    for (_, emp, username, _), hashed_pw in zip(candidates, hashed):
+        doc = emp.dict()
+        doc.update({
+            "username": username,
+            "password": convert_to_mongodb_binary(hashed_pw),
+            "activeTimestamp": active_timestamp,
+            "currentDeviceID": "",
+            "currentSession": ""
+        })
+        documents.append(doc)
+
+    report = await bulk_insert(
+        users_collection(),
+        documents,
+        rows=[row for row, _, _, _ in candidates],
+        max_reported=len(documents),
+    )
+    candidate_usernames = {row: username for row, _, username, _ in candidates}
+    for failure in report.failed_rows:
+        row = failure["row"]
+        if failure["code"] == 11000:
+            failures[row] = f"400: Username {candidate_usernames[row]} already exists"
+        else:
+            logger.error(f"Error creating employee in row {row}: {failure['error']}")
+            failures[row] = failure["error"]
+
+    summaries = {
+        row: _employee_summary(emp, username, plain_password)
+        for row, emp, username, plain_password in candidates
+        if row not in failures
+    }
+    return summaries, failures
@@ -1,8 +1,9 @@
 import os
 import shutil
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
-from typing import Optional, List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, List, Dict
 from pydantic import BaseModel
 from Main.AllocationDashboard import (
     secure_filename,
@@ -14,9 +15,20 @@ from Main.AllocationDashboard import (
     get_employee_files,
     get_file_columns,
     get_column_values,
+    get_column_facets,
+    index_uploaded_file,
     process_files,
+    read_allocation_form,
+    run_allocation,
+    allocation_jobs,
     upload_to_db,
 )
+from Main.AllocationResultStore import get_result_page, get_result_rows, iter_result_ndjson
+from Main.OutputFormats import TABLE_FORMATS, resolve_output_format, dataframe_response
+from Main.AllocationMapTiles import get_map_view
+from Main.WorkbookCache import workbook_cache
+from Main.FileCatalog import store_upload
+from Main.ExcelIngest import recent_timings
 
 router = APIRouter()
 
@@ -28,10 +40,22 @@ class ColumnValuesRequest(BaseModel):
     file_type: str
 
 
-# Pydantic model for upload to DB request
+# Pydantic model for column facet search request
+class ColumnFacetsRequest(ColumnValuesRequest):
+    prefix: Optional[str] = None
+    page: int = 1
+    page_size: int = 100
+    sort: str = "value"
+
+
+# Pydantic model for upload to DB request: a stored result id (with manual
+# edits as {row: {column: value}} and rows to leave out), or the rows themselves
 class UploadToDBRequest(BaseModel):
-    data: List[dict]
     password: str
+    result_id: Optional[str] = None
+    overrides: Optional[Dict[int, dict]] = None
+    exclude_rows: Optional[List[int]] = None
+    data: Optional[List[dict]] = None
 
 
 # Route to upload files
@@ -42,16 +66,22 @@ async def upload_files(
 ):
     if fos_data and allowed_file(fos_data.filename):
         fos_filename = secure_filename(fos_data.filename)
-        file_path = os.path.join(EMPLOYEES_FOLDER, fos_filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(fos_data.file, f)
-        return {"message": "File Uploaded Successfully."}
+        entry = await run_in_threadpool(
+            store_upload, fos_data.file, EMPLOYEES_FOLDER, fos_filename
+        )
+        await run_in_threadpool(
+            index_uploaded_file, os.path.join(EMPLOYEES_FOLDER, fos_filename)
+        )
+        return {"message": "File Uploaded Successfully.", "file": entry}
     elif master_data and allowed_file(master_data.filename):
         master_filename = secure_filename(master_data.filename)
-        file_path = os.path.join(CASES_FOLDER, master_filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(master_data.file, f)
-        return {"message": "File Uploaded Successfully."}
+        entry = await run_in_threadpool(
+            store_upload, master_data.file, CASES_FOLDER, master_filename
+        )
+        await run_in_threadpool(
+            index_uploaded_file, os.path.join(CASES_FOLDER, master_filename)
+        )
+        return {"message": "File Uploaded Successfully.", "file": entry}
     else:
         raise HTTPException(
             status_code=400, detail="No file part in the request or invalid file type."
@@ -60,14 +90,26 @@ async def upload_files(
 
 # Route to get list of case files
 @router.get("/get-case-files")
-async def get_case_files_route():
-    return await get_case_files()
+async def get_case_files_route(details: bool = Query(False)):
+    return await get_case_files(details)
 
 
 # Route to get list of employee files
 @router.get("/get-employee-files")
-async def get_employee_files_route():
-    return await get_employee_files()
+async def get_employee_files_route(details: bool = Query(False)):
+    return await get_employee_files(details)
+
+
+# Route to get parsed-workbook cache statistics
+@router.get("/workbook-cache/stats")
+async def workbook_cache_stats_route():
+    return workbook_cache.stats()
+
+
+# Route to get parse timings of recently read files
+@router.get("/ingest-timings")
+async def ingest_timings_route():
+    return {"timings": recent_timings()}
 
 
 # Route to get file columns
@@ -84,12 +126,102 @@ async def get_column_values_route(data: ColumnValuesRequest):
     return await get_column_values(data)
 
 
+# Route to search distinct values (with counts) of a column, paginated
+@router.post("/get-column-facets")
+async def get_column_facets_route(data: ColumnFacetsRequest):
+    return await get_column_facets(data)
+
+
 # Route to process files
 @router.post("/process")
 async def process_files_route(request: Request):
     return await process_files(request)
 
 
+# Route to submit an allocation as a background job
+@router.post("/process-jobs")
+async def submit_process_job_route(request: Request):
+    params = await read_allocation_form(request)
+    params["response"] = "page"
+    job_id = allocation_jobs.submit(run_allocation, params)
+    return allocation_jobs.status(job_id)
+
+
+# Route to poll an allocation job's status and stage
+@router.get("/process-jobs/{job_id}")
+async def process_job_status_route(job_id: str):
+    return allocation_jobs.status(job_id)
+
+
+# Route to fetch a finished allocation job's result
+@router.get("/process-jobs/{job_id}/result")
+async def process_job_result_route(job_id: str):
+    return allocation_jobs.result(job_id)
+
+
+# Route to page through a stored allocation result, optionally filtered
+@router.get("/results/{result_id}")
+async def get_result_page_route(
+    result_id: str,
+    page: int = Query(1),
+    page_size: int = Query(500, le=5000),
+    fos: Optional[List[str]] = Query(None),
+    fos_id: Optional[List[str]] = Query(None),
+    district: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+):
+    filters = {"fos": fos, "fos_id": fos_id, "district": district, "status": status}
+    # Loading (unpickling) and filtering a result is blocking work
+    return await run_in_threadpool(get_result_page, result_id, page, page_size, filters)
+
+
+# Route to download a stored allocation result: NDJSON streamed by default,
+# or csv / parquet / xlsx from the format parameter or the Accept header
+@router.get("/results/{result_id}/download")
+async def download_result_route(
+    result_id: str,
+    fos: Optional[List[str]] = Query(None),
+    fos_id: Optional[List[str]] = Query(None),
+    district: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    output_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+):
+    filters = {"fos": fos, "fos_id": fos_id, "district": district, "status": status}
+    output_format = resolve_output_format(
+        output_format, accept, default="ndjson", allowed=("ndjson",) + TABLE_FORMATS
+    )
+    if output_format != "ndjson":
+        rows = await run_in_threadpool(get_result_rows, result_id, filters)
+        return await dataframe_response(rows, output_format, f"allocation_{result_id}")
+    # The result is loaded and filtered off the event loop; the returned sync
+    # generator is then iterated in the threadpool by StreamingResponse
+    lines = await run_in_threadpool(iter_result_ndjson, result_id, filters)
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f"attachment; filename=allocation_{result_id}.ndjson"
+        },
+    )
+
+
+# Route to get clustered (or, zoomed in, raw) map markers for a stored result
+@router.get("/results/{result_id}/map")
+async def get_result_map_route(
+    result_id: str,
+    min_lat: float = Query(...),
+    min_lng: float = Query(...),
+    max_lat: float = Query(...),
+    max_lng: float = Query(...),
+    zoom: int = Query(...),
+):
+    # The first view per zoom loads the result and builds its clusters
+    return await run_in_threadpool(
+        get_map_view, result_id, min_lat, min_lng, max_lat, max_lng, zoom
+    )
+
+
 # Route to upload to DB
 @router.post("/upload-to-db")
 async def upload_to_db_route(request: UploadToDBRequest):
@@ -11,9 +11,9 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 # Now import from Main
-from Main.credentialsService import collection
+from Main.MongoConnection import users_collection
 from Main.credentialsService import generate_password_from_name, convert_to_mongodb_binary, hash_password_bcrypt
-from Main.credentialsService import create_employee
+from Main.credentialsService import create_employee, create_employees
 import logging
 
 # Define EmployeeIn directly here to avoid import issues
@@ -88,8 +88,10 @@ async def upload_csv(file: UploadFile = File(...)):
                 detail=f"Missing columns: {missing_columns}. Available columns: {available_cols}. Please check your CSV format."
             )
         
-        employee_summaries = []
+        employees = []
         failed_rows = []
+        # Row data echoed back for failed rows, as JSON-safe values
+        row_records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
         
         for index, row in df.iterrows():
             try:
@@ -117,11 +119,7 @@ async def upload_csv(file: UploadFile = File(...)):
                 if not row_data["email"]:
                     raise ValueError("email cannot be empty")
                 
-                # Create employee
-                employee_data = EmployeeIn(**row_data)
-                result = await create_employee(employee_data)
-                employee_summaries.append(result)
-                logger.info(f"Successfully processed row {index + 1}")
+                employees.append((index + 1, EmployeeIn(**row_data)))
                 
             except Exception as e:
                 error_msg = str(e)
@@ -129,9 +127,23 @@ async def upload_csv(file: UploadFile = File(...)):
                 failed_rows.append({
                     "row": index + 1,
                     "error": error_msg,
-                    "data": dict(row) if hasattr(row, 'to_dict') else str(row)
+                    "data": row_records[index]
                 })
         
+        # Create the valid rows in one batch: one username lookup, passwords
+        # hashed in parallel, unordered bulk inserts
+        summaries, failures = await create_employees(employees)
+        employee_summaries = [summaries[row] for row in sorted(summaries)]
+        for row, error_msg in failures.items():
+            logger.error(f"Error processing row {row}: {error_msg}")
+            failed_rows.append({
+                "row": row,
+                "error": error_msg,
+                "data": row_records[row - 1]
+            })
+        failed_rows.sort(key=lambda failure: failure["row"])
+        logger.info(f"Successfully processed {len(employee_summaries)} rows")
+        
         return {
             "message": f"Processed {len(df)} rows: {len(employee_summaries)} successful, {len(failed_rows)} failed",
             "employee_summaries": employee_summaries,
@@ -153,7 +165,7 @@ async def forgot_password(
     try:
         E_Name_cleaned = " ".join(E_Name.strip().lower().split())
         
-        employee = await collection.find_one({
+        employee = await users_collection().find_one({
             "E_Name": {"$regex": f"^{E_Name_cleaned}$", "$options": "i"},
             "E_ID": E_ID
         })
@@ -166,7 +178,7 @@ async def forgot_password(
         hashed_password_bytes = hash_password_bcrypt(new_plain_password)
         base64_encoded_password = convert_to_mongodb_binary(hashed_password_bytes)
         
-        await collection.update_one(
+        await users_collection().update_one(
             {"_id": employee["_id"]},
             {"$set": {"password": base64_encoded_password}}
         )
@@ -10,5 +10,5 @@ async def upload_excel(password: str = Form(...), file: UploadFile = File(...)):
         return {"error": "Only .xlsx files are supported"}
 
     # Process the Excel file and insert data
-    result = insert_data_from_excel(password, file.file)
+    result = await insert_data_from_excel(password, file.file)
     return result
\ No newline at end of file
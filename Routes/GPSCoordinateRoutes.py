@@ -1,63 +1,201 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-import pandas as pd
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from anyio import from_thread
+from functools import partial
+from typing import Optional
+import json
 import os
-from Main.GPSCoordinateLogic import process_dataframe
-import shutil
-import uuid
+from Main.GPSCoordinateLogic import read_addresses, add_gps_coordinates_async
+from Main.Geocoder import AsyncGeocoder
+from Main.ExcelIngest import spool_upload, detect_format
+from Main.GeocodeJobs import geocode_jobs
+from Main.Gazetteer import resolve_gazetteer_mode
+from Main.StreamingTransform import stream_transform
+from Main.OutputFormats import resolve_output_format, dataframe_response
 from config.GpsConfig import API_KEYS  # Import from config
 
 router = APIRouter()
 
+STATS_HEADER = "X-Geocode-Stats"
+
+
+def add_stats_header(response, stats: dict):
+    # Streamed rows are still being geocoded, so there are no totals yet
+    if not isinstance(response, StreamingResponse):
+        response.headers[STATS_HEADER] = json.dumps(stats)
+        response.headers["Access-Control-Expose-Headers"] = STATS_HEADER
+    return response
+
 
 @router.post("/upload-and-process")
-async def upload_and_process_file(file: UploadFile = File(...)):
+async def upload_and_process_file(
+    file: UploadFile = File(...),
+    streaming: bool = Form(default=False),
+    output_format: Optional[str] = Form(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
+    refresh_no_gps: bool = Form(default=False),
+    gazetteer: Optional[str] = Form(default=None),
+):
     """
     Upload an Excel file and process it to add GPS coordinates for addresses in the 'Cus_Add' column.
 
     Args:
         file (UploadFile): The Excel file to process.
+        streaming (bool): Geocode in chunks with flat memory; also accepts .csv (answered as CSV).
+        output_format (str): "xlsx", "csv" or "parquet"; otherwise taken from the Accept header.
+        refresh_no_gps (bool): Ask the provider again for addresses cached as "noGPS".
+        gazetteer (str): Offline PIN code/locality lookup: "first", "fallback" or "off".
 
     Returns:
-        FileResponse: The processed Excel file with GPS coordinates.
+        FileResponse: The processed file with GPS coordinates and the
+        precision of each row in 'gps_precision'. Row, unique
+        address, cache hit/miss and request counts are in the X-Geocode-Stats
+        header (not sent for streamed CSV).
     """
     # Validate file type
-    if not file.filename.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="Only .xlsx files are supported.")
+    allowed = (".xlsx", ".csv") if streaming else (".xlsx",)
+    if not file.filename.endswith(allowed):
+        raise HTTPException(
+            status_code=400, detail=f"Only {' and '.join(allowed)} files are supported."
+        )
 
     # Validate API keys
     if not API_KEYS:
         raise HTTPException(status_code=500, detail="No API keys configured.")
 
-    # Save the uploaded file temporarily
-    temp_file_path = f"temp_{uuid.uuid4()}.xlsx"
+    output_format = resolve_output_format(
+        output_format, accept, default=None if streaming else "xlsx"
+    )
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        gazetteer = resolve_gazetteer_mode(gazetteer)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    output_name = os.path.splitext(file.filename)[0] + "_with_GPS"
 
-        # Validate 'Cus_Add' column
-        df = pd.read_excel(temp_file_path)
-        if "Cus_Add" not in df.columns:
-            raise HTTPException(
-                status_code=400, detail="Column 'Cus_Add' not found in the Excel file."
-            )
+    # Stream the upload into a spooled buffer and parse it once
+    spool = await spool_upload(file)
+    streamed = False
+    stats = {}
+    try:
+        if streaming:
+            # One geocoder for every chunk, so they share its HTTP pool and
+            # rate buckets. Chunks are transformed in worker threads and hand
+            # each one back to this event loop, which owns the geocoder.
+            geocoder = AsyncGeocoder(API_KEYS)
+            try:
+                response = await stream_transform(
+                    spool,
+                    file.filename,
+                    lambda chunk: from_thread.run(
+                        partial(
+                            add_gps_coordinates_async,
+                            chunk,
+                            API_KEYS,
+                            stats,
+                            refresh_no_gps,
+                            gazetteer_mode=gazetteer,
+                            geocoder=geocoder,
+                        )
+                    ),
+                    output_name,
+                    output_format,
+                    # Numbers in some chunks, "noGPS" in others
+                    text_columns=["latitude", "longitude"],
+                    required=["Cus_Add"],
+                )
+            except BaseException:
+                await geocoder.aclose()
+                raise
+            streamed = True
+            if isinstance(response, StreamingResponse):
+                # Rows are geocoded as the response is sent
+                response.background = BackgroundTask(geocoder.aclose)
+            else:
+                await geocoder.aclose()
+            return add_stats_header(response, stats)
 
-        # Process the file to add GPS coordinates
-        output_path = process_dataframe(temp_file_path, API_KEYS)
+        # Validate 'Cus_Add' column from the header, then parse the rows
+        df = await run_in_threadpool(read_addresses, spool, "xlsx")
 
-        # Return the processed file
-        return FileResponse(
-            path=output_path,
-            filename=os.path.basename(output_path),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        # Process the rows to add GPS coordinates
+        df = await add_gps_coordinates_async(
+            df, API_KEYS, stats, refresh_no_gps, gazetteer_mode=gazetteer
         )
 
+        # Return the processed file
+        response = await dataframe_response(df, output_format, output_name)
+        return add_stats_header(response, stats)
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
     finally:
-        # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
\ No newline at end of file
+        if not streamed:
+            spool.close()
+
+
+@router.post("/jobs", status_code=202)
+async def submit_geocode_job(
+    file: UploadFile = File(...),
+    refresh_no_gps: bool = Form(default=False),
+    gazetteer: Optional[str] = Form(default=None),
+):
+    """
+    Upload an xlsx, CSV or Parquet file of 'Cus_Add' addresses and geocode
+    it in the background. Progress is checkpointed, so a job that runs out
+    of API keys pauses and can be resumed from where it stopped.
+
+    Returns:
+        dict: The job status, including its job_id.
+    """
+    if not file.filename.endswith((".xlsx", ".csv", ".parquet")):
+        raise HTTPException(
+            status_code=400, detail="Only .xlsx, .csv and .parquet files are supported."
+        )
+    if not API_KEYS:
+        raise HTTPException(status_code=500, detail="No API keys configured.")
+    try:
+        gazetteer = resolve_gazetteer_mode(gazetteer)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    spool = await spool_upload(file)
+    try:
+        df = await run_in_threadpool(read_addresses, spool, detect_format(file.filename))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        spool.close()
+
+    job_id = await geocode_jobs.submit(df, file.filename, API_KEYS, refresh_no_gps, gazetteer)
+    return geocode_jobs.status(job_id)
+
+
+@router.get("/jobs/{job_id}")
+async def geocode_job_status(job_id: str):
+    """Rows done and remaining, and the estimated completion time while running."""
+    return geocode_jobs.status(job_id)
+
+
+@router.post("/jobs/{job_id}/resume")
+async def resume_geocode_job(job_id: str):
+    """Continue a paused or interrupted job from its last checkpoint."""
+    return geocode_jobs.resume(job_id, API_KEYS)
+
+
+@router.get("/jobs/{job_id}/result")
+async def geocode_job_result(
+    job_id: str,
+    output_format: Optional[str] = Query(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
+):
+    """Download a completed job's rows with GPS coordinates."""
+    output_format = resolve_output_format(output_format, accept)
+    state = geocode_jobs.status(job_id)
+    df = await run_in_threadpool(geocode_jobs.result, job_id)
+    output_name = os.path.splitext(state["file_name"])[0] + "_with_GPS"
+    return await dataframe_response(df, output_format, output_name)
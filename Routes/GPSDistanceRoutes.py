@@ -1,30 +1,68 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
 from fastapi.responses import StreamingResponse
-from Main.GPSDistanceCalculate import calculate_distances
-import io
+from typing import Optional
+import json
+import logging
+import os
+from Main.GPSDistanceCalculate import add_distances, DistanceSummary, REQUIRED_COLUMNS
+from Main.ExcelIngest import spool_upload
+from Main.StreamingTransform import stream_transform
+from Main.OutputFormats import resolve_output_format
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SUMMARY_HEADER = "X-Distance-Summary"
+
 
 @router.post("/calculate-distance")
-async def calculate_distance(file: UploadFile = File(...)):
-    # Check if the uploaded file is an Excel file
-    if not file.filename.endswith(".xlsx"):
-        return {"error": "Only .xlsx files are supported"}
-
-    # Process the file
-    df = calculate_distances(file.file)
-
-    # Save the DataFrame to a BytesIO object
-    output = io.BytesIO()
-    df.to_excel(output, index=False)
-    output.seek(0)
-
-    # Return the file as a streaming response
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=processed_{file.filename}"
-        },
+async def calculate_distance(
+    file: UploadFile = File(...),
+    streaming: bool = Form(default=False),
+    output_format: Optional[str] = Form(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
+):
+    """
+    Add a Distance(KM) column between each case and its FOS. The file (xlsx,
+    CSV or Parquet) is processed in chunks, and a JSON summary (rows dropped
+    for invalid coordinates, distance percentiles) is returned in the
+    X-Distance-Summary header. With streaming=true and CSV output, rows are
+    streamed as they are computed and the summary header is not sent.
+    """
+    # Check if the uploaded file is a supported format
+    if not file.filename.endswith((".xlsx", ".csv", ".parquet")):
+        return {"error": "Only .xlsx, .csv and .parquet files are supported"}
+
+    # Output as xlsx, csv or parquet, from the format field or the Accept header
+    output_format = resolve_output_format(
+        output_format, accept, default=None if streaming else "xlsx"
     )
+    output_name = f"processed_{os.path.splitext(file.filename)[0]}"
+
+    spool = await spool_upload(file)
+    summary = DistanceSummary()
+    try:
+        response = await stream_transform(
+            spool,
+            file.filename,
+            lambda chunk: add_distances(chunk, summary),
+            output_name,
+            output_format,
+            stream_csv=streaming,
+            required=REQUIRED_COLUMNS,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
+
+    # Streamed rows are still being computed, so there is no summary yet
+    if not isinstance(response, StreamingResponse):
+        summary = summary.to_dict()
+        logger.info(f"Distances for {file.filename}: {summary}")
+        response.headers[SUMMARY_HEADER] = json.dumps(summary)
+        response.headers["Access-Control-Expose-Headers"] = SUMMARY_HEADER
+    return response
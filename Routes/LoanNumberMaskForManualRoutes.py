@@ -1,9 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import FileResponse
-import pandas as pd
-from Main.LoanNumberMaskForManual import process_dataframe
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from Main.LoanNumberMaskForManual import read_loan_file, mask_dataframe
+from Main.ExcelIngest import spool_upload
+from Main.StreamingTransform import stream_transform
+from Main.OutputFormats import resolve_output_format, dataframe_response
+from Main.LoanNumberMask import DEFAULT_VISIBLE_DIGITS, DEFAULT_TOTAL_LENGTH
 import os
-import uuid
 import logging
 
 # Configure logging
@@ -14,36 +17,63 @@ router = APIRouter()
 
 # API endpoint to process Excel file
 @router.post("/manual_process_excel/")
-async def process_excel(file: UploadFile = File(...), column_name: str = Form(...)):
-    # Validate file type
-    if not file.filename.endswith(".xlsx"):
+async def process_excel(
+    file: UploadFile = File(...),
+    column_name: str = Form(...),
+    visible_digits: int = Form(default=DEFAULT_VISIBLE_DIGITS),
+    total_length: int = Form(default=DEFAULT_TOTAL_LENGTH),
+    streaming: bool = Form(default=False),
+    output_format: Optional[str] = Form(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
+):
+    # Validate file type (streaming mode also takes CSV)
+    allowed = (".xlsx", ".csv") if streaming else (".xlsx",)
+    if not file.filename.endswith(allowed):
         logger.error(f"Invalid file type: {file.filename}")
-        raise HTTPException(status_code=400, detail="Only .xlsx files are supported")
+        raise HTTPException(
+            status_code=400, detail=f"Only {' and '.join(allowed)} files are supported"
+        )
+
+    # Output as xlsx, csv or parquet, from the format field or the Accept header
+    output_format = resolve_output_format(
+        output_format, accept, default=None if streaming else "xlsx"
+    )
+    output_name = os.path.splitext(file.filename)[0] + "_withMaskAndAssignedStatus"
 
-    # Save uploaded file temporarily
-    temp_input_path = f"temp/{uuid.uuid4()}_{file.filename}"
-    os.makedirs("temp", exist_ok=True)
+    # Stream the upload into a spooled buffer and parse it once
+    spool = await spool_upload(file)
+    streamed = False
 
     try:
-        logger.info(f"Saving uploaded file to: {temp_input_path}")
-        with open(temp_input_path, "wb") as f:
-            f.write(await file.read())
+        if streaming:
+            # Process in chunks, writing the output as it is produced
+            logger.info(f"Streaming file with column: {column_name}")
+            response = await stream_transform(
+                spool,
+                file.filename,
+                lambda chunk: mask_dataframe(
+                    chunk, column_name, None, visible_digits, total_length
+                ),
+                output_name,
+                output_format,
+                required=[column_name],
+            )
+            streamed = True
+            return response
 
-        # Read the Excel file to check columns
-        logger.info(f"Checking columns in file: {temp_input_path}")
-        df = pd.read_excel(temp_input_path)
+        # Check the column from the header, then parse the rows
+        logger.info(f"Reading uploaded file: {file.filename}")
+        df = await run_in_threadpool(read_loan_file, spool, column_name, None, "xlsx")
 
-        # Process the file with the specified column and required columns
+        # Process the rows with the specified column
         logger.info(f"Processing file with column: {column_name}")
-        output_path = process_dataframe(temp_input_path, column_name)
+        df = await run_in_threadpool(
+            mask_dataframe, df, column_name, None, visible_digits, total_length
+        )
 
         # Return the processed file
-        logger.info(f"Returning processed file: {output_path}")
-        return FileResponse(
-            path=output_path,
-            filename=os.path.basename(output_path),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        logger.info(f"Returning processed file as {output_format}")
+        return await dataframe_response(df, output_format, output_name)
     except ValueError as ve:
         logger.error(f"ValueError during processing: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -51,10 +81,5 @@ async def process_excel(file: UploadFile = File(...), column_name: str = Form(..
         logger.error(f"Unexpected error during processing: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     finally:
-        # Clean up temporary input file
-        if os.path.exists(temp_input_path):
-            try:
-                os.remove(temp_input_path)
-                logger.info(f"Cleaned up temporary file: {temp_input_path}")
-            except Exception as e:
-                logger.error(f"Failed to clean up temporary file: {str(e)}")
+        if not streamed:
+            spool.close()
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
 import os
-import uuid
 import logging
-from Main.LoanNumberProcessor import process_dataframe
+from Main.LoanNumberProcessor import (
+    parse_desired_columns,
+    input_columns,
+    read_loan_file,
+    mask_dataframe,
+)
+from Main.ExcelIngest import spool_upload
+from Main.StreamingTransform import stream_transform
+from Main.OutputFormats import resolve_output_format, dataframe_response
+from Main.LoanNumberMask import DEFAULT_VISIBLE_DIGITS, DEFAULT_TOTAL_LENGTH
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,39 +26,73 @@ async def process_excel(
     file: UploadFile = File(...),
     column_name: str = Form(default="LoanNo/CC"),
     desired_columns: str = Form(default=None),
+    visible_digits: int = Form(default=DEFAULT_VISIBLE_DIGITS),
+    total_length: int = Form(default=DEFAULT_TOTAL_LENGTH),
+    streaming: bool = Form(default=False),
+    output_format: Optional[str] = Form(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
 ):
     """
     Process an uploaded Excel file to mask loan numbers, add assignedStatus, and filter columns.
-    Defaults to 'LoanNo/CC' column.
+    Defaults to 'LoanNo/CC' column, showing the last 6 of 10 masked characters.
+    With streaming=true the file is processed in chunks with flat memory, and
+    .csv uploads are also accepted (answered as CSV).
+    The output is xlsx, csv or parquet, from the format field or the Accept header.
     """
     # Validate file type
-    if not file.filename.endswith(".xlsx"):
+    allowed = (".xlsx", ".csv") if streaming else (".xlsx",)
+    if not file.filename.endswith(allowed):
         logger.error(f"Invalid file type: {file.filename}")
-        raise HTTPException(status_code=400, detail="Only .xlsx files are supported")
+        raise HTTPException(
+            status_code=400, detail=f"Only {' and '.join(allowed)} files are supported"
+        )
+
+    output_format = resolve_output_format(
+        output_format, accept, default=None if streaming else "xlsx"
+    )
+    output_name = os.path.splitext(file.filename)[0] + "_withMaskAndAssignedStatus"
 
-    # Create a temporary file path
-    temp_input_path = f"temp/{uuid.uuid4()}_{file.filename}"
-    os.makedirs("temp", exist_ok=True)
+    # Stream the upload into a spooled buffer and parse it once
+    spool = await spool_upload(file)
+    streamed = False
 
     try:
-        # Save the uploaded file
-        logger.info(f"Saving uploaded file to: {temp_input_path}")
-        with open(temp_input_path, "wb") as f:
-            f.write(await file.read())
+        desired_columns = parse_desired_columns(desired_columns)
+
+        if streaming:
+            logger.info(f"Streaming file with column: {column_name}")
+            response = await stream_transform(
+                spool,
+                file.filename,
+                lambda chunk: mask_dataframe(
+                    chunk, column_name, desired_columns, visible_digits, total_length
+                ),
+                output_name,
+                output_format,
+                columns=input_columns(column_name, desired_columns),
+                dtypes={column_name: str},
+                required=[column_name],
+            )
+            streamed = True
+            return response
+
+        # Check the column from the header, then parse only the needed columns
+        logger.info(f"Reading uploaded file: {file.filename}")
+        df = await run_in_threadpool(
+            read_loan_file, spool, column_name, desired_columns, "xlsx"
+        )
 
         # Process the DataFrame
         logger.info(
             f"Processing file with column: {column_name}, desired_columns: {desired_columns}"
         )
-        output_path = process_dataframe(temp_input_path, column_name, desired_columns)
+        df = await run_in_threadpool(
+            mask_dataframe, df, column_name, desired_columns, visible_digits, total_length
+        )
 
         # Return the processed file
-        logger.info(f"Returning processed file: {output_path}")
-        return FileResponse(
-            path=output_path,
-            filename=os.path.basename(output_path),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        logger.info(f"Returning processed file as {output_format}")
+        return await dataframe_response(df, output_format, output_name)
 
     except ValueError as ve:
         logger.error(f"ValueError during processing: {str(ve)}")
@@ -60,10 +103,5 @@ async def process_excel(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
     finally:
-        # Clean up the temporary input file
-        if os.path.exists(temp_input_path):
-            try:
-                os.remove(temp_input_path)
-                logger.info(f"Cleaned up temporary file: {temp_input_path}")
-            except Exception as e:
-                logger.error(f"Failed to clean up temporary file: {str(e)}")
\ No newline at end of file
+        if not streamed:
+            spool.close()
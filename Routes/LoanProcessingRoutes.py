@@ -16,5 +16,5 @@ async def process_loans_route(
         return {"error": "Only .xlsx files are supported"}
 
     # Process the loan numbers
-    result = process_loans(password, loan_numbers_column, file.file)
+    result = await process_loans(password, loan_numbers_column, file.file)
     return result
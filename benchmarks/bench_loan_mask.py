@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: vectorized loan-number masking against the per-row
+Series.apply implementation it replaced.
+
+Run from the repository root:
+    python benchmarks/bench_loan_mask.py [rows]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, ".")
+from Main.LoanNumberMask import mask_loan_numbers  # noqa: E402
+
+
+def mask_loan_number_per_row(loan_no, visible_digits=6, total_length=10):
+    """The previous row-at-a-time masking, kept here as the reference."""
+    loan_no = str(loan_no).strip()
+    if loan_no.endswith(".0"):
+        loan_no = loan_no[:-2]
+    if not loan_no:
+        return "x" * total_length
+    trimmed_loan = (
+        loan_no[-total_length:]
+        if len(loan_no) >= total_length
+        else "0" * (total_length - len(loan_no)) + loan_no
+    )
+    return "x" * (total_length - visible_digits) + trimmed_loan[-visible_digits:]
+
+
+def sample_loan_numbers(rows: int) -> pd.Series:
+    """Mix of long and short numbers, float artifacts, padding and blanks."""
+    rng = np.random.default_rng(0)
+    numbers = rng.integers(10**3, 10**15, size=rows).astype(str).astype(object)
+    numbers[::7] = [f"{value}.0" for value in numbers[::7]]
+    numbers[::11] = [f"  {value} " for value in numbers[::11]]
+    numbers[::13] = [str(value)[:4] for value in numbers[::13]]
+    numbers[::101] = ""
+    return pd.Series(numbers)
+
+
+def best_of(fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    loan_numbers = sample_loan_numbers(rows)
+
+    per_row_seconds, expected = best_of(lambda: loan_numbers.apply(mask_loan_number_per_row), 1)
+    vectorized_seconds, masked = best_of(lambda: mask_loan_numbers(loan_numbers))
+
+    if masked.tolist() != expected.tolist():
+        raise SystemExit("Vectorized masking does not match the per-row reference")
+
+    print(f"rows:        {rows:,}")
+    print(f"per-row:     {per_row_seconds:.3f}s")
+    print(f"vectorized:  {vectorized_seconds:.3f}s")
+    print(f"speedup:     {per_row_seconds / vectorized_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Distance kernel: case rows per block and float precision of the distance matrix
+DISTANCE_BLOCK_SIZE = int(os.getenv("DISTANCE_BLOCK_SIZE", "2048"))
+DISTANCE_DTYPE = os.getenv("DISTANCE_DTYPE", "float64")
+
+# Candidate source for /process: "dense" (full distance matrix) or
+# "knn" (spatial index over FOS locations)
+ALLOCATION_MODE = os.getenv("ALLOCATION_MODE", "dense")
+
+# Number of nearest officers fetched per case before any widening
+K_NEAREST = int(os.getenv("ALLOCATION_K_NEAREST", "8"))
+
+# Wall-clock budget in seconds for strategy=optimal before falling back to greedy
+OPTIMAL_TIME_BUDGET = float(os.getenv("OPTIMAL_TIME_BUDGET", "30"))
+
+# Background allocation jobs: worker processes, jobs allowed to wait for a
+# worker before new submissions are rejected, and finished jobs kept for polling
+ALLOCATION_MAX_WORKERS = int(os.getenv("ALLOCATION_MAX_WORKERS", "2"))
+ALLOCATION_MAX_QUEUED = int(os.getenv("ALLOCATION_MAX_QUEUED", "8"))
+ALLOCATION_JOB_RETENTION = int(os.getenv("ALLOCATION_JOB_RETENTION", "20"))
+
+# Stored allocation results: hours kept on disk, results held in memory, and
+# rows per page returned with a job result
+RESULT_TTL_HOURS = float(os.getenv("RESULT_TTL_HOURS", "72"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4"))
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "500"))
+
+# Allocation map: zoom level from which raw case points replace clusters, and
+# (result, zoom) cluster sets kept in memory
+MAP_RAW_POINTS_ZOOM = int(os.getenv("MAP_RAW_POINTS_ZOOM", "14"))
+MAP_CACHE_SIZE = int(os.getenv("MAP_CACHE_SIZE", "32"))
+
+# Memory ceiling in MB for parsed workbooks cached by the dashboard endpoints
+WORKBOOK_CACHE_MB = float(os.getenv("WORKBOOK_CACHE_MB", "512"))
+
+# Files whose per-column distinct-value facets are kept in memory
+FACET_CACHE_SIZE = int(os.getenv("FACET_CACHE_SIZE", "32"))
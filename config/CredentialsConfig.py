@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Bulk employee upload: worker processes hashing passwords with bcrypt
+CREDENTIALS_HASH_WORKERS = int(os.getenv("CREDENTIALS_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
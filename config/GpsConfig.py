@@ -15,3 +15,46 @@ except json.JSONDecodeError as e:
     raise ValueError(f"Invalid JSON format for API_KEYS in .env file: {str(e)}")
 except Exception as e:
     raise ValueError(f"Error loading API_KEYS from .env file: {str(e)}")
+
+# Geocoding provider endpoint; point it at a local stub server for testing
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://geocode.search.hereapi.com/v1/geocode")
+
+# Requests in flight at once across all keys, and the sustained requests per
+# second (with a burst allowance) each API key may make
+GEOCODER_CONCURRENCY = int(os.getenv("GEOCODER_CONCURRENCY", "8"))
+GEOCODER_RATE_PER_KEY = float(os.getenv("GEOCODER_RATE_PER_KEY", "5"))
+GEOCODER_BURST_PER_KEY = int(os.getenv("GEOCODER_BURST_PER_KEY", "5"))
+
+# Retries on 429/5xx/network errors with the same key before rotating to the
+# next one, the first backoff delay in seconds (doubled each retry), and the
+# per-request timeout
+GEOCODER_MAX_RETRIES = int(os.getenv("GEOCODER_MAX_RETRIES", "3"))
+GEOCODER_BACKOFF_SECONDS = float(os.getenv("GEOCODER_BACKOFF_SECONDS", "0.5"))
+GEOCODER_TIMEOUT_SECONDS = float(os.getenv("GEOCODER_TIMEOUT_SECONDS", "10"))
+
+# Persistent geocode cache: SQLite file, and days before a "noGPS" answer is
+# asked again (found coordinates are kept until GEOCODE_TTL_DAYS, 0 = forever)
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "./files/geocode_cache.sqlite3")
+GEOCODE_NO_GPS_TTL_DAYS = float(os.getenv("GEOCODE_NO_GPS_TTL_DAYS", "30"))
+GEOCODE_TTL_DAYS = float(os.getenv("GEOCODE_TTL_DAYS", "0"))
+
+# Geocoded addresses written to the cache per checkpoint while a file is
+# being geocoded, so an interrupted run keeps what it has fetched
+GEOCODE_CHECKPOINT_EVERY = int(os.getenv("GEOCODE_CHECKPOINT_EVERY", "100"))
+
+# Background geocoding jobs: folder holding each job's input, state and
+# output, and hours a job is kept after its last update
+GEOCODE_JOBS_FOLDER = os.getenv("GEOCODE_JOBS_FOLDER", "./files/geocode_jobs")
+GEOCODE_JOB_TTL_HOURS = float(os.getenv("GEOCODE_JOB_TTL_HOURS", "168"))
+
+# Offline gazetteer: table of PIN codes (and locality names) with
+# latitude/longitude, the columns holding locality names, and where it sits
+# in the geocoding chain: "first" (PIN centroids before the provider),
+# "fallback" (only for rows the provider cannot place) or "off"
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "./files/gazetteer/pincodes.csv")
+GAZETTEER_LOCALITY_COLUMNS = [
+    name.strip()
+    for name in os.getenv("GAZETTEER_LOCALITY_COLUMNS", "district,districtname").split(",")
+    if name.strip()
+]
+GAZETTEER_MODE = os.getenv("GAZETTEER_MODE", "fallback")
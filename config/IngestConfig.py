@@ -0,0 +1,16 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Largest upload accepted by the upload-and-transform routes, in megabytes
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "100"))
+
+# Uploads are copied in chunks of this many kilobytes into a buffer that stays
+# in memory up to UPLOAD_SPOOL_MB and then moves to a temporary file on disk
+UPLOAD_CHUNK_KB = int(os.getenv("UPLOAD_CHUNK_KB", "1024"))
+UPLOAD_SPOOL_MB = float(os.getenv("UPLOAD_SPOOL_MB", "16"))
+
+# Rows per chunk when a transform route runs in streaming mode
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "50000"))
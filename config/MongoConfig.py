@@ -0,0 +1,39 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env file
+load_dotenv()
+
+# MongoDB deployment and database
+ATLAS_MONGO_URI = os.getenv("ATLAS_MONGO_URI")
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "recoverEase")  # Default fallback if not set
+
+# Collections: field officers, borrower cases, assigned cases and app users
+FOS_COLLECTION_NAME = os.getenv("FOS_COLLECTION_NAME")
+CASES_COLLECTION_NAME = os.getenv("CASES_COLLECTION_NAME")
+ASSIGNMENTS_COLLECTION_NAME = os.getenv("MONGO_COLLECTION")
+USERS_COLLECTION_NAME = os.getenv("COLLECTION_NAME", "testUsers")  # Default fallback if not set
+
+# Connection pool: connections kept open per server (the minimum is opened
+# at startup so first requests skip the TLS handshake), and milliseconds an
+# idle connection is kept
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+
+# Timeouts in milliseconds: finding a usable server, opening a connection,
+# and waiting on one socket read or write
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+
+# Bulk writes: documents and approximate MB per batch, batches in flight at
+# once, and failed rows listed in a response before the list is cut short
+MONGO_BULK_BATCH_ROWS = int(os.getenv("MONGO_BULK_BATCH_ROWS", "1000"))
+MONGO_BULK_BATCH_MB = float(os.getenv("MONGO_BULK_BATCH_MB", "8"))
+MONGO_BULK_PARALLELISM = int(os.getenv("MONGO_BULK_PARALLELISM", "4"))
+MONGO_BULK_MAX_REPORTED_FAILURES = int(os.getenv("MONGO_BULK_MAX_REPORTED_FAILURES", "1000"))
+
+# Create the collections' indexes (and backfill canonical loan keys) in the
+# background at startup
+MONGO_BOOTSTRAP_INDEXES = os.getenv("MONGO_BOOTSTRAP_INDEXES", "true").lower() == "true"